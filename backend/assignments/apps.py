@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class AssignmentsConfig(AppConfig):
+    name = 'assignments'
+
+    def ready(self):
+        from backend import images
+        from . import signals  # noqa: F401
+        from .models import Submission
+        images.watch(Submission, 'screenshot', widths=(320, 960))
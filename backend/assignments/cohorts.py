@@ -0,0 +1,54 @@
+"""Bulk membership edits for ``Cohort``.
+
+Membership rows are written with ``bulk_create`` and removed with a single
+filtered delete rather than one ``.add()``/``.remove()`` per student, and the
+students' inboxes are updated in the same transaction. ``Cohort.members``
+itself is left alone by design: its ``m2m_changed`` signals would not carry
+the inbox bookkeeping.
+"""
+from django.db import transaction
+
+from . import inbox
+from .models import CohortMembership
+
+BATCH_SIZE = 500
+
+
+def add_members(cohort, student_ids):
+    """Add students to ``cohort``; returns the ids that weren't members yet."""
+    student_ids = set(student_ids)
+    with transaction.atomic():
+        existing = set(
+            CohortMembership.objects.filter(cohort=cohort, student_id__in=student_ids)
+            .values_list('student_id', flat=True)
+        )
+        added = student_ids - existing
+        CohortMembership.objects.bulk_create(
+            [CohortMembership(cohort=cohort, student_id=student_id) for student_id in sorted(added)],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        inbox.add_cohort_members(cohort, added)
+    return added
+
+
+def remove_members(cohort, student_ids):
+    """Remove students from ``cohort``; returns how many were members."""
+    student_ids = set(student_ids)
+    with transaction.atomic():
+        removed = 0
+        for ids in inbox.chunks(student_ids):
+            removed += CohortMembership.objects.filter(cohort=cohort, student_id__in=ids).delete()[0]
+        inbox.remove_cohort_members(cohort, student_ids)
+    return removed
+
+
+def set_members(cohort, student_ids):
+    """Make ``cohort``'s membership exactly ``student_ids``; returns
+    ``(added, removed)`` counts."""
+    student_ids = set(student_ids)
+    with transaction.atomic():
+        current = set(cohort.memberships.values_list('student_id', flat=True))
+        removed = remove_members(cohort, current - student_ids)
+        added = add_members(cohort, student_ids - current)
+    return len(added), removed
@@ -3,132 +3,142 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from django.db.models import Count, Q
-from .models import Assignment, Submission
+from django.db.models.functions import TruncDate
+from backend import aio
+from . import versions
+from .models import Assignment, InboxEntry, Submission
 from users.models import User
 
 
+def weekly_series(assignments, today):
+    """Count assignments per day for the last 7 days with a single grouped query.
+
+    Returns ``(today_count, weekly_data)`` so callers don't need a separate
+    COUNT for today's tasks.
+    """
+    first_day = today - timedelta(days=6)
+    # a range on created_at itself; created_at__date wraps the column in a
+    # function and can't use the (owner, created_at) indexes
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+    per_day = dict(
+        assignments.filter(created_at__gte=start, created_at__lt=end)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(count=Count('id', distinct=True))
+        .values_list('day', 'count')
+    )
+
+    weekly_data = []
+    for i in range(7):
+        day = first_day + timedelta(days=i)
+        weekly_data.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'day': day.strftime('%a'),
+            'count': per_day.get(day, 0)
+        })
+    return per_day.get(today, 0), weekly_data
+
+
+def status_counts(submissions):
+    """Pending and submitted counts in one conditional aggregate."""
+    counts = submissions.aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        submitted=Count('id', filter=Q(status='submitted')),
+    )
+    return counts['pending'], counts['submitted']
+
+
+def top_students(submissions):
+    """Top 3 students by submission count, pending counted in the same pass."""
+    rows = submissions.values(
+        'student__id',
+        'student__username'
+    ).annotate(
+        submitted=Count('id', filter=Q(status='submitted')),
+        pending=Count('id', filter=Q(status='pending'))
+    ).filter(submitted__gt=0).order_by('-submitted')[:3]
+
+    return [
+        {
+            'student': student['student__username'],
+            'submitted': student['submitted'],
+            'pending': student['pending']
+        }
+        for student in rows
+    ]
+
+
+def recent_assignments(assignments):
+    return list(assignments[:5].values('id', 'title', 'description', 'due_date', 'created_at'))
+
+
+def dashboard_queries(user, today):
+    """The dashboard's independent queries as ``{name: function}``, so the
+    async view (``adashboard_stats``) can run them side by side."""
+    if user.role == 'teacher':
+        # Today's tasks and weekly task creation (last 7 days), status counts
+        # and top students across all the teacher's assignments, and the
+        # recent 5 assignments
+        assignments = Assignment.objects.filter(teacher=user)
+        submissions = Submission.objects.filter(assignment__teacher=user)
+        return {
+            'weekly': lambda: weekly_series(assignments, today),
+            'counts': lambda: status_counts(submissions),
+            'top_students': lambda: top_students(submissions),
+            'recent': lambda: recent_assignments(assignments.order_by('-created_at')),
+        }
+
+    # Student: today's tasks and weekly assignments received (last 7 days),
+    # the student's own submissions, and the 5 most recent in the inbox
+    inbox = InboxEntry.objects.filter(student=user)
+    recent = Assignment.objects.filter(inbox_entries__student=user).order_by(
+        '-inbox_entries__created_at', '-inbox_entries__assignment'
+    )
+    return {
+        'weekly': lambda: weekly_series(inbox, today),
+        'counts': lambda: status_counts(Submission.objects.filter(student=user)),
+        'recent': lambda: recent_assignments(recent),
+    }
+
+
+def dashboard_data(user, results):
+    (today_tasks, weekly_data), (pending_count, submitted_count) = results['weekly'], results['counts']
+    data = {
+        'role': 'teacher' if user.role == 'teacher' else 'student',
+        'today_tasks': today_tasks,
+        'pending_count': pending_count,
+        'submitted_count': submitted_count,
+        'weekly_data': weekly_data,
+    }
+    if user.role == 'teacher':
+        data['top_students'] = results['top_students']
+    data['recent_assignments'] = results['recent']
+    return data
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
     """Get dashboard statistics based on user role"""
-    user = request.user
     today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    
-    if user.role == 'teacher':
-        # Teacher stats
-        # Today's tasks
-        today_tasks = Assignment.objects.filter(
-            teacher=user,
-            created_at__date=today
-        ).count()
-        
-        # Pending and submitted counts across all teacher's assignments
-        teacher_assignments = Assignment.objects.filter(teacher=user)
-        all_submissions = Submission.objects.filter(assignment__in=teacher_assignments)
-        
-        pending_count = all_submissions.filter(status='pending').count()
-        submitted_count = all_submissions.filter(status='submitted').count()
-        
-        # Weekly task creation (last 7 days)
-        weekly_data = []
-        for i in range(7):
-            day = today - timedelta(days=6-i)
-            count = Assignment.objects.filter(
-                teacher=user,
-                created_at__date=day
-            ).count()
-            weekly_data.append({
-                'date': day.strftime('%Y-%m-%d'),
-                'day': day.strftime('%a'),
-                'count': count
-            })
-        
-        # Top 3 students by submission count
-        top_students = Submission.objects.filter(
-            assignment__teacher=user,
-            status='submitted'
-        ).values(
-            'student__id',
-            'student__username'
-        ).annotate(
-            submitted=Count('id', filter=Q(status='submitted')),
-            pending=Count('id', filter=Q(status='pending'))
-        ).order_by('-submitted')[:3]
-        
-        top_students_data = []
-        for student in top_students:
-            # Get actual pending count for this student
-            pending = Submission.objects.filter(
-                assignment__teacher=user,
-                student__id=student['student__id'],
-                status='pending'
-            ).count()
-            
-            top_students_data.append({
-                'student': student['student__username'],
-                'submitted': student['submitted'],
-                'pending': pending
-            })
-        
-        # Recent 5 assignments
-        recent_assignments = Assignment.objects.filter(
-            teacher=user
-        ).order_by('-created_at')[:5].values(
-            'id', 'title', 'description', 'due_date', 'created_at'
-        )
-        
-        return Response({
-            'role': 'teacher',
-            'today_tasks': today_tasks,
-            'pending_count': pending_count,
-            'submitted_count': submitted_count,
-            'weekly_data': weekly_data,
-            'top_students': top_students_data,
-            'recent_assignments': list(recent_assignments)
-        })
-    
-    else:  # student
-        # Student stats
-        # Today's tasks received
-        today_tasks = Assignment.objects.filter(
-            Q(assigned_students=user) | Q(assigned_students__isnull=True),
-            created_at__date=today
-        ).count()
-        
-        # Student's submissions
-        student_submissions = Submission.objects.filter(student=user)
-        pending_count = student_submissions.filter(status='pending').count()
-        submitted_count = student_submissions.filter(status='submitted').count()
-        
-        # Weekly assignments received (last 7 days)
-        weekly_data = []
-        for i in range(7):
-            day = today - timedelta(days=6-i)
-            count = Assignment.objects.filter(
-                Q(assigned_students=user) | Q(assigned_students__isnull=True),
-                created_at__date=day
-            ).count()
-            weekly_data.append({
-                'date': day.strftime('%Y-%m-%d'),
-                'day': day.strftime('%a'),
-                'count': count
-            })
-        
-        # Recent 5 assignments for this student
-        recent_assignments = Assignment.objects.filter(
-            Q(assigned_students=user) | Q(assigned_students__isnull=True)
-        ).order_by('-created_at')[:5].values(
-            'id', 'title', 'description', 'due_date', 'created_at'
-        )
-        
-        return Response({
-            'role': 'student',
-            'today_tasks': today_tasks,
-            'pending_count': pending_count,
-            'submitted_count': submitted_count,
-            'weekly_data': weekly_data,
-            'recent_assignments': list(recent_assignments)
-        })
+
+    def respond():
+        queries = dashboard_queries(request.user, today)
+        return Response(dashboard_data(request.user, {name: query() for name, query in queries.items()}))
+
+    # the weekly series moves on at midnight
+    return versions.conditional(request, respond, today)
+
+
+async def adashboard_stats(view, request):
+    """``dashboard_stats`` for the async read path (``backend.aio``)."""
+    today = timezone.now().date()
+
+    async def respond():
+        queries = dashboard_queries(request.user, today)
+        return Response(dashboard_data(request.user, await aio.run_queries(queries)))
+
+    return await versions.aconditional(request, respond, today)
@@ -0,0 +1,159 @@
+"""Maintenance of the per-student ``InboxEntry`` table.
+
+An assignment reaches its explicitly assigned students plus the members of
+its cohorts; one that targets neither reaches every user with
+``role='student'``, including students who register later. Entries are
+written in the same transaction as the change that causes them: assignment
+creation, (re)assignment, cohort membership edits, student registration and
+role changes (see ``assignments.signals`` and ``assignments.cohorts``). Each
+change also bumps the version counters of the students it reaches
+(``assignments.versions``).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from . import versions
+from .models import Assignment, CohortMembership, InboxEntry
+
+BATCH_SIZE = 500
+
+_state = threading.local()
+
+
+def audience_ids(assignment):
+    return set(assignment.audience().values_list('id', flat=True))
+
+
+def chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def sync_assignment(assignment):
+    """Make ``assignment``'s inbox rows match its current audience."""
+    with transaction.atomic():
+        readers = _sync(assignment)
+        # everyone who sees it, or just stopped seeing it: its audience is
+        # part of what they are shown
+        versions.assignment_changed(assignment.pk, assignment.teacher_id, readers)
+
+
+def _sync(assignment):
+    """Returns the students whose entry was kept, added or removed."""
+    target = audience_ids(assignment)
+    existing = set(InboxEntry.objects.filter(assignment=assignment).values_list('student_id', flat=True))
+    for ids in chunks(existing - target):
+        InboxEntry.objects.filter(assignment=assignment, student_id__in=ids).delete()
+    InboxEntry.objects.bulk_create(
+        [
+            InboxEntry(student_id=student_id, assignment=assignment, created_at=assignment.created_at)
+            for student_id in target - existing
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return existing | target
+
+
+def open_assignments():
+    """Assignments addressed to every student."""
+    return Assignment.objects.filter(assigned_students__isnull=True, cohorts__isnull=True)
+
+
+def add_student(user):
+    """Give a new (or newly promoted) student every open assignment."""
+    InboxEntry.objects.bulk_create(
+        [
+            InboxEntry(student=user, assignment_id=pk, created_at=created_at)
+            for pk, created_at in open_assignments().values_list('id', 'created_at')
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    # and the student list
+    versions.bump(versions.student(user.pk), versions.ROSTER)
+
+
+def remove_student(user):
+    """Drop the open assignments of a user who is no longer a student."""
+    InboxEntry.objects.filter(student=user, assignment__in=open_assignments()).delete()
+    versions.bump(versions.student(user.pk), versions.ROSTER)
+
+
+def add_cohort_members(cohort, student_ids):
+    """Give students who just joined ``cohort`` the assignments it is targeted by."""
+    assignments = list(cohort.assignments.values_list('id', 'created_at'))
+    InboxEntry.objects.bulk_create(
+        [
+            InboxEntry(student_id=student_id, assignment_id=pk, created_at=created_at)
+            for pk, created_at in assignments
+            for student_id in student_ids
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    if assignments:
+        versions.bump_students(student_ids, *(versions.assignment(pk) for pk, _ in assignments))
+
+
+def remove_cohort_members(cohort, student_ids):
+    """Drop the entries students who just left ``cohort`` only had through it.
+
+    Runs after their membership rows are gone, so "another cohort" below can
+    no longer match ``cohort`` itself.
+    """
+    direct = Assignment.assigned_students.through.objects.filter(
+        assignment=OuterRef('assignment'), user=OuterRef('student'),
+    )
+    other_cohort = CohortMembership.objects.filter(
+        student=OuterRef('student'), cohort__assignments=OuterRef('assignment'),
+    )
+    for ids in chunks(student_ids):
+        InboxEntry.objects.filter(
+            student_id__in=ids, assignment__in=cohort.assignments.all(),
+        ).exclude(Exists(direct)).exclude(Exists(other_cohort)).delete()
+    versions.bump_students(student_ids, *map(versions.assignment, cohort.assignments.values_list('id', flat=True)))
+
+
+@contextmanager
+def batch():
+    """Collapse every sync requested inside the block into one per assignment,
+    run when the block exits without error.
+
+    Creating an assignment through a serializer saves the row and then sets
+    its students; without this the first save would fan out to every student
+    only for the M2M update to take most of them back.
+    """
+    if getattr(_state, 'pending', None) is not None:
+        yield
+        return
+    _state.pending = {}
+    try:
+        yield
+        pending, _state.pending = _state.pending, None
+        for assignment in pending.values():
+            sync_assignment(assignment)
+    finally:
+        _state.pending = None
+
+
+def assignment_changed(assignment):
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        sync_assignment(assignment)
+    else:
+        pending[assignment.pk] = assignment
+
+
+def rebuild():
+    """Recompute every entry from scratch; returns the number of rows written."""
+    with transaction.atomic():
+        InboxEntry.objects.all().delete()
+        for assignment in Assignment.objects.order_by('id').iterator():
+            _sync(assignment)
+        # every inbox may have changed
+        versions.bump(versions.STUDENTS, versions.SHARED)
+        return InboxEntry.objects.count()
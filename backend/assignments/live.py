@@ -0,0 +1,85 @@
+"""Live submission roster for an assignment, over Server-Sent Events.
+
+``GET /api/assignments/<id>/submissions_status/stream/`` sends the roster
+once (``event: snapshot``, the rows of ``submissions_status``), then one
+``event: status`` per submission saved or deleted afterwards:
+``{"student_id", "status", "submitted_at", "submission_id"}``. The client
+replaces the row of that student. Changes reach the stream through
+``backend.events`` once their transaction commits.
+
+The stream ends after ``LIVE_STREAM_TIMEOUT`` seconds and the client
+reconnects, getting a fresh snapshot; changes to the audience itself (new
+students, cohort edits) show up then. The stream is an async iterator and
+holds no thread while it waits, so it is only served with
+``ASYNC_READ_VIEWS`` (the ASGI app), where ``submissions_status``
+advertises it with a ``Link: <...>; rel="live"`` header. Under WSGI each
+open stream would hold a worker; there the stream is a 404 and clients poll
+``submissions_status`` with ``If-None-Match``.
+"""
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+
+from backend import events
+
+KEEPALIVE = 15
+# milliseconds the browser waits before reconnecting (the SSE "retry" field)
+RETRY = 2000
+
+
+def channel(assignment_id):
+    return f'assignment-{assignment_id}-submissions'
+
+
+def publish_status(submission, deleted=False):
+    """Announce ``submission``'s status once the current transaction commits."""
+    event = {
+        'student_id': submission.student_id,
+        'status': 'pending' if deleted else submission.status,
+        'submitted_at': None if deleted or not submission.submitted_at else submission.submitted_at.isoformat(),
+        'submission_id': None if deleted else submission.pk,
+    }
+    name = channel(submission.assignment_id)
+    transaction.on_commit(lambda: events.publish(name, event))
+
+
+def frame(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, default=str, separators=(",", ":"))}\n\n'
+
+
+def stream_response(assignment, snapshot):
+    """An SSE response for ``assignment``; ``snapshot()`` returns the roster rows.
+
+    The subscription starts before the first snapshot, so no change falls
+    between the two; a change may arrive twice, which replaying is harmless.
+    """
+    subscription = events.subscribe(channel(assignment.pk))
+    try:
+        first = f'retry: {RETRY}\n' + frame('snapshot', snapshot())
+    except BaseException:
+        subscription.close()
+        raise
+    body = async_frames(subscription, first, snapshot, settings.LIVE_STREAM_TIMEOUT)
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx would otherwise buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def async_frames(subscription, first, snapshot, timeout):
+    with subscription:
+        yield first
+        deadline = time.monotonic() + timeout
+        while (left := deadline - time.monotonic()) > 0:
+            changes = await subscription.aget(min(KEEPALIVE, left))
+            if changes is None:  # fell too far behind: start over
+                yield frame('snapshot', await sync_to_async(snapshot)())
+            elif not changes:
+                yield ': keepalive\n\n'
+            else:
+                yield ''.join(frame('status', change) for change in changes)
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.db import FileWriteLock
+
+SCHEMA = """
+CREATE TABLE submission (
+    id INTEGER PRIMARY KEY,
+    assignment_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    content TEXT,
+    status TEXT NOT NULL,
+    submitted_at REAL NOT NULL,
+    UNIQUE (assignment_id, student_id)
+);
+"""
+
+
+def connect(path, profile):
+    if profile == 'default':
+        # what settings.py used to get: rollback journal, deferred BEGIN, 5s timeout
+        return sqlite3.connect(path, timeout=5, isolation_level=None)
+    conn = sqlite3.connect(path, isolation_level=None)
+    for pragma in settings.DATABASES['default']['OPTIONS']['init_command'].split(';'):
+        if pragma.strip():
+            conn.execute(pragma)
+    return conn
+
+
+def save_draft(conn, profile, assignment_id, student_id, payload):
+    """One draft save: look the row up, then update it, as the view does."""
+    conn.execute('BEGIN' if profile == 'default' else 'BEGIN IMMEDIATE')
+    try:
+        row = conn.execute(
+            'SELECT id FROM submission WHERE assignment_id = ? AND student_id = ?', (assignment_id, student_id),
+        ).fetchone()
+        conn.execute(
+            'UPDATE submission SET content = ?, submitted_at = ? WHERE id = ?', (payload, time.time(), row[0]),
+        )
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def worker(path, profile, saves, assignments, students, seed):
+    rng = random.Random(seed)
+    payload = 'x' * 2048
+    latencies, failures = [], 0
+    conn = None if profile == 'default' else connect(path, profile)
+    for _ in range(saves):
+        started = time.perf_counter()
+        try:
+            if profile == 'default':
+                # no CONN_MAX_AGE: every request opened the file again
+                conn = connect(path, profile)
+            # a read alongside each write, like the list the student is looking at
+            conn.execute('SELECT COUNT(*) FROM submission WHERE student_id = ?', (rng.randrange(students),)).fetchone()
+            args = (conn, profile, rng.randrange(assignments), rng.randrange(students), payload)
+            if profile == 'default':
+                save_draft(*args)
+            else:
+                with FileWriteLock(path + '.write-lock'):
+                    save_draft(*args)
+        except sqlite3.OperationalError:
+            failures += 1
+        finally:
+            if profile == 'default' and conn is not None:
+                conn.close()
+        latencies.append(time.perf_counter() - started)
+    return latencies, failures
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent draft saves against a scratch SQLite file, with the "
+        "old default configuration and with the production profile from settings "
+        "(WAL, pragmas, persistent connections, IMMEDIATE transactions and the "
+        "write queue)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent writer processes.")
+        parser.add_argument('--saves', type=int, default=300, help="Draft saves per worker.")
+        parser.add_argument('--profile', choices=('default', 'production', 'both'), default='both')
+
+    def handle(self, *args, **options):
+        profiles = ('default', 'production') if options['profile'] == 'both' else (options['profile'],)
+        results = {}
+        for profile in profiles:
+            results[profile] = self.run(profile, options['workers'], options['saves'])
+            self.report(profile, *results[profile])
+        if len(results) == 2:
+            before, after = results['default'][0], results['production'][0]
+            self.stdout.write(self.style.SUCCESS(f"Throughput {after / before:.1f}x the default configuration."))
+
+    def run(self, profile, workers, saves, assignments=50, students=200):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            conn = connect(path, profile)
+            conn.executescript(SCHEMA)
+            conn.executemany(
+                'INSERT INTO submission (assignment_id, student_id, content, status, submitted_at) VALUES (?, ?, ?, ?, ?)',
+                [(a, s, '', 'draft', 0) for a in range(assignments) for s in range(students)],
+            )
+            conn.close()
+
+            started = time.perf_counter()
+            with multiprocessing.get_context('spawn').Pool(workers) as pool:
+                outcomes = pool.starmap(worker, [
+                    (path, profile, saves, assignments, students, seed) for seed in range(workers)
+                ])
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for outcome in outcomes for latency in outcome[0])
+        failures = sum(outcome[1] for outcome in outcomes)
+        succeeded = len(latencies) - failures
+        return succeeded / elapsed, failures, len(latencies), latencies
+
+    def report(self, profile, throughput, failures, attempts, latencies):
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        self.stdout.write(
+            f"{profile:>10}: {throughput:8.1f} saves/s, {failures}/{attempts} failed "
+            f"(database is locked), p50 {p50:.1f} ms, p99 {p99:.1f} ms"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from assignments import inbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every student's assignment inbox from assignments and "
+        "their assigned students, e.g. after bulk edits made with .update()."
+    )
+
+    def handle(self, *args, **options):
+        rows = inbox.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt inbox with {rows} entr{'y' if rows == 1 else 'ies'}."))
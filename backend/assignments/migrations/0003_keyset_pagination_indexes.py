@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0002_submission_status_alter_submission_content_and_more'),
+        ('models3d', '0003_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['created_at', 'id'], name='assignment_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['teacher', 'created_at', 'id'], name='assignment_teacher_created_idx'),
+        ),
+    ]
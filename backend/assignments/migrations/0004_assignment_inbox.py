@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_inbox(apps, schema_editor):
+    Assignment = apps.get_model('assignments', 'Assignment')
+    InboxEntry = apps.get_model('assignments', 'InboxEntry')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    students = list(User.objects.filter(role='student').values_list('id', flat=True))
+    for assignment in Assignment.objects.order_by('id').iterator():
+        audience = list(assignment.assigned_students.values_list('id', flat=True)) or students
+        InboxEntry.objects.bulk_create(
+            [InboxEntry(student_id=pk, assignment=assignment, created_at=assignment.created_at) for pk in audience],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0003_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='assignments.assignment')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', 'created_at', 'assignment'], name='inbox_student_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'assignment'), name='inbox_student_assignment_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0004_assignment_inbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cohort',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_cohorts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='cohorts',
+            field=models.ManyToManyField(blank=True, related_name='assignments', to='assignments.cohort'),
+        ),
+        migrations.CreateModel(
+            name='CohortMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('cohort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='assignments.cohort')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cohort_memberships', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cohort',
+            name='members',
+            field=models.ManyToManyField(blank=True, related_name='member_of', through='assignments.CohortMembership', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='cohortmembership',
+            index=models.Index(fields=['student', 'cohort'], name='cohort_member_student_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cohortmembership',
+            constraint=models.UniqueConstraint(fields=('cohort', 'student'), name='cohort_member_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='cohort',
+            index=models.Index(fields=['teacher', 'id'], name='cohort_teacher_id_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0005_cohorts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['assignment', 'status', 'student'], name='submission_assign_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['student', 'status'], name='submission_student_status_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 from models3d.models import Model3D
 
@@ -10,13 +11,79 @@ class Assignment(models.Model):
     teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_assignments')
     model = models.ForeignKey(Model3D, on_delete=models.CASCADE, related_name='assignments')
     assigned_students = models.ManyToManyField(User, related_name='assigned_tasks', blank=True)
+    cohorts = models.ManyToManyField('Cohort', related_name='assignments', blank=True)
     due_date = models.DateTimeField()
     tasks = models.JSONField(help_text="List of tasks/questions for the student")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='assignment_created_id_idx'),
+            models.Index(fields=['teacher', 'created_at', 'id'], name='assignment_teacher_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def is_open(self):
+        """True when the assignment targets neither students nor cohorts,
+        i.e. it is for every student."""
+        return not Assignment.objects.filter(
+            Q(assigned_students__isnull=False) | Q(cohorts__isnull=False), pk=self.pk,
+        ).exists()
+
+    def audience(self):
+        """The students this assignment is for, as a ``User`` queryset.
+
+        Students assigned directly plus the current members of its cohorts,
+        or every student for an open assignment.
+        """
+        if self.is_open():
+            return User.objects.filter(role='student')
+        direct = Assignment.assigned_students.through.objects.filter(assignment=self).values('user')
+        via_cohort = CohortMembership.objects.filter(cohort__assignments=self).values('student')
+        return User.objects.filter(Q(pk__in=direct) | Q(pk__in=via_cohort))
+
+
+class Cohort(models.Model):
+    """A teacher's class or group, assignable as a whole.
+
+    Targeting a cohort stores one row per assignment instead of one per
+    student, and membership changes apply to every assignment at once.
+    Change members through ``assignments.cohorts`` so inboxes follow.
+    """
+    name = models.CharField(max_length=100)
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_cohorts')
+    members = models.ManyToManyField(User, through='CohortMembership', related_name='member_of', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['teacher', 'id'], name='cohort_teacher_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class CohortMembership(models.Model):
+    cohort = models.ForeignKey(Cohort, on_delete=models.CASCADE, related_name='memberships')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cohort_memberships')
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cohort', 'student'], name='cohort_member_uniq'),
+        ]
+        indexes = [
+            # "which cohorts is this student in", for audience and inbox checks
+            models.Index(fields=['student', 'cohort'], name='cohort_member_student_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} in {self.cohort_id}"
+
 class Submission(models.Model):
     STATUS_CHOICES = (
         ('draft', 'Draft'),
@@ -33,6 +100,51 @@ class Submission(models.Model):
 
     class Meta:
         unique_together = ('assignment', 'student')
+        indexes = [
+            # status counts and per-student tallies across a teacher's
+            # assignments, answered from the index alone
+            models.Index(fields=['assignment', 'status', 'student'], name='submission_assign_status_idx'),
+            # a student's own submissions and their status counts
+            models.Index(fields=['student', 'status'], name='submission_student_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.assignment.title}"
+
+
+class InboxEntry(models.Model):
+    """One row per (student, assignment) the student can see.
+
+    A denormalized copy of "assigned to me, or to every student" so a student's
+    list is one range scan of ``inbox_student_created_idx`` instead of a LEFT
+    JOIN on the M2M table plus DISTINCT. Kept in sync by ``assignments.inbox``.
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inbox')
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='inbox_entries')
+    # copy of assignment.created_at, so ordering never leaves the index
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'assignment'], name='inbox_student_assignment_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['student', 'created_at', 'assignment'], name='inbox_student_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} <- {self.assignment_id}"
+
+
+class Version(models.Model):
+    """Change counter for one scope of responses: a teacher's, a student's,
+    an assignment's, or a shared one (``assignments.versions``).
+
+    Bumped in the transaction of the write it stands for, and read to build
+    ETags. A scope with no row is at version 0.
+    """
+    scope = models.CharField(max_length=64, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope}@{self.value}"
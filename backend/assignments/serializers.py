@@ -1,7 +1,36 @@
+from collections import defaultdict
+
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Assignment, Submission
-from users.serializers import UserSerializer
-from models3d.serializers import Model3DSerializer
+from .models import Assignment, Cohort, Submission
+from users.models import User
+from users.serializers import UserRowSerializer, UserSerializer
+from backend import lean
+from backend.images import DerivativeField
+from models3d.serializers import Model3DRowSerializer, Model3DSerializer
+
+
+def prefetch_my_submission(user, lookup='submissions', deep=False):
+    """Prefetch ``user``'s submission for every assignment in one query.
+
+    The result lands on ``assignment.my_submissions`` (a list with zero or one
+    entries) where ``AssignmentSerializer.get_my_submission`` picks it up.
+    """
+    queryset = Submission.objects.filter(student=user)
+    if deep:
+        queryset = queryset.select_related('student')
+    return Prefetch(lookup, queryset=queryset, to_attr='my_submissions')
+
+
+class SubmissionSummarySerializer(serializers.ModelSerializer):
+    """Flat view of a submission, with ids in place of nested objects."""
+
+    class Meta:
+        model = Submission
+        fields = ['id', 'assignment', 'student', 'status', 'content', 'screenshot',
+                  'grade', 'feedback', 'submitted_at']
+        read_only_fields = fields
+
 
 class AssignmentSerializer(serializers.ModelSerializer):
     teacher = UserSerializer(read_only=True)
@@ -13,19 +42,119 @@ class AssignmentSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ('teacher', 'created_at')
 
+    def validate_cohorts(self, cohorts):
+        request = self.context.get('request')
+        if request and any(cohort.teacher_id != request.user.id for cohort in cohorts):
+            raise serializers.ValidationError("You can only assign your own cohorts.")
+        return cohorts
+
     def get_my_submission(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
+        if not (request and request.user.is_authenticated):
+            return None
+
+        if hasattr(obj, 'my_submissions'):
+            submission = obj.my_submissions[0] if obj.my_submissions else None
+        else:
             submission = Submission.objects.filter(assignment=obj, student=request.user).first()
-            if submission:
-                return SubmissionSerializer(submission).data
-        return None
+        if submission is None:
+            return None
+
+        # The old, fully nested shape is opt-in via ?expand=my_submission
+        if self.context.get('expand_submission'):
+            return SubmissionSerializer(submission).data
+        return SubmissionSummarySerializer(submission).data
+
+
+class AssignmentRowSerializer(lean.RowSerializer):
+    """``AssignmentSerializer`` for list responses (``backend.lean``), with
+    the flat ``my_submission``. The audience ids and the caller's
+    submissions are loaded for the whole page in ``prepare()``, one query
+    each, as the prefetches of the DRF path do."""
+    columns = (
+        'id', 'title', 'description', 'due_date', 'tasks', 'created_at', 'model',
+        *lean.nested('teacher__', UserRowSerializer), *lean.nested('model__', Model3DRowSerializer),
+    )
+    submission_columns = ('id', 'assignment', 'student', 'status', 'content', 'screenshot',
+                          'grade', 'feedback', 'submitted_at')
+
+    def prepare(self, rows):
+        self.students, self.cohorts, self.submissions = {}, {}, {}
+        if not rows:
+            return
+        ids = [row['id'] for row in rows]
+        self.students = related_ids(Assignment.assigned_students.through, 'user_id', ids)
+        self.cohorts = related_ids(Assignment.cohorts.through, 'cohort_id', ids)
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            mine = Submission.objects.filter(student_id=request.user.pk, assignment_id__in=ids)
+            summary = self.submission_mapper()
+            self.submissions = {row['assignment']: summary(row) for row in mine.values(*self.submission_columns)}
+
+    def submission_mapper(self):
+        # SubmissionSummarySerializer, which is built without the request
+        url = lean.file_url(Submission._meta.get_field('screenshot').storage)
+
+        def screenshot(row):
+            return url(row['screenshot']) if row['screenshot'] else None
+
+        return lean.compile_row([
+            (column, screenshot if column == 'screenshot' else column) for column in self.submission_columns
+        ])
+
+    def fields(self, prefix=''):
+        id_ = prefix + 'id'
+        students, cohorts, submissions = self.students, self.cohorts, self.submissions
+        return [
+            ('id', id_),
+            ('teacher', UserRowSerializer(many=True, context=self.context).mapper(prefix + 'teacher__')),
+            ('model_obj', Model3DRowSerializer(many=True, context=self.context).mapper(prefix + 'model__')),
+            ('my_submission', lambda row: submissions.get(row[id_])),
+            *((column, prefix + column) for column in (
+                'title', 'description', 'due_date', 'tasks', 'created_at', 'model',
+            )),
+            ('assigned_students', lambda row: students.get(row[id_], [])),
+            ('cohorts', lambda row: cohorts.get(row[id_], [])),
+        ]
+
+
+def related_ids(through, column, assignment_ids):
+    """``{assignment id: [related ids]}`` from an M2M ``through`` table, ids ascending."""
+    found = defaultdict(list)
+    rows = through.objects.filter(assignment_id__in=assignment_ids).order_by(column)
+    for assignment_id, related_id in rows.values_list('assignment_id', column):
+        found[assignment_id].append(related_id)
+    return found
+
 
 class SubmissionSerializer(serializers.ModelSerializer):
     student = UserSerializer(read_only=True)
     assignment_obj = AssignmentSerializer(source='assignment', read_only=True)
+    screenshot_thumb = DerivativeField(source='screenshot')
 
     class Meta:
         model = Submission
         fields = '__all__'
         read_only_fields = ('student', 'submitted_at')
+
+
+class CohortSerializer(serializers.ModelSerializer):
+    member_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Cohort
+        fields = ['id', 'name', 'teacher', 'member_count', 'created_at']
+        read_only_fields = ('teacher', 'created_at')
+
+
+class CohortMembersSerializer(serializers.Serializer):
+    """Body of a membership edit: ``{"students": [id, ...]}``."""
+    students = serializers.ListField(child=serializers.IntegerField(), allow_empty=True, max_length=10000)
+
+    def validate_students(self, ids):
+        ids = set(ids)
+        found = set(User.objects.filter(pk__in=ids, role='student').values_list('id', flat=True))
+        missing = ids - found
+        if missing:
+            raise serializers.ValidationError(f"Not students: {sorted(missing)}")
+        return ids
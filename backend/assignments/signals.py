@@ -0,0 +1,172 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from backend.images import derivatives_written
+from models3d.models import Model3D
+from models3d.thumbnails import thumbnails_rendered
+from users.models import Model3D as UserModel3D, User
+from users.serializers import UserSerializer
+from . import inbox, live, versions
+from .models import Assignment, Cohort, Submission
+
+# M2M through models that decide an assignment's audience, and the field
+TARGETS = {
+    Assignment.assigned_students.through: 'assigned_students',
+    Assignment.cohorts.through: 'cohorts',
+}
+
+
+@receiver(post_save, sender=Assignment)
+def fill_inbox_for_new_assignment(sender, instance, created, **kwargs):
+    if created:
+        inbox.assignment_changed(instance)
+
+
+def resync_inbox_on_reassignment(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # e.g. user.assigned_tasks.clear(): remember which assignments lose them
+        field = TARGETS[sender]
+        instance._cleared_assignments = list(
+            Assignment.objects.filter(**{field: instance}).values_list('id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        inbox.assignment_changed(instance)
+        return
+    ids = instance.__dict__.pop('_cleared_assignments', []) if action == 'post_clear' else pk_set
+    for assignment in Assignment.objects.filter(pk__in=ids):
+        inbox.assignment_changed(assignment)
+
+
+for through in TARGETS:
+    m2m_changed.connect(resync_inbox_on_reassignment, sender=through)
+
+
+@receiver(pre_delete, sender=Cohort)
+def remember_cohort_assignments(sender, instance, **kwargs):
+    # the M2M rows go with the cohort, without an m2m_changed signal
+    instance._targeted_assignments = list(instance.assignments.all())
+
+
+@receiver(post_delete, sender=Cohort)
+def resync_inbox_for_deleted_cohort(sender, instance, **kwargs):
+    ids = [assignment.pk for assignment in instance.__dict__.pop('_targeted_assignments', [])]
+    if not ids:
+        return
+
+    def resync():
+        # the same cascade (e.g. deleting the teacher) may remove the assignments too
+        for assignment in Assignment.objects.filter(pk__in=ids):
+            inbox.assignment_changed(assignment)
+
+    transaction.on_commit(resync)
+
+
+@receiver(post_save, sender=Submission)
+def publish_submission_status(sender, instance, **kwargs):
+    live.publish_status(instance)
+
+
+@receiver(post_delete, sender=Submission)
+def publish_submission_removal(sender, instance, **kwargs):
+    live.publish_status(instance, deleted=True)
+
+
+# Version counters for ETags and the response cache (assignments.versions).
+# Audience and role changes bump theirs in assignments.inbox, where the
+# affected students are known.
+
+@receiver(post_save, sender=Assignment)
+def bump_assignment_versions(sender, instance, created, **kwargs):
+    # a new assignment has no readers until its inbox is filled
+    versions.assignment_changed(instance.pk, instance.teacher_id, () if created else None)
+
+
+@receiver(pre_delete, sender=Assignment)
+def remember_assignment_readers(sender, instance, **kwargs):
+    # its inbox rows and submissions go with it
+    instance._readers = versions.readers(instance.pk)
+
+
+@receiver(post_delete, sender=Assignment)
+def bump_deleted_assignment_versions(sender, instance, **kwargs):
+    versions.assignment_changed(instance.pk, instance.teacher_id, instance.__dict__.pop('_readers', None))
+
+
+@receiver(post_save, sender=Submission)
+@receiver(post_delete, sender=Submission)
+def bump_submission_versions(sender, instance, **kwargs):
+    if Submission.assignment.is_cached(instance):
+        teacher_id = instance.assignment.teacher_id
+    else:
+        teacher_id = Assignment.objects.filter(pk=instance.assignment_id).values_list('teacher_id', flat=True).first()
+    versions.bump(versions.student(instance.student_id), versions.assignment(instance.assignment_id),
+                  *([versions.teacher(teacher_id)] if teacher_id else []))
+
+
+@receiver(derivatives_written, sender=Submission)
+def bump_versions_for_screenshot(sender, pk, **kwargs):
+    # the job renamed the screenshot and wrote its thumbnails without a save
+    submission = Submission.objects.select_related('assignment').filter(pk=pk).first()
+    if submission is not None:
+        bump_submission_versions(Submission, submission)
+
+
+SHOWN_USER_FIELDS = set(UserSerializer.Meta.fields)
+
+
+@receiver(post_save, sender=User)
+def bump_versions_for_profile(sender, instance, created, update_fields=None, **kwargs):
+    # nothing shows a new user yet; their inbox bumps their own scope
+    if not created and (update_fields is None or SHOWN_USER_FIELDS & set(update_fields)):
+        versions.bump(versions.SHARED)
+
+
+@receiver(post_save, sender=Model3D)
+def bump_versions_for_model(sender, instance, created, **kwargs):
+    # no assignment shows a new model yet
+    versions.bump(versions.MODELS, *([] if created else [versions.SHARED]))
+
+
+@receiver(post_save, sender=UserModel3D)
+@receiver(post_delete, sender=UserModel3D)
+def bump_versions_for_own_model(sender, instance, **kwargs):
+    versions.bump(versions.MODELS)
+
+
+@receiver(thumbnails_rendered)
+def bump_versions_for_thumbnails(sender, name, **kwargs):
+    # catalogs and assignments show them; the blob may be any model's
+    versions.bump(versions.MODELS, versions.SHARED)
+
+
+@receiver(post_delete, sender=User)
+def bump_versions_for_deleted_user(sender, instance, **kwargs):
+    versions.bump(versions.SHARED)
+
+
+@receiver(post_delete, sender=Model3D)
+def bump_versions_for_deleted_model(sender, instance, **kwargs):
+    versions.bump(versions.MODELS, versions.SHARED)
+
+
+@receiver(pre_save, sender=User)
+def remember_role(sender, instance, **kwargs):
+    # User.from_db records the role it was loaded with
+    loaded = getattr(instance, '_loaded_access', None)
+    instance._previous_role = loaded[0] if loaded else None
+
+
+@receiver(post_save, sender=User)
+def update_inbox_for_role(sender, instance, created, **kwargs):
+    previous = None if created else instance.__dict__.pop('_previous_role', None)
+    if not created and previous is None:
+        return  # loaded without its role; nothing to compare against
+    was_student, is_student = previous == 'student', instance.role == 'student'
+    if is_student and not was_student:
+        inbox.add_student(instance)
+    elif was_student and not is_student:
+        inbox.remove_student(instance)
@@ -0,0 +1,1085 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from base64 import b64encode
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from backend import cache, images, instrumentation, lean
+from backend.db import write_queue
+from models3d import thumbnails
+from models3d.models import Model3D
+from users import authentication
+from users.models import Model3D as CatalogModel, User
+from users.serializers import CustomTokenObtainPairSerializer
+from . import cohorts, inbox, versions
+from .models import Assignment, Cohort, InboxEntry, Submission, Version
+
+# a plan step reading every row of a table or index: "SCAN t", "SCAN t USING
+# INDEX i"; scans of a subquery's results or a constant row are fine
+FULL_SCAN_RE = re.compile(r'^SCAN (?!CONSTANT ROW|\()')
+
+
+class AssignmentTestCase(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create(username='teacher', role='teacher')
+        self.model = Model3D.objects.create(title='Heart', subject='Biology', file='3d_models/heart.glb', uploaded_by=self.teacher)
+        self.client = APIClient()
+
+    def make_assignments(self, count, students=(), days_back=7):
+        now = timezone.now()
+        for i in range(count):
+            assignment = Assignment.objects.create(
+                title=f'Task {i}', description='', teacher=self.teacher, model=self.model,
+                due_date=now + timedelta(days=1), tasks=['q1'],
+            )
+            if students:
+                assignment.assigned_students.set(students)
+            # backdate the copy in the inbox too: created_at is never edited outside tests
+            created_at = now - timedelta(days=i % days_back)
+            Assignment.objects.filter(pk=assignment.pk).update(created_at=created_at)
+            InboxEntry.objects.filter(assignment=assignment).update(created_at=created_at)
+
+    def make_students(self, count, offset=0):
+        return [
+            User.objects.create(username=f'student{offset + i}', role='student')
+            for i in range(count)
+        ]
+
+
+
+# counts the queries of the view itself, not of a response cache hit
+@override_settings(RESPONSE_CACHE=None)
+class DashboardStatsTests(AssignmentTestCase):
+    def get_stats(self, user, queries):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(queries):
+            response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_teacher_stats(self):
+        students = self.make_students(4)
+        self.make_assignments(3, students=students[:2])
+        assignments = list(Assignment.objects.all())
+        for student in students[:2]:
+            for assignment in assignments:
+                Submission.objects.create(assignment=assignment, student=student, status='submitted')
+        Submission.objects.create(assignment=assignments[0], student=students[2], status='draft')
+
+        data = self.get_stats(self.teacher, 5)
+
+        self.assertEqual(data['role'], 'teacher')
+        self.assertEqual(data['today_tasks'], 1)
+        self.assertEqual(data['submitted_count'], 6)
+        self.assertEqual(data['pending_count'], 0)
+        self.assertEqual(len(data['weekly_data']), 7)
+        self.assertEqual(data['weekly_data'][-1]['date'], timezone.now().date().strftime('%Y-%m-%d'))
+        self.assertEqual(sum(day['count'] for day in data['weekly_data']), 3)
+        self.assertEqual(
+            sorted(s['student'] for s in data['top_students']),
+            ['student0', 'student1'],
+        )
+        self.assertEqual(data['top_students'][0]['submitted'], 3)
+        self.assertEqual(len(data['recent_assignments']), 3)
+
+    def test_teacher_query_count_is_constant(self):
+        students = self.make_students(20)
+        self.make_assignments(30, students=students[:10])
+        for student in students:
+            Submission.objects.create(assignment=Assignment.objects.first(), student=student, status='submitted')
+
+        data = self.get_stats(self.teacher, 5)
+        self.assertEqual(len(data['top_students']), 3)
+
+    def test_student_stats(self):
+        student, other = self.make_students(2)
+        self.make_assignments(2, students=[student, other])
+        self.make_assignments(3)  # "all students" assignments
+        self.make_assignments(1, students=[other])
+        Submission.objects.create(assignment=Assignment.objects.first(), student=student, status='submitted')
+
+        data = self.get_stats(student, 4)
+
+        self.assertEqual(data['role'], 'student')
+        self.assertEqual(sum(day['count'] for day in data['weekly_data']), 5)
+        self.assertEqual(data['today_tasks'], 2)
+        self.assertEqual(data['submitted_count'], 1)
+        self.assertEqual(len(data['recent_assignments']), 5)
+
+
+# counts the queries of the view itself, not of a response cache hit
+@override_settings(RESPONSE_CACHE=None)
+class AssignmentListTests(AssignmentTestCase):
+    def list_assignments(self, user, queries, params=''):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(queries):
+            response = self.client.get(f'/api/assignments/{params}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_student_list_query_count_is_constant(self):
+        student = self.make_students(1)[0]
+        self.make_assignments(3, students=[student])
+        self.list_assignments(student, 5)
+
+        self.make_assignments(30, students=[student])
+        self.make_assignments(10)
+        for assignment in Assignment.objects.all()[:20]:
+            Submission.objects.create(assignment=assignment, student=student, status='draft')
+        data = self.list_assignments(student, 5)
+        self.assertEqual(len(data), 43)
+        self.assertEqual(sum(1 for a in data if a['my_submission']), 20)
+
+    def test_my_submission_is_flat_by_default(self):
+        student = self.make_students(1)[0]
+        self.make_assignments(1, students=[student])
+        assignment = Assignment.objects.get()
+        submission = Submission.objects.create(assignment=assignment, student=student, content=[{'answer': 'x'}])
+
+        data = self.list_assignments(student, 5)
+        mine = data[0]['my_submission']
+        self.assertEqual(mine['id'], submission.id)
+        self.assertEqual(mine['assignment'], assignment.id)
+        self.assertEqual(mine['student'], student.id)
+        self.assertEqual(mine['status'], 'draft')
+        self.assertEqual(mine['content'], [{'answer': 'x'}])
+        self.assertNotIn('assignment_obj', mine)
+
+    def test_expand_restores_nested_submission(self):
+        student = self.make_students(1)[0]
+        self.make_assignments(5, students=[student])
+        for assignment in Assignment.objects.all():
+            Submission.objects.create(assignment=assignment, student=student)
+
+        data = self.list_assignments(student, 5, '?expand=my_submission')
+        mine = data[0]['my_submission']
+        self.assertEqual(mine['student']['username'], student.username)
+        self.assertEqual(mine['assignment_obj']['id'], data[0]['id'])
+        self.assertEqual(mine['assignment_obj']['teacher']['id'], self.teacher.id)
+
+    def test_teacher_list_query_count_is_constant(self):
+        self.make_assignments(25)
+        data = self.list_assignments(self.teacher, 5)
+        self.assertEqual(len(data), 25)
+        self.assertIsNone(data[0]['my_submission'])
+
+
+@override_settings(LEGACY_UNPAGINATED_LISTS=False, RESPONSE_CACHE=None)
+class PaginationTests(AssignmentTestCase):
+    def walk(self, user, url, queries):
+        self.client.force_authenticate(user)
+        seen = []
+        while url:
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.json()['results'])
+            url = response.json()['next']
+        return seen
+
+    def test_assignment_pages_follow_created_at_then_id(self):
+        self.make_assignments(12, days_back=3)  # plenty of created_at ties
+        expected = list(Assignment.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        seen = self.walk(self.teacher, '/api/assignments/?page_size=5', 5)
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_the_prior_page(self):
+        self.make_assignments(7)
+        self.client.force_authenticate(self.teacher)
+        first = self.client.get('/api/assignments/?page_size=3').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertIsNone(first['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_student_directory_pages_by_id(self):
+        students = self.make_students(11)
+        seen = self.walk(self.teacher, '/api/users/students/?page_size=4', 2)
+        self.assertEqual(seen, [s.id for s in students])
+
+    def test_invalid_cursor_is_404(self):
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get('/api/users/students/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_values_are_404(self):
+        student = self.make_students(1)[0]
+        self.make_assignments(2, students=[student])
+
+        def cursor(values):
+            return b64encode(json.dumps({'v': values, 'r': 0}).encode()).decode()
+
+        cases = [
+            (self.teacher, '/api/assignments/', ['notadate', 1]),
+            (self.teacher, '/api/assignments/', [None, None]),
+            (self.teacher, '/api/assignments/', ['2026-01-01T00:00:00', 'x']),
+            (self.teacher, '/api/assignments/', ['2026-01-01T00:00:00Z', 10 ** 30]),
+            (student, '/api/assignments/', [{'a': 1}, 1]),
+            (self.teacher, '/api/users/students/', ['x']),
+            (self.teacher, '/api/users/students/', [None]),
+        ]
+        for user, path, values in cases:
+            with self.subTest(path=path, values=values):
+                self.client.force_authenticate(user)
+                response = self.client.get(path, {'cursor': cursor(values)})
+                self.assertEqual(response.status_code, 404)
+
+        # a naive datetime is read in the current time zone
+        self.client.force_authenticate(self.teacher)
+        later = (timezone.now() + timedelta(days=1)).replace(tzinfo=None).isoformat()
+        response = self.client.get('/api/assignments/', {'cursor': cursor([later, 1])})
+        self.assertEqual(len(response.json()['results']), 2)
+
+    @override_settings(LEGACY_UNPAGINATED_LISTS=True)
+    def test_legacy_switch_keeps_plain_list(self):
+        self.make_students(3)
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(len(self.client.get('/api/users/students/').json()), 3)
+        paged = self.client.get('/api/users/students/?page_size=2').json()
+        self.assertEqual(len(paged['results']), 2)
+
+
+class InboxTests(AssignmentTestCase):
+    def inbox_of(self, student):
+        return set(InboxEntry.objects.filter(student=student).values_list('assignment_id', flat=True))
+
+    def create(self, **data):
+        self.client.force_authenticate(self.teacher)
+        data = {
+            'title': 'Task', 'description': 'Label the chambers', 'model': self.model.id,
+            'due_date': (timezone.now() + timedelta(days=1)).isoformat(), 'tasks': ['q1'], **data,
+        }
+        response = self.client.post('/api/assignments/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def test_open_assignment_reaches_every_student_including_new_ones(self):
+        first, second = self.make_students(2)
+        assignment = self.create()
+        self.assertEqual(self.inbox_of(first), {assignment})
+        self.assertEqual(self.inbox_of(self.teacher), set())
+
+        late = self.make_students(1, offset=2)[0]
+        self.assertEqual(self.inbox_of(late), {assignment})
+        self.assertEqual(InboxEntry.objects.count(), 3)
+
+    def test_explicit_audience_and_reassignment(self):
+        first, second, third = self.make_students(3)
+        assignment = self.create(assigned_students=[first.id])
+        self.assertEqual(InboxEntry.objects.filter(assignment=assignment).count(), 1)
+        self.assertEqual(self.inbox_of(second), set())
+        self.make_students(1, offset=3)  # registering doesn't join an explicit audience
+        self.assertEqual(InboxEntry.objects.filter(assignment=assignment).count(), 1)
+
+        response = self.client.patch(f'/api/assignments/{assignment}/', {'assigned_students': [second.id, third.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.inbox_of(first), set())
+        self.assertEqual(self.inbox_of(second), {assignment})
+
+        # clearing the audience opens it to everyone
+        Assignment.objects.get(pk=assignment).assigned_students.clear()
+        self.assertEqual(InboxEntry.objects.filter(assignment=assignment).count(), 4)
+
+    def test_reverse_assignment_and_role_changes(self):
+        student, other = self.make_students(2)
+        self.make_assignments(1, students=[other])
+        explicit = Assignment.objects.get()
+        self.make_assignments(1)
+        open_ = Assignment.objects.exclude(pk=explicit.pk).get()
+
+        student.assigned_tasks.add(explicit)
+        self.assertEqual(self.inbox_of(student), {explicit.id, open_.id})
+        other.assigned_tasks.clear()
+        self.assertEqual(self.inbox_of(other), {open_.id})
+
+        student = User.objects.get(pk=student.pk)
+        student.role = 'teacher'
+        student.save()
+        self.assertEqual(self.inbox_of(student), {explicit.id})
+        student.role = 'student'
+        student.save()
+        self.assertEqual(self.inbox_of(student), {explicit.id, open_.id})
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        students = self.make_students(3)
+        self.make_assignments(2, students=students[:1])
+        self.make_assignments(2)
+        expected = set(InboxEntry.objects.values_list('student_id', 'assignment_id'))
+        InboxEntry.objects.all().delete()
+        self.assertEqual(inbox.rebuild(), 2 + 2 * 3)
+        self.assertEqual(set(InboxEntry.objects.values_list('student_id', 'assignment_id')), expected)
+
+    @override_settings(LEGACY_UNPAGINATED_LISTS=False)
+    def test_student_pages_follow_inbox_order(self):
+        student = self.make_students(1)[0]
+        self.make_assignments(6, students=[student], days_back=2)
+        self.make_assignments(5, days_back=2)
+        expected = list(Assignment.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        self.client.force_authenticate(student)
+        seen, url = [], '/api/assignments/?page_size=4'
+        while url:
+            page = self.client.get(url).json()
+            seen.extend(row['id'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(seen, expected)
+
+
+# counts the queries of the view itself, not of a response cache hit
+@override_settings(RESPONSE_CACHE=None)
+class SubmissionsStatusTests(AssignmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = self.make_students(6)
+        self.make_assignments(1)
+        self.assignment = Assignment.objects.get()
+        Submission.objects.create(assignment=self.assignment, student=self.students[0], status='submitted')
+        Submission.objects.create(assignment=self.assignment, student=self.students[1], status='draft')
+        self.client.force_authenticate(self.teacher)
+
+    # the assignment, its versions (the ETag), its audience, the rows
+    def status_list(self, params='', queries=4):
+        with self.assertNumQueries(queries):
+            response = self.client.get(f'/api/assignments/{self.assignment.pk}/submissions_status/{params}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_everyone_assignment_lists_all_students(self):
+        rows = self.status_list()
+        self.assertEqual([r['student']['id'] for r in rows], [s.id for s in self.students])
+        self.assertEqual([r['status'] for r in rows[:3]], ['submitted', 'draft', 'pending'])
+        self.assertIsNone(rows[2]['submission_id'])
+        self.assertIsNone(rows[2]['submitted_at'])
+
+    def test_explicit_audience_and_status_filter(self):
+        self.assignment.assigned_students.set(self.students[1:4])
+        rows = self.status_list('?status=pending')
+        self.assertEqual([r['student']['id'] for r in rows], [s.id for s in self.students[2:4]])
+        rows = self.status_list('?status=draft')
+        self.assertEqual([r['student']['username'] for r in rows], ['student1'])
+
+    def test_invalid_status_filter(self):
+        response = self.client.get(f'/api/assignments/{self.assignment.pk}/submissions_status/?status=late')
+        self.assertEqual(response.status_code, 400)
+
+    def test_pages_by_student_id(self):
+        page = self.status_list('?page_size=4')
+        self.assertEqual(len(page['results']), 4)
+        rest = self.client.get(page['next']).json()
+        self.assertEqual(len(rest['results']), 2)
+        self.assertIsNone(rest['next'])
+
+    def test_csv_export_streams_roster(self):
+        response = self.client.get(f'/api/assignments/{self.assignment.pk}/submissions_status/export/?status=submitted')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'student_id,username,email,status,submitted_at,submission_id')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{self.students[0].id},student0,,submitted,'))
+
+    def test_csv_export_is_teacher_only(self):
+        self.client.force_authenticate(self.students[0])
+        response = self.client.get(f'/api/assignments/{self.assignment.pk}/submissions_status/export/')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(ASYNC_READ_VIEWS=True, EVENT_BROKER='backend.events.LocalBroker', LIVE_STREAM_TIMEOUT=5)
+class LiveRosterTests(AssignmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(authentication._users.clear)
+        self.students = self.make_students(3)
+        self.make_assignments(1)
+        self.assignment = Assignment.objects.get()
+        self.submission = Submission.objects.create(assignment=self.assignment, student=self.students[0])
+        self.client.force_authenticate(self.teacher)
+        self.url = f'/api/assignments/{self.assignment.pk}/submissions_status/stream/'
+
+    def follow(self, *steps, user=None, query=''):
+        """The stream's response and its frames: the first, then the next
+        one after each of ``steps``. One event loop runs the whole stream."""
+        token = CustomTokenObtainPairSerializer.get_token(user or self.teacher).access_token
+
+        async def follow():
+            response = await self.async_client.get(self.url + query, headers={'Authorization': f'Bearer {token}'})
+            if not response.streaming:
+                return response, []
+            chunks = aiter(response.streaming_content)
+            frames = [await anext(chunks)]
+            for step in steps:
+                await sync_to_async(step)()
+                frames.append(await anext(chunks))
+            await chunks.aclose()
+            return response, frames
+
+        return async_to_sync(follow)()
+
+    def read(self, chunk):
+        """``chunk`` as ``(event, data)``."""
+        fields = dict(line.split(': ', 1) for line in chunk.decode().splitlines() if line and not line.startswith('retry'))
+        return fields['event'], json.loads(fields['data'])
+
+    def test_snapshot_then_changes(self):
+        pk = self.submission.pk
+
+        def submit():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.submission.status = 'submitted'
+                self.submission.save()
+
+        def delete():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.submission.delete()
+
+        response, frames = self.follow(submit, delete)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.is_async)
+        event, rows = self.read(frames[0])
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual([row['status'] for row in rows], ['draft', 'pending', 'pending'])
+
+        event, change = self.read(frames[1])
+        self.assertEqual(event, 'status')
+        self.assertEqual(change['student_id'], self.students[0].id)
+        self.assertEqual((change['status'], change['submission_id']), ('submitted', pk))
+        self.assertEqual(self.read(frames[2])[1]['status'], 'pending')
+
+    @override_settings(LIVE_STREAM_TIMEOUT=0.2)
+    def test_other_assignments_and_rollbacks_are_not_sent(self):
+        self.make_assignments(1)
+        other = Assignment.objects.latest('id')
+
+        def change():
+            with self.captureOnCommitCallbacks(execute=True):
+                Submission.objects.create(assignment=other, student=self.students[1])
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                Submission.objects.create(assignment=self.assignment, student=self.students[2])
+            self.assertEqual(len(callbacks), 1)  # waits for a commit that never comes
+
+        frames = self.follow(change)[1]
+        self.assertEqual(frames[1], b': keepalive\n\n')
+
+    def test_teacher_only(self):
+        self.assertEqual(self.follow(user=self.students[0])[0].status_code, 403)
+        self.assertEqual(self.follow(query='?status=draft')[0].status_code, 400)
+
+    def test_advertised_under_asgi_only(self):
+        status_url = f'/api/assignments/{self.assignment.pk}/submissions_status/'
+        response = self.client.get(status_url)
+        self.assertEqual(response['Link'], f'<http://testserver{self.url}>; rel="live"')
+        with override_settings(ASYNC_READ_VIEWS=False):
+            self.assertEqual(self.client.get(self.url).status_code, 404)
+            response = self.client.get(status_url)
+            self.assertNotIn('Link', response)
+
+            # the fallback: polling with the roster's ETag
+            tag = response['ETag']
+            self.assertEqual(self.client.get(status_url, HTTP_IF_NONE_MATCH=tag).status_code, 304)
+            self.submission.status = 'submitted'
+            self.submission.save()
+            response = self.client.get(status_url, HTTP_IF_NONE_MATCH=tag)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data[0]['status'], 'submitted')
+            tag = response['ETag']
+            self.make_students(1, offset=3)  # joins the open assignment's audience
+            self.assertEqual(len(self.client.get(status_url, HTTP_IF_NONE_MATCH=tag).data), 4)
+
+
+class ConditionalGetTests(AssignmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = self.make_students(2)
+        self.make_assignments(2, students=self.students[:1])
+        self.assignment = Assignment.objects.latest('id')
+
+    def get(self, user, url, tag=None):
+        self.client.force_authenticate(user)
+        return self.client.get(url, **({'HTTP_IF_NONE_MATCH': tag} if tag else {}))
+
+    def assertFresh(self, user, url, tag, header=None):
+        with self.assertNumQueries(1):
+            response = self.get(user, url, header or tag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], tag)
+        self.assertEqual(response.content, b'')
+
+    def assertStale(self, user, url, tag):
+        response = self.get(user, url, tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], tag)
+        return response['ETag']
+
+    def test_not_modified_without_running_the_view(self):
+        for url in ('/api/assignments/', '/api/submissions/?page_size=1', '/api/dashboard/stats/'):
+            for user in (self.teacher, self.students[0]):
+                with self.subTest(url=url, user=user.username):
+                    response = self.get(user, url)
+                    self.assertEqual(response['Cache-Control'], 'private, no-cache')
+                    self.assertFresh(user, url, response['ETag'])
+                    # also as a strong validator and among several
+                    self.assertFresh(user, url, response['ETag'], f'"x", {response["ETag"].removeprefix("W/")}')
+        teacher_tag = self.get(self.teacher, '/api/assignments/')['ETag']
+        self.assertNotEqual(self.get(self.students[0], '/api/assignments/')['ETag'], teacher_tag)
+        self.assertNotEqual(self.get(self.teacher, '/api/assignments/?page_size=1')['ETag'], teacher_tag)
+
+    def test_writes_change_the_tags_of_whoever_sees_them(self):
+        student, other = self.students
+        url = '/api/assignments/'
+        tags = {user: self.get(user, url)['ETag'] for user in (self.teacher, student, other)}
+
+        # explicit audience: the other student doesn't see the submission
+        Submission.objects.create(assignment=self.assignment, student=student)
+        tags[self.teacher] = self.assertStale(self.teacher, url, tags[self.teacher])
+        tags[student] = self.assertStale(student, url, tags[student])
+        self.assertFresh(other, url, tags[other])
+
+        self.assignment.assigned_students.add(other)
+        for user in (self.teacher, student, other):
+            tags[user] = self.assertStale(user, url, tags[user])
+
+        Assignment.objects.filter(pk=self.assignment.pk).get().save()
+        for user in (self.teacher, student, other):
+            tags[user] = self.assertStale(user, url, tags[user])
+
+        # names shown in every response
+        self.teacher.first_name = 'Ada'
+        self.teacher.save()
+        for user in (self.teacher, student, other):
+            tags[user] = self.assertStale(user, url, tags[user])
+        self.teacher.save(update_fields=['last_login'])
+        self.assertFresh(student, url, tags[student])
+
+        # someone else's class
+        self.client.force_authenticate(User.objects.create(username='other', role='teacher'))
+        response = self.client.post('/api/assignments/', {
+            'title': 'Elsewhere', 'description': 'Label the chambers', 'model': self.model.id,
+            'due_date': (timezone.now() + timedelta(days=1)).isoformat(), 'tasks': ['q1'],
+            'assigned_students': [other.id],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFresh(self.teacher, url, tags[self.teacher])
+        self.assertFresh(student, url, tags[student])
+        self.assertStale(other, url, tags[other])
+
+    def test_cohort_membership_and_deletion(self):
+        student, other = self.students
+        cohort = Cohort.objects.create(name='Year 9', teacher=self.teacher)
+        self.assignment.cohorts.add(cohort)
+        tag = self.get(other, '/api/assignments/')['ETag']
+        cohorts.add_members(cohort, [other.id])
+        tag = self.assertStale(other, '/api/assignments/', tag)
+        cohorts.remove_members(cohort, [other.id])
+        tag = self.assertStale(other, '/api/assignments/', tag)
+
+        student_tag = self.get(student, '/api/assignments/')['ETag']
+        self.assignment.delete()
+        self.assertStale(student, '/api/assignments/', student_tag)
+
+    def test_open_assignments_bump_every_student_at_once(self):
+        tag = self.get(self.students[1], '/api/assignments/')['ETag']
+        before = dict(Version.objects.values_list('scope', 'value'))
+        with mock.patch.object(versions, 'FANOUT_LIMIT', 1):
+            self.make_assignments(1)
+        after = dict(Version.objects.values_list('scope', 'value'))
+        self.assertIn(versions.STUDENTS, after)
+        for student in self.students:
+            self.assertEqual(after[versions.student(student.pk)], before[versions.student(student.pk)])
+        self.assertStale(self.students[1], '/api/assignments/', tag)
+
+    def test_dashboard_tag_changes_with_the_day(self):
+        tag = self.get(self.teacher, '/api/dashboard/stats/')['ETag']
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('assignments.dashboard_views.timezone.now', return_value=tomorrow):
+            self.assertStale(self.teacher, '/api/dashboard/stats/', tag)
+
+
+class ResponseCacheTests(AssignmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = self.make_students(2)
+        self.make_assignments(2)
+        cache.reset_stats()
+
+    def get(self, user, url, queries):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeats_skip_the_queries_until_a_write(self):
+        first = self.get(self.students[0], '/api/assignments/', 5)
+        self.assertEqual(self.get(self.students[0], '/api/assignments/', 1), first)
+        # per user: another student's inbox is built for them
+        self.get(self.students[1], '/api/assignments/', 5)
+
+        Submission.objects.create(assignment=Assignment.objects.first(), student=self.students[0], status='submitted')
+        fresh = self.get(self.students[0], '/api/assignments/', 5)
+        self.assertEqual(sum(row['my_submission'] is not None for row in fresh), 1)
+        self.get(self.students[1], '/api/assignments/', 1)
+
+        self.get(self.teacher, '/api/dashboard/stats/', 5)
+        self.get(self.teacher, '/api/dashboard/stats/', 1)
+
+        staff = User.objects.create(username='ops', is_staff=True)
+        self.client.force_authenticate(staff)
+        stats = self.client.get('/api/metrics/').json()['caches']['responses']
+        self.assertEqual((stats['local_hits'], stats['misses']), (3, 4))
+        self.assertEqual(stats['hit_ratio'], round(3 / 7, 4))
+
+    def test_catalogs_are_shared_by_role(self):
+        self.get(self.students[0], '/api/users/students/', 2)
+        self.get(self.students[1], '/api/users/students/', 1)
+        rows = self.get(self.teacher, '/api/users/students/', 2)
+        self.assertEqual(len(rows), 2)
+        self.make_students(1, offset=2)
+        self.assertEqual(len(self.get(self.teacher, '/api/users/students/', 2)), 3)
+        self.students[0].last_name = 'Lovelace'
+        self.students[0].save()
+        rows = self.get(self.teacher, '/api/users/students/', 2)
+        self.assertEqual(rows[0]['last_name'], 'Lovelace')
+
+        self.get(self.students[0], '/api/models/?page_size=10', 2)
+        self.get(self.students[1], '/api/models/?page_size=10', 1)
+        Model3D.objects.create(title='Lung', subject='Biology', file='3d_models/lung.glb', uploaded_by=self.teacher)
+        page = self.get(self.students[1], '/api/models/?page_size=10', 2)
+        self.assertEqual([row['title'] for row in page['results']], ['Lung', 'Heart'])
+
+    def test_background_jobs_invalidate(self):
+        self.get(self.students[0], '/api/models/', 2)
+        thumbnails.thumbnails_rendered.send(sender=None, name=self.model.file.name)
+        self.get(self.students[0], '/api/models/', 2)
+
+        submission = Submission.objects.create(assignment=Assignment.objects.first(), student=self.students[0])
+        self.get(self.teacher, '/api/submissions/', 5)
+        images.derivatives_written.send(sender=Submission, pk=submission.pk, field='screenshot')
+        self.get(self.teacher, '/api/submissions/', 5)
+
+    @override_settings(RESPONSE_CACHE=None)
+    def test_can_be_turned_off(self):
+        self.get(self.teacher, '/api/assignments/', 5)
+        self.get(self.teacher, '/api/assignments/', 5)
+
+
+@override_settings(RESPONSE_CACHE=None)
+class LeanListTests(AssignmentTestCase):
+    """The lists built from rows (backend.lean) match the DRF serializers byte for byte."""
+
+    def setUp(self):
+        super().setUp()
+        Model3D.objects.filter(pk=self.model.pk).update(
+            file_compact='3d_models/compact/heart.glb', lod_low='3d_models/lod/heart_low.glb',
+            vertex_count=1200, bbox={'min': [0, 0, 0], 'max': [1, 2.5, 1]}, textures=[{'width': 512}],
+        )
+        Model3D.objects.create(title='Lung \u2028 «β»', subject='Biology', file='3d_models/lung.glb', uploaded_by=self.teacher)
+        self.teacher.first_name = 'Ada'
+        self.teacher.save()
+        self.students = self.make_students(3)
+        cohort = Cohort.objects.create(name='A', teacher=self.teacher)
+        self.make_assignments(4, students=self.students[:2])
+        self.make_assignments(2)
+        for assignment in Assignment.objects.all()[:3]:
+            assignment.cohorts.add(cohort)
+            Submission.objects.create(
+                assignment=assignment, student=self.students[0], status='submitted', grade='A',
+                content=[{'answer': 'ünïcode \u2029'}], screenshot='submissions/screenshots/shot.webp',
+            )
+
+    def get(self, user, url):
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def assertSameBytes(self, user, url):
+        # no ModelSerializer runs on the lean path
+        with mock.patch('rest_framework.serializers.ModelSerializer.to_representation', side_effect=AssertionError):
+            lean_bytes = self.get(user, url)
+        with mock.patch.object(lean.LeanListMixin, 'lean_rows', False):
+            self.assertEqual(lean_bytes, self.get(user, url), url)
+        return json.loads(lean_bytes)
+
+    def test_assignment_lists(self):
+        for user in (self.teacher, self.students[0], self.students[2]):
+            self.assertSameBytes(user, '/api/assignments/')
+            self.assertSameBytes(user, '/api/assignments/?lod=low')
+            page = self.assertSameBytes(user, '/api/assignments/?page_size=1&lod=compact')
+            self.assertSameBytes(user, page['next'])
+        rows = self.assertSameBytes(self.students[0], '/api/assignments/')
+        mine = [row['my_submission'] for row in rows if row['my_submission']]
+        self.assertEqual(len(mine), 3)
+        self.assertEqual(mine[0]['screenshot'], '/media/submissions/screenshots/shot.webp')
+
+    def test_catalogs(self):
+        with mock.patch.object(thumbnails, 'has_thumbnails', side_effect=lambda name: 'heart' in name):
+            page = self.assertSameBytes(self.students[0], '/api/models/?page_size=1&lod=medium')
+            self.assertSameBytes(self.students[0], page['next'])
+            rows = self.assertSameBytes(self.teacher, '/api/models/?lod=compact')
+        self.assertEqual([bool(row['thumbnail']) for row in rows], [True, False])
+        self.assertEqual(rows[0]['file'], 'http://testserver/media/3d_models/compact/heart.glb')
+        for title in ('Heart', 'Lung'):
+            CatalogModel.objects.create(title=title, subject='Biology', file=f'models/{title.lower()}.glb', uploaded_by=self.teacher)
+        CatalogModel.objects.create(title='Kidney', subject='Biology', file='', uploaded_by=self.teacher)
+        with mock.patch.object(thumbnails, 'has_thumbnails', side_effect=lambda name: 'heart' in name):
+            rows = self.assertSameBytes(self.teacher, '/api/users/models/')
+            page = self.assertSameBytes(self.teacher, '/api/users/models/?page_size=1')
+            self.assertSameBytes(self.teacher, page['next'])
+        self.assertEqual([bool(row['thumbnail']) for row in rows], [True, False, False])
+        self.assertIsNone(rows[2]['file'])
+        self.assertSameBytes(self.teacher, '/api/users/students/')
+        self.assertSameBytes(self.teacher, '/api/users/students/?page_size=2')
+
+    def test_expanded_submission_keeps_the_serializers(self):
+        self.client.force_authenticate(self.students[0])
+        response = self.client.get('/api/assignments/?expand=my_submission')
+        mine = [row['my_submission'] for row in response.json() if row['my_submission']]
+        self.assertEqual(mine[0]['student']['username'], 'student0')
+
+    def test_query_count_is_unchanged(self):
+        self.client.force_authenticate(self.students[0])
+        for lean_rows in (True, False):
+            with mock.patch.object(lean.LeanListMixin, 'lean_rows', lean_rows), self.assertNumQueries(5):
+                self.client.get('/api/assignments/?page_size=3')
+
+
+def png_upload(name='shot.png', size=(1600, 900)):
+    image = Image.new('RGB', size, (30, 120, 200))
+    out = BytesIO()
+    image.save(out, 'PNG', pnginfo=None)
+    return SimpleUploadedFile(name, out.getvalue(), content_type='image/png')
+
+
+class CohortTests(AssignmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.students = self.make_students(5)
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post('/api/cohorts/', {'name': 'Year 9'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.cohort = Cohort.objects.get(pk=response.json()['id'])
+
+    def edit_members(self, method, students):
+        response = getattr(self.client, method)(
+            f'/api/cohorts/{self.cohort.pk}/members/', {'students': [s.id for s in students]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def assign_to_cohort(self, *others):
+        self.make_assignments(1)
+        assignment = Assignment.objects.latest('id')
+        assignment.cohorts.add(self.cohort, *others)
+        return assignment
+
+    def audience(self, assignment):
+        return set(InboxEntry.objects.filter(assignment=assignment).values_list('student_id', flat=True))
+
+    def test_bulk_membership_edits(self):
+        self.assertEqual(self.edit_members('post', self.students[:3]), {'added': 3, 'member_count': 3})
+        self.assertEqual(self.edit_members('post', self.students[2:4]), {'added': 1, 'member_count': 4})
+        self.assertEqual(self.edit_members('delete', self.students[:1]), {'removed': 1, 'member_count': 3})
+        result = self.edit_members('put', [self.students[0], self.students[4]])
+        self.assertEqual(result, {'added': 2, 'removed': 3, 'member_count': 2})
+        members = self.client.get(f'/api/cohorts/{self.cohort.pk}/members/').json()
+        self.assertEqual([m['id'] for m in members], [self.students[0].id, self.students[4].id])
+        self.assertEqual(self.client.get('/api/cohorts/').json()[0]['member_count'], 2)
+
+        response = self.client.post(f'/api/cohorts/{self.cohort.pk}/members/', {'students': [self.teacher.id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_membership_changes_follow_into_inbox_and_roster(self):
+        cohorts.add_members(self.cohort, [s.id for s in self.students[:2]])
+        assignment = self.assign_to_cohort()
+        assignment.assigned_students.add(self.students[1])
+        self.assertEqual(self.audience(assignment), {s.id for s in self.students[:2]})
+
+        cohorts.add_members(self.cohort, [self.students[2].id])
+        cohorts.remove_members(self.cohort, [self.students[0].id, self.students[1].id])
+        # student1 is still assigned directly
+        self.assertEqual(self.audience(assignment), {self.students[1].id, self.students[2].id})
+
+        rows = self.client.get(f'/api/assignments/{assignment.pk}/submissions_status/').json()
+        self.assertEqual([r['student']['id'] for r in rows], [self.students[1].id, self.students[2].id])
+
+    def test_overlapping_cohorts(self):
+        other = Cohort.objects.create(name='Chemistry club', teacher=self.teacher)
+        cohorts.add_members(self.cohort, [self.students[0].id])
+        cohorts.add_members(other, [self.students[0].id])
+        assignment = self.assign_to_cohort(other)
+        cohorts.remove_members(self.cohort, [self.students[0].id])
+        self.assertEqual(self.audience(assignment), {self.students[0].id})
+
+    def test_only_audience_can_submit(self):
+        cohorts.add_members(self.cohort, [self.students[0].id])
+        assignment = self.assign_to_cohort()
+        for student, expected in ((self.students[0], 201), (self.students[1], 403)):
+            self.client.force_authenticate(student)
+            response = self.client.post('/api/submissions/', {'assignment': assignment.id}, format='json')
+            self.assertEqual(response.status_code, expected)
+        self.assertEqual(self.client.get(f'/api/assignments/{assignment.pk}/').status_code, 404)
+
+    def test_cohorts_are_private_to_their_teacher(self):
+        other_teacher = User.objects.create(username='other', role='teacher')
+        self.client.force_authenticate(other_teacher)
+        self.assertEqual(self.client.get('/api/cohorts/').json(), [])
+        response = self.client.post('/api/assignments/', {
+            'title': 'Task', 'description': 'Label the chambers', 'model': self.model.id,
+            'due_date': (timezone.now() + timedelta(days=1)).isoformat(), 'tasks': ['q1'],
+            'cohorts': [self.cohort.id],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cohorts', response.json())
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.get('/api/cohorts/').status_code, 403)
+
+    def test_targeted_cohort_cannot_be_deleted(self):
+        self.assign_to_cohort()
+        response = self.client.delete(f'/api/cohorts/{self.cohort.pk}/')
+        self.assertEqual(response.status_code, 400)
+        Assignment.objects.get().cohorts.clear()
+        self.assertEqual(self.client.delete(f'/api/cohorts/{self.cohort.pk}/').status_code, 204)
+
+    def test_deleting_cohort_outside_the_api(self):
+        cohorts.add_members(self.cohort, [s.id for s in self.students[:2]])
+        assignment = self.assign_to_cohort()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cohort.delete()
+        # left without targets, the assignment is open to every student
+        self.assertEqual(self.audience(assignment), {s.id for s in self.students})
+
+        self.cohort = Cohort.objects.create(name='Year 10', teacher=self.teacher)
+        self.assign_to_cohort()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.teacher.delete()
+        self.assertFalse(InboxEntry.objects.exists())
+
+
+class ServerTimingTests(AssignmentTestCase):
+    def setUp(self):
+        super().setUp()
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+        self.make_assignments(3)
+        self.client.force_authenticate(self.teacher)
+
+    def test_header_and_log_line(self):
+        with self.assertLogs('backend.requests', 'INFO') as logs:
+            response = self.client.get('/api/assignments/')
+        timing = dict(
+            (part.split(';')[0].strip(), part) for part in response['Server-Timing'].split(',')
+        )
+        self.assertEqual(set(timing), {'db', 'serialize', 'view', 'app'})
+        self.assertIn('desc="5 queries"', timing['db'])
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['url_name'], line['status'], line['queries']), ('assignment-list', 200, 5))
+        self.assertGreater(line['serialize_ms'], 0)
+        self.assertGreaterEqual(line['app_ms'], line['view_ms'])
+
+    def test_percentiles_are_staff_only(self):
+        for _ in range(3):
+            self.client.get('/api/assignments/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        staff = User.objects.create(username='ops', is_staff=True)
+        self.client.force_authenticate(staff)
+        stats = self.client.get('/api/metrics/').json()['endpoints']['assignment-list']
+        self.assertEqual(stats['count'], 3)
+        # the repeats come from the response cache
+        self.assertEqual(stats['queries'], {'p50': 1, 'p95': 5, 'p99': 5})
+        self.assertLessEqual(stats['app_ms']['p50'], stats['app_ms']['p99'])
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite's")
+@override_settings(LEGACY_UNPAGINATED_LISTS=False)
+class QueryPlanTests(AssignmentTestCase):
+    """Every query behind the hot views must be answerable from an index.
+
+    The tables are never ANALYZEd, so SQLite plans as if they were large and
+    a missing index shows up as ``SCAN <table>`` however little data is seeded.
+    """
+    HOT_VIEWS = {
+        'teacher': [
+            '/api/assignments/?page_size=5',
+            '/api/dashboard/stats/',
+            '/api/submissions/?page_size=5',
+            '/api/users/students/?page_size=5',
+            '/api/users/models/?page_size=5',
+            '/api/cohorts/?page_size=5',
+        ],
+        'student': [
+            '/api/assignments/?page_size=5',
+            '/api/dashboard/stats/',
+            '/api/submissions/?page_size=5',
+        ],
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.students = self.make_students(12)
+        self.cohort = Cohort.objects.create(name='Year 9', teacher=self.teacher)
+        cohorts.add_members(self.cohort, [s.id for s in self.students[:6]])
+        self.make_assignments(6, students=self.students[:4])
+        self.make_assignments(6)
+        targeted = Assignment.objects.order_by('id')[0]
+        targeted.cohorts.add(self.cohort)
+        for assignment in Assignment.objects.all()[:8]:
+            for student in self.students[:3]:
+                Submission.objects.create(assignment=assignment, student=student, status='submitted')
+        self.open = Assignment.objects.filter(assigned_students__isnull=True, cohorts__isnull=True).first()
+        self.targeted = targeted
+
+    def capture(self, user, url):
+        """Run ``url`` (and its next page) as ``user``; return each SELECT as ``(sql, params)``."""
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        self.client.force_authenticate(user)
+        with connection.execute_wrapper(record):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            body = response.json()
+            if isinstance(body, dict) and body.get('next'):
+                self.assertEqual(self.client.get(body['next']).status_code, 200)
+        return queries
+
+    def plan(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_no_full_scans(self, user, url):
+        for sql, params in self.capture(user, url):
+            plan = self.plan(sql, params)
+            scans = [step for step in plan if FULL_SCAN_RE.match(step)]
+            self.assertFalse(scans, f"{url} scans a whole table:\n{sql}\n" + '\n'.join(plan))
+
+    def test_hot_views_use_indexes(self):
+        users = {'teacher': self.teacher, 'student': self.students[0]}
+        for role, urls in self.HOT_VIEWS.items():
+            for url in urls:
+                with self.subTest(role=role, url=url):
+                    self.assert_no_full_scans(users[role], url)
+
+    def test_weekly_series_is_a_range_scan(self):
+        for user in (self.teacher, self.students[0]):
+            weekly = [
+                self.plan(sql, params) for sql, params in self.capture(user, '/api/dashboard/stats/')
+                if 'GROUP BY' in sql and 'created_at' in sql and 'submission' not in sql
+            ]
+            self.assertEqual(len(weekly), 1)
+            self.assertIn('created_at>? AND created_at<?', weekly[0][0])
+
+    def test_rosters_use_indexes(self):
+        for assignment in (self.open, self.targeted):
+            for params in ('?page_size=5', '?page_size=5&status=pending'):
+                url = f'/api/assignments/{assignment.pk}/submissions_status/{params}'
+                with self.subTest(url=url):
+                    self.assert_no_full_scans(self.teacher, url)
+
+
+class WriteQueueTests(TransactionTestCase):
+    def test_connections_get_the_production_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 30000)
+
+    def test_writers_take_turns(self):
+        active, overlaps = [], []
+
+        def write(i):
+            try:
+                with write_queue():
+                    active.append(i)
+                    overlaps.append(len(active))
+                    User.objects.create(username=f'student{i}', role='student')
+                    with write_queue():  # re-entrant
+                        time.sleep(0.01)
+                    active.remove(i)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(overlaps, [1] * 6)
+        self.assertEqual(User.objects.filter(role='student').count(), 6)
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class ScreenshotDerivativeTests(AssignmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.make_assignments(1)
+        self.student = self.make_students(1)[0]
+
+    def submit_screenshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            submission = Submission.objects.create(
+                assignment=Assignment.objects.get(), student=self.student, screenshot=png_upload(),
+            )
+        submission.refresh_from_db()
+        return submission
+
+    def test_derivatives_replace_original(self):
+        submission = self.submit_screenshot()
+        self.assertTrue(submission.screenshot.name.endswith('.webp'))
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'submissions/screenshots')).count('shot.png'), 0)
+        with Image.open(submission.screenshot.path) as original:
+            self.assertEqual((original.format, original.width), ('WEBP', 1600))
+
+        self.client.force_authenticate(self.teacher)
+        thumb = self.client.get(f'/api/submissions/{submission.pk}/').json()['screenshot_thumb']
+        self.assertEqual(set(thumb), {'webp', 'jpeg'})
+        self.assertEqual(set(thumb['webp']), {'320', '960'})
+        with Image.open(os.path.join(self.tmp, thumb['jpeg']['320'].split('/media/', 1)[1])) as small:
+            self.assertEqual((small.format, small.size), ('JPEG', (320, 180)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submission.delete()
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'submissions/screenshots')), [submission.screenshot.name.rsplit('/', 1)[1]])
+
+    @override_settings(IMAGE_KEEP_ORIGINALS=True)
+    def test_original_kept_on_demand(self):
+        submission = self.submit_screenshot()
+        self.assertTrue(submission.screenshot.name.endswith('shot.png'))
+        self.assertTrue(os.path.exists(submission.screenshot.path + '.w960.webp'))
+
+    def test_unchanged_saves_do_not_reprocess(self):
+        submission = self.submit_screenshot()
+        with self.captureOnCommitCallbacks() as callbacks:
+            submission.grade = 'A'
+            submission.save()
+        # the live roster's announcement is the only thing left for the commit
+        self.assertEqual([callback.__module__ for callback in callbacks], ['assignments.live'])
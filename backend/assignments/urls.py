@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AssignmentViewSet, SubmissionViewSet
+from .views import AssignmentViewSet, CohortViewSet, SubmissionViewSet
 from .dashboard_views import dashboard_stats
 
 router = DefaultRouter()
 router.register(r'assignments', AssignmentViewSet)
 router.register(r'submissions', SubmissionViewSet)
+router.register(r'cohorts', CohortViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
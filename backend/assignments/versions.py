@@ -0,0 +1,222 @@
+"""Version counters behind the ETags and the response cache of the
+assignment and submission lists, the dashboard and the catalogs (students,
+3D models).
+
+Every write that can change one of those responses bumps the counters of
+the scopes it touches, in its own transaction (``assignments.signals`` and
+``assignments.inbox``):
+
+- ``teacher:<id>``: the teacher's assignments, their audience and the
+  submissions to them;
+- ``student:<id>``: the student's inbox, the assignments in it and the
+  student's own submissions;
+- ``assignment:<id>``: the assignment, its audience and its submissions;
+- ``students``: every student, for changes reaching more than
+  ``FANOUT_LIMIT`` of them at once (an assignment open to everyone);
+- ``shared``: names and models that appear in every response (user
+  profiles, 3D models);
+- ``models``: the 3D model catalogs;
+- ``roster``: who is a student (the student list).
+
+A response's ETag hashes the user (or, for a catalog that is the same for
+everyone, the user's role), the URL and the counters of the scopes it
+depends on, read in one primary key lookup. ``conditional()`` answers a
+matching ``If-None-Match`` with 304 before the view queries or serializes
+anything. Otherwise the response data is looked up under the ETag in the
+``RESPONSE_CACHE`` cache, and stored there after a miss; as the counters
+only go up, a cached entry is never stale, just no longer asked for.
+"""
+import hashlib
+import random
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from .models import InboxEntry, Submission, Version
+
+STUDENTS = 'students'
+SHARED = 'shared'
+MODELS = 'models'
+ROSTER = 'roster'
+FANOUT_LIMIT = 500
+BATCH_SIZE = 500
+# part of every ETag: change it when a response's shape changes, so clients
+# holding the old shape refetch
+CONTRACT = '1'
+
+
+def teacher(pk):
+    return f'teacher:{pk}'
+
+
+def student(pk):
+    return f'student:{pk}'
+
+
+def assignment(pk):
+    return f'assignment:{pk}'
+
+
+def bump(*scopes):
+    """Add one to each scope's counter.
+
+    Rows start at a random value: a counter recreated after a rollback (or
+    a restored backup) must not repeat values whose responses are cached.
+    """
+    scopes = sorted(set(scopes))
+    with transaction.atomic():
+        for start in range(0, len(scopes), BATCH_SIZE):
+            chunk = scopes[start:start + BATCH_SIZE]
+            Version.objects.filter(scope__in=chunk).update(value=F('value') + 1)
+            Version.objects.bulk_create(
+                [Version(scope=scope, value=random.getrandbits(62)) for scope in chunk], ignore_conflicts=True,
+            )
+
+
+def bump_students(ids, *scopes):
+    ids = set(ids)
+    if len(ids) > FANOUT_LIMIT:
+        bump(STUDENTS, *scopes)
+    else:
+        bump(*map(student, ids), *scopes)
+
+
+def readers(assignment_id):
+    """Students who see the assignment: its inbox and its submitters, or
+    ``None`` when there are more than ``FANOUT_LIMIT``."""
+    ids = set(InboxEntry.objects.filter(assignment_id=assignment_id).values_list('student_id', flat=True)[:FANOUT_LIMIT + 1])
+    if len(ids) > FANOUT_LIMIT:
+        return None
+    ids.update(Submission.objects.filter(assignment_id=assignment_id).values_list('student_id', flat=True))
+    return ids
+
+
+def assignment_changed(assignment_id, teacher_id, student_ids=None):
+    """Bump everything showing the assignment; ``student_ids`` defaults to
+    its current ``readers()``."""
+    if student_ids is None:
+        student_ids = readers(assignment_id)
+    scopes = (teacher(teacher_id), assignment(assignment_id))
+    if student_ids is None:
+        bump(STUDENTS, *scopes)
+    else:
+        bump_students(student_ids, *scopes)
+
+
+def scopes_for(user):
+    if user.role == 'teacher':
+        return [teacher(user.pk), SHARED]
+    return [student(user.pk), STUDENTS, SHARED]
+
+
+def etag(request, *parts, scopes=None, shared=False):
+    """A weak ETag for this user, URL and the current versions of
+    ``scopes`` (by default the user's own, ``scopes_for()``); ``parts`` adds
+    anything else the response depends on. A ``shared`` response is the
+    same for every user with the same role."""
+    if scopes is None:
+        scopes = scopes_for(request.user)
+    values = dict(Version.objects.filter(scope__in=scopes).values_list('scope', 'value'))
+    key = '|'.join([
+        CONTRACT, f'role:{request.user.role}' if shared else f'user:{request.user.pk}',
+        # absolute: responses carry links to this host
+        request.build_absolute_uri(), request.META.get('HTTP_ACCEPT', ''),
+        *(f'{scope}={values.get(scope, 0)}' for scope in scopes),
+        *map(str, parts),
+    ])
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}"'
+
+
+def matches(request, tag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # If-None-Match uses the weak comparison
+    opaque = tag.removeprefix('W/')
+    return any(candidate == '*' or candidate.removeprefix('W/') == opaque for candidate in parse_etags(header))
+
+
+def tagged(response, tag):
+    response['ETag'] = tag
+    # per-user responses: browsers may keep them, but must revalidate
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def response_cache():
+    alias = getattr(settings, 'RESPONSE_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def lookup(request, *parts, scopes=None, shared=False):
+    """The ETag and, unless the client has that version already, the
+    cached response data for it (or None)."""
+    tag = etag(request, *parts, scopes=scopes, shared=shared)
+    cache = response_cache()
+    if cache is None or matches(request, tag):
+        return tag, None
+    return tag, cache.get(f'response:{tag}')
+
+
+def store(tag, response):
+    cache = response_cache()
+    # errors and streams are left alone
+    if cache is not None and isinstance(response, Response) and response.status_code == 200 and not response.exception:
+        cache.set(f'response:{tag}', response.data)
+
+
+def conditional(request, respond, *parts, scopes=None, shared=False):
+    """``respond()``, tagged with its ETag; a 304 without calling it when
+    the client already has that version, and the cached data when another
+    request got it first."""
+    tag, data = lookup(request, *parts, scopes=scopes, shared=shared)
+    if matches(request, tag):
+        return tagged(HttpResponseNotModified(), tag)
+    if data is not None:
+        return tagged(Response(data), tag)
+    response = respond()
+    store(tag, response)
+    return tagged(response, tag)
+
+
+async def aconditional(request, respond, *parts, scopes=None, shared=False):
+    """``conditional()`` for an async ``respond``."""
+    tag, data = await sync_to_async(lookup)(request, *parts, scopes=scopes, shared=shared)
+    if matches(request, tag):
+        return tagged(HttpResponseNotModified(), tag)
+    if data is not None:
+        return tagged(Response(data), tag)
+    response = await respond()
+    await sync_to_async(store)(tag, response)
+    return tagged(response, tag)
+
+
+class ConditionalListMixin:
+    """``list()`` through ``conditional()``. ``version_scopes`` and
+    ``version_shared`` are its ``scopes`` and ``shared``."""
+    version_scopes = None
+    version_shared = False
+
+    def list(self, request, *args, **kwargs):
+        return conditional(
+            request, partial(super().list, request, *args, **kwargs),
+            scopes=self.version_scopes, shared=self.version_shared,
+        )
+
+
+def conditional_handler(handler):
+    """Wrap an async read handler (``backend.aio``) in ``aconditional``,
+    with the view's ``version_scopes`` and ``version_shared``."""
+    async def conditional_handler(view, request):
+        return await aconditional(
+            request, partial(handler, view, request),
+            scopes=getattr(view, 'version_scopes', None), shared=getattr(view, 'version_shared', False),
+        )
+    return conditional_handler
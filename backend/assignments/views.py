@@ -1,8 +1,22 @@
+import csv
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, permissions, status
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
-from .models import Assignment, Submission
-from .serializers import AssignmentSerializer, SubmissionSerializer
+from . import cohorts, inbox, live, versions
+from .models import Assignment, Cohort, Submission
+from .serializers import (
+    AssignmentRowSerializer, AssignmentSerializer, CohortMembersSerializer, CohortSerializer, SubmissionSerializer,
+    prefetch_my_submission,
+)
 from rest_framework.decorators import action
+from django.db.models import Count, F, FilteredRelation, Prefetch, Q
+from users.models import User
+from backend import lean
+from backend.db import write_queue
+from backend.pagination import CreatedAtCursorPagination, IdCursorPagination, InboxCursorPagination
 
 class IsTeacherOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -10,101 +24,249 @@ class IsTeacherOrReadOnly(permissions.BasePermission):
             return True
         return request.user.is_authenticated and request.user.role == 'teacher'
 
-class AssignmentViewSet(viewsets.ModelViewSet):
+class IsTeacher(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.role == 'teacher'
+
+class AssignmentViewSet(versions.ConditionalListMixin, lean.LeanListMixin, viewsets.ModelViewSet):
     queryset = Assignment.objects.all().order_by('-created_at')
     serializer_class = AssignmentSerializer
+    row_serializer_class = AssignmentRowSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.role != 'teacher':
+            # students page through their inbox in its own index order
+            self.pagination_class = InboxCursorPagination
 
     def perform_create(self, serializer):
         if self.request.user.role != 'teacher':
-            raise permissions.PermissionDenied("Only teachers can create assignments.")
-        serializer.save(teacher=self.request.user)
+            raise PermissionDenied("Only teachers can create assignments.")
+        # the row and its students land together, so the inbox is filled once
+        with write_queue(), inbox.batch():
+            serializer.save(teacher=self.request.user)
+
+    def perform_update(self, serializer):
+        with write_queue(), inbox.batch():
+            serializer.save()
+
+    def expand_submission(self):
+        return 'my_submission' in self.request.query_params.get('expand', '').split(',')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand_submission'] = self.expand_submission()
+        return context
+
+    def lean_list(self):
+        # the nested my_submission is only built by the DRF serializers
+        return super().lean_list() and not self.expand_submission()
+
+    def with_relations(self, qs):
+        if self.action in ('submissions_status', 'submissions_export'):
+            return qs
+        # teacher/model, audience ids and the caller's own submission, batched for the whole page
+        return qs.select_related('teacher', 'model').prefetch_related(
+            Prefetch('assigned_students', queryset=User.objects.only('id').order_by('id')),
+            Prefetch('cohorts', queryset=Cohort.objects.only('id').order_by('id')),
+            prefetch_my_submission(self.request.user, deep=self.expand_submission()),
+        )
 
     def get_queryset(self):
         user = self.request.user
-        print(f"DEBUG: Fetching assignments for user: {user.username} (ID: {user.id}, Role: {user.role})")
-        
         if user.role == 'teacher':
-             qs = Assignment.objects.filter(teacher=user).order_by('-created_at')
-             print(f"DEBUG: Teacher QuerySet Count: {qs.count()}")
-             return qs
-        
+            qs = Assignment.objects.filter(teacher=user).order_by('-created_at')
+            return self.with_relations(qs)
+
         # Student
-        qs = (Assignment.objects.filter(assigned_students=user) | Assignment.objects.filter(assigned_students__isnull=True)).distinct().order_by('-created_at')
-        print(f"DEBUG: Student QuerySet Count: {qs.count()}")
-        print(f"DEBUG: Student Query SQL: {qs.query}")
-        return qs
+        qs = Assignment.objects.filter(inbox_entries__student=user).annotate(
+            inbox_created=F('inbox_entries__created_at'),
+            inbox_assignment=F('inbox_entries__assignment'),
+        ).order_by(*InboxCursorPagination.ordering)
+        return self.with_relations(qs)
+
+    def status_rows(self, assignment):
+        """One row per audience student, LEFT JOINed to their submission in SQL."""
+        students = assignment.audience().annotate(
+            submission=FilteredRelation('submissions', condition=Q(submissions__assignment=assignment)),
+        )
+        status_filter = self.request.query_params.get('status')
+        if status_filter == 'pending':
+            students = students.filter(submission__id__isnull=True)
+        elif status_filter in ('draft', 'submitted'):
+            students = students.filter(submission__status=status_filter)
+        elif status_filter:
+            raise ValidationError({'status': "Must be one of 'pending', 'draft' or 'submitted'."})
+
+        rows = students.values(
+            'id', 'username', 'email',
+            submission_id=F('submission__id'),
+            submission_status=F('submission__status'),
+            submitted_at=F('submission__submitted_at'),
+        ).order_by('id')
+        return rows
 
     @action(detail=True, methods=['get'])
     def submissions_status(self, request, pk=None):
         """Get submission status for all students for this assignment"""
         assignment = self.get_object()
-        
-        # Get students assigned to this assignment
-        # If no students are explicitly assigned, show all students
-        from users.models import User
-        if assignment.assigned_students.exists():
-            all_students = assignment.assigned_students.all()
-        else:
-            # If assigned_students is empty, assignment is for all students
-            all_students = User.objects.filter(role='student')
-        
-        # Get all submissions for this assignment
-        submissions = Submission.objects.filter(assignment=assignment).select_related('student')
-        submission_map = {sub.student.id: sub for sub in submissions}
-        
-        # Build response
-        students_status = []
-        for student in all_students:
-            submission = submission_map.get(student.id)
-            if submission:
-                status = submission.status
-                submitted_at = submission.submitted_at
-                submission_id = submission.id
-            else:
-                status = 'pending'
-                submitted_at = None
-                submission_id = None
-            
-            students_status.append({
-                'student': {
-                    'id': student.id,
-                    'username': student.username,
-                    'email': student.email,
-                },
-                'status': status,
-                'submitted_at': submitted_at,
-                'submission_id': submission_id,
-            })
-        
-        return Response(students_status)
-
-
-class SubmissionViewSet(viewsets.ModelViewSet):
+
+        def respond():
+            rows = self.status_rows(assignment)
+            paginator = IdCursorPagination()
+            page = paginator.paginate_queryset(rows, request, view=self)
+            if page is not None:
+                return paginator.get_paginated_response([status_row(row) for row in page])
+            return Response([status_row(row) for row in rows.iterator(chunk_size=2000)])
+
+        # the audience (cohorts, new students), the submissions and the students' names
+        scopes = [versions.assignment(assignment.pk), versions.ROSTER, versions.SHARED]
+        response = versions.conditional(request, respond, scopes=scopes)
+        if settings.ASYNC_READ_VIEWS:
+            # clients follow the stream when offered, and otherwise poll with If-None-Match
+            response['Link'] = f'<{self.reverse_action("submissions-stream", args=[assignment.pk])}>; rel="live"'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='submissions_status/export')
+    def submissions_export(self, request, pk=None):
+        """Stream the whole roster as CSV without materialising it"""
+        assignment = self.get_object()
+        if assignment.teacher_id != request.user.id:
+            raise PermissionDenied("Only the assignment's teacher can export submissions.")
+        rows = self.status_rows(assignment)
+
+        def lines():
+            writer = csv.writer(Echo())
+            yield writer.writerow(['student_id', 'username', 'email', 'status', 'submitted_at', 'submission_id'])
+            for row in rows.iterator(chunk_size=2000):
+                yield writer.writerow([
+                    row['id'], row['username'], row['email'],
+                    row['submission_status'] or 'pending',
+                    row['submitted_at'].isoformat() if row['submitted_at'] else '',
+                    row['submission_id'] or '',
+                ])
+
+        response = StreamingHttpResponse(lines(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="assignment-{assignment.pk}-submissions.csv"'
+        return response
+
+
+    @action(detail=True, methods=['get'], url_path='submissions_status/stream')
+    def submissions_stream(self, request, pk=None):
+        """The roster as Server-Sent Events: a snapshot, then each change"""
+        if not settings.ASYNC_READ_VIEWS:
+            # under WSGI an open stream would hold a worker; clients poll submissions_status
+            raise NotFound("The live roster is only served by the ASGI app.")
+        assignment = self.get_object()
+        if assignment.teacher_id != request.user.id:
+            raise PermissionDenied("Only the assignment's teacher can follow submissions.")
+        if 'status' in request.query_params:
+            raise ValidationError({'status': "The stream always covers the whole roster."})
+        rows = self.status_rows(assignment)
+        return live.stream_response(assignment, lambda: [status_row(row) for row in rows.all()])
+
+
+class Echo:
+    """File-like object whose write() just hands the line back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def status_row(row):
+    return {
+        'student': {
+            'id': row['id'],
+            'username': row['username'],
+            'email': row['email'],
+        },
+        'status': row['submission_status'] or 'pending',
+        'submitted_at': row['submitted_at'],
+        'submission_id': row['submission_id'],
+    }
+
+
+class SubmissionViewSet(versions.ConditionalListMixin, viewsets.ModelViewSet):
     queryset = Submission.objects.all()
     serializer_class = SubmissionSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        # Check if already submitted or draft exists
-        assignment_id = self.request.data.get('assignment')
-        existing_submission = Submission.objects.filter(assignment_id=assignment_id, student=self.request.user).first()
-        
-        if existing_submission:
-            # If it exists, we should probably be using update, but for simplicity let's handle re-creation attempts
-            # If previously submitted, maybe block?
-            # if existing_submission.status == 'submitted':
-            #    raise permissions.PermissionDenied("Already submitted.")
-            # For now, let's just update the existing one if the user hit create again? 
-            # Better practice: Frontend calls PUT for updates. 
-            # But if they call POST, let's error or handle gracefully.
-            raise serializers.ValidationError("Submission already exists. Please update it.")
-
-        serializer.save(student=self.request.user)
+        # draft saves arrive in bursts; queue them rather than fight over the lock
+        with write_queue():
+            assignment_id = self.request.data.get('assignment')
+            if Submission.objects.filter(assignment_id=assignment_id, student=self.request.user).exists():
+                raise ValidationError("Submission already exists. Please update it.")
+
+            assignment = serializer.validated_data['assignment']
+            if not assignment.audience().filter(pk=self.request.user.pk).exists():
+                raise PermissionDenied("This assignment isn't assigned to you.")
+            serializer.save(student=self.request.user)
+
+    def perform_update(self, serializer):
+        with write_queue():
+            serializer.save()
 
     def get_queryset(self):
         user = self.request.user
         if user.role == 'teacher':
              # Teachers see submissions for their assignments
-             return Submission.objects.filter(assignment__teacher=user)
-        return Submission.objects.filter(student=user)
+             qs = Submission.objects.filter(assignment__teacher=user)
+        else:
+             qs = Submission.objects.filter(student=user)
+        return qs.select_related('student', 'assignment__teacher', 'assignment__model').prefetch_related(
+            Prefetch('assignment__assigned_students', queryset=User.objects.only('id').order_by('id')),
+            Prefetch('assignment__cohorts', queryset=Cohort.objects.only('id').order_by('id')),
+            prefetch_my_submission(user, lookup='assignment__submissions'),
+        )
+
+
+class CohortViewSet(viewsets.ModelViewSet):
+    """A teacher's cohorts. Members are edited in bulk via ``members/``."""
+    queryset = Cohort.objects.all()
+    serializer_class = CohortSerializer
+    permission_classes = [IsTeacher]
+    pagination_class = IdCursorPagination
+
+    def get_queryset(self):
+        return Cohort.objects.filter(teacher=self.request.user).annotate(
+            member_count=Count('memberships'),
+        ).order_by('id')
+
+    def perform_create(self, serializer):
+        serializer.save(teacher=self.request.user)
+
+    def perform_destroy(self, instance):
+        # an assignment left with no audience would open up to every student
+        if instance.assignments.exists():
+            raise ValidationError("Remove this cohort from its assignments before deleting it.")
+        instance.delete()
+
+    @action(detail=True, methods=['get', 'post', 'put', 'delete'])
+    def members(self, request, pk=None):
+        """GET lists members; POST adds, DELETE removes and PUT replaces
+        them with ``{"students": [id, ...]}``."""
+        cohort = self.get_object()
+        if request.method == 'GET':
+            members = User.objects.filter(cohort_memberships__cohort=cohort).values('id', 'username', 'email')
+            paginator = IdCursorPagination()
+            page = paginator.paginate_queryset(members, request, view=self)
+            if page is not None:
+                return paginator.get_paginated_response(page)
+            return Response(list(members.order_by('id')))
+
+        body = CohortMembersSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        students = body.validated_data['students']
+        with write_queue():
+            if request.method == 'POST':
+                result = {'added': len(cohorts.add_members(cohort, students))}
+            elif request.method == 'DELETE':
+                result = {'removed': cohorts.remove_members(cohort, students)}
+            else:
+                added, removed = cohorts.set_members(cohort, students)
+                result = {'added': added, 'removed': removed}
+        result['member_count'] = cohort.memberships.count()
+        return Response(result)
@@ -0,0 +1,140 @@
+"""Async read path, used when the app is served over ASGI (``asgi.py`` turns
+on ``ASYNC_READ_VIEWS``, which routes through ``backend.asgi_urls``).
+
+``async_read_view()`` serves GET on a DRF view asynchronously and leaves
+every other method to the usual synchronous view. DRF's own checks still
+run: authentication, permissions, the viewset's ``initial()``. Rows are then
+fetched with the async ORM, and the response is serialized and rendered
+without holding a worker thread in between. ``run_queries()`` runs a view's
+independent queries side by side, each on its own thread and connection.
+"""
+import asyncio
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.response import Response
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def release_connections(function):
+    """Run ``function``, then close the connections it left unusable or past
+    ``CONN_MAX_AGE``. Pool threads never see the request_finished cleanup."""
+    def run():
+        try:
+            return function()
+        finally:
+            for connection in connections.all(initialized_only=True):
+                connection.close_if_unusable_or_obsolete()
+    return run
+
+
+async def run_queries(queries, using=DEFAULT_DB_ALIAS):
+    """Evaluate ``{name: function}`` concurrently; returns ``{name: result}``.
+
+    Each function runs its query (or queries) and returns plain data. SQLite
+    in WAL mode serves readers on separate connections at the same time. An
+    in-memory database (the test suite's) exists only on the connection
+    holding the test transaction, so there they run in turn on the request's
+    thread.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        results = [await sync_to_async(function)() for function in queries.values()]
+    else:
+        results = await asyncio.gather(*(
+            sync_to_async(release_connections(function), thread_sensitive=False)()
+            for function in queries.values()
+        ))
+    return dict(zip(queries, results))
+
+
+async def alist(view, request):
+    """The ``list`` action, fetching rows with the async ORM.
+
+    Serializing runs on the request's thread: serializer fields may touch
+    storage (model thumbnails) and would block the event loop.
+    """
+    queryset = view.filter_queryset(view.get_queryset())
+    paginator = view.paginator
+    page = None
+    if paginator is not None:
+        if hasattr(paginator, 'apaginate_queryset'):
+            page = await paginator.apaginate_queryset(queryset, request, view=view)
+        else:
+            page = await sync_to_async(paginator.paginate_queryset)(queryset, request, view=view)
+    rows = page if page is not None else [row async for row in queryset]
+    data = await sync_to_async(lambda: view.get_serializer(rows, many=True).data)()
+    if page is not None:
+        return view.get_paginated_response(data)
+    return Response(data)
+
+
+def async_read_view(view_class, handler=alist, actions=None):
+    """A view for ``view_class``'s URL that awaits ``handler(view, request)``
+    for GET and HEAD, and calls the synchronous view for other methods.
+
+    ``actions`` is the viewset action map, as given to ``as_view()``.
+    """
+    sync_view = view_class.as_view(actions) if actions else view_class.as_view()
+    handle_sync = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in READ_METHODS:
+            return await handle_sync(request, *args, **kwargs)
+
+        self = view_class(**sync_view.initkwargs)
+        if actions:
+            self.action_map = {**actions, 'head': actions['get']}
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            # authentication may load the user row on a cache miss
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await handler(self, request)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        # Django renders the response on the request's thread
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    view.cls = view_class
+    view.initkwargs = sync_view.initkwargs
+    view.actions = actions
+    # the synchronous view is exempt too; unsafe methods are passed to it
+    view.csrf_exempt = True
+    return view
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """WhiteNoise that can sit in an async middleware chain.
+
+    WhiteNoise's middleware is synchronous only. Under ASGI, Django would run
+    every request below it, async views included, through a thread. Static
+    files are still served from a thread; everything else is awaited.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
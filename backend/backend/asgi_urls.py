@@ -0,0 +1,28 @@
+"""URLs for the ASGI app: the hot read endpoints as async views
+(``backend.aio``) ahead of the usual routes, which serve everything else.
+
+Selected by ``ASYNC_READ_VIEWS`` (see settings and ``asgi.py``).
+"""
+from django.urls import path
+
+from assignments.dashboard_views import adashboard_stats, dashboard_stats
+from assignments.versions import conditional_handler
+from assignments.views import AssignmentViewSet, SubmissionViewSet
+from models3d.views import Model3DListCreateView
+from .aio import alist, async_read_view
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/models/', async_read_view(Model3DListCreateView, conditional_handler(alist)), name='model3d-list-create'),
+    path(
+        'api/assignments/',
+        async_read_view(AssignmentViewSet, conditional_handler(alist), actions={'get': 'list', 'post': 'create'}),
+        name='assignment-list',
+    ),
+    path(
+        'api/submissions/',
+        async_read_view(SubmissionViewSet, conditional_handler(alist), actions={'get': 'list', 'post': 'create'}),
+        name='submission-list',
+    ),
+    path('api/dashboard/stats/', async_read_view(dashboard_stats.cls, adashboard_stats), name='dashboard-stats'),
+] + sync_urlpatterns
@@ -0,0 +1,163 @@
+"""A two-tier cache backend: a size-bounded LRU in each worker process in
+front of a file-based cache that every worker on the host shares.
+
+    CACHES = {'responses': {
+        'BACKEND': 'backend.cache.TieredCache',
+        'LOCATION': '/path/to/cache/dir',
+        'OPTIONS': {'LOCAL_MAX_ENTRIES': 512, 'MAX_ENTRIES': 20000},
+    }}
+
+A read tries the process's LRU, then the shared directory (Django's
+``FileBasedCache``, culled at ``MAX_ENTRIES``), and keeps what it found there
+in the LRU. Writes go to both. Values in the LRU are shared between the
+threads of the process, not copied: treat what ``get()`` returns as
+read-only. A value promoted from the shared tier stays in the LRU for the
+cache's default timeout, so keep keys versioned (as ``assignments.versions``
+does) rather than relying on ``delete()`` reaching other workers.
+
+``stats()`` reports each tiered cache's hits per tier and hit ratio in this
+process (``/api/metrics/``).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+MISSING = object()
+
+# one LRU per LOCATION and process: Django builds a cache instance per thread
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """A thread-safe LRU of ``(expiry, value)`` with hit counters."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expiry, value = entry
+            if expiry is not None and expiry <= time.time():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expiry):
+        with self._lock:
+            self._entries[key] = (expiry, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            entries = len(self._entries)
+        lookups = sum(counts.values())
+        hits = counts['local_hits'] + counts['shared_hits']
+        return {**counts, 'local_entries': entries, 'hit_ratio': round(hits / lookups, 4) if lookups else None}
+
+    def reset_stats(self):
+        with self._lock:
+            self.counts = dict.fromkeys(self.counts, 0)
+
+
+def local_tier(location, max_entries):
+    with _tiers_lock:
+        tier = _tiers.get(location)
+        if tier is None:
+            tier = _tiers[location] = LocalTier(max_entries)
+        return tier
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.local = local_tier(str(location), options.get('LOCAL_MAX_ENTRIES', 512))
+        self.shared = FileBasedCache(location, params)
+
+    def get(self, key, default=None, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        value = self.local.get(full_key)
+        if value is not MISSING:
+            self.local.count('local_hits')
+            return value
+        value = self.shared.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.local.count('misses')
+            return default
+        self.local.count('shared_hits')
+        self.local.set(full_key, value, self.get_backend_timeout())
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout, version=version)
+        self.local.set(full_key, value, self.get_backend_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout, version=version):
+            return False
+        self.local.set(self.make_and_validate_key(key, version=version), value, self.get_backend_timeout(timeout))
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        value = self.local.get(full_key)
+        if value is not MISSING:
+            self.local.set(full_key, value, self.get_backend_timeout(timeout))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        """Deletes from this process's LRU and the shared tier; other
+        workers' LRUs keep their copy until it expires."""
+        deleted = self.local.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version) or deleted
+
+    def has_key(self, key, version=None):
+        full_key = self.make_and_validate_key(key, version=version)
+        return self.local.get(full_key) is not MISSING or self.shared.has_key(key, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+
+def stats():
+    """``{alias: counters}`` for every configured ``TieredCache``."""
+    return {
+        alias: caches[alias].local.stats()
+        for alias, config in settings.CACHES.items()
+        if config['BACKEND'] == f'{__name__}.TieredCache'
+    }
+
+
+def reset_stats():
+    for alias in stats():
+        caches[alias].local.reset_stats()
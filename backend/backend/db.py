@@ -0,0 +1,95 @@
+"""One writer at a time for the SQLite database.
+
+SQLite allows a single writer per file. With ``transaction_mode=IMMEDIATE``
+and a ``busy_timeout`` (see ``DATABASES`` in settings) a second writer waits
+instead of failing, but it waits by sleeping and retrying, so under a burst
+of draft saves from several gunicorn workers the unlucky ones still time out
+with "database is locked".
+
+``write_queue()`` puts writers in line before they reach SQLite: a lock per
+process for threads, and an ``flock`` on ``<database>.write-lock`` across
+processes, which the kernel hands to the next waiter as soon as it is
+released. Readers never take it; in WAL mode they don't block the writer.
+"""
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: threads are still queued, processes rely on busy_timeout
+    fcntl = None
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+_local = threading.local()
+_thread_locks = {}
+_guard = threading.Lock()
+
+
+class FileWriteLock:
+    """Exclusive ``flock`` on ``path``, blocking until it is free."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fh = None
+
+    def __enter__(self):
+        self.fh = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        # closing the descriptor releases the lock
+        self.fh.close()
+        self.fh = None
+
+
+def lock_path(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return None
+    return f"{connection.settings_dict['NAME']}.write-lock"
+
+
+def thread_lock(using):
+    with _guard:
+        return _thread_locks.setdefault(using, threading.Lock())
+
+
+@contextmanager
+def write_queue(using=DEFAULT_DB_ALIAS):
+    """Run the block in ``transaction.atomic()`` once every other writer to
+    the database has finished.
+
+    Re-entrant, and a no-op (beyond the transaction) when the caller is
+    already inside a transaction, for other databases, or with
+    ``SQLITE_WRITE_QUEUE`` off.
+    """
+    held = getattr(_local, 'held', None)
+    if held is None:
+        held = _local.held = set()
+    connection = connections[using]
+    if (
+        using in held
+        or connection.in_atomic_block  # already a writer: waiting here could deadlock
+        or connection.vendor != 'sqlite'
+        or not getattr(settings, 'SQLITE_WRITE_QUEUE', False)
+    ):
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    path = lock_path(using)
+    with thread_lock(using):
+        held.add(using)
+        try:
+            if path is None:
+                with transaction.atomic(using=using):
+                    yield
+            else:
+                with FileWriteLock(path), transaction.atomic(using=using):
+                    yield
+        finally:
+            held.discard(using)
@@ -0,0 +1,250 @@
+"""Publish/subscribe for change events, such as the live submission roster
+(``assignments.live``).
+
+``publish(channel, event)`` hands a JSON-serializable event to every current
+subscriber of ``channel``. ``subscribe(channel)`` returns a ``Subscription``
+to read them from, blocking (``get``) or awaiting (``aget``). Nothing is
+stored: a subscriber sees what is published while it is subscribed.
+
+``EVENT_BROKER`` picks the backend:
+
+- ``backend.events.LocalBroker`` delivers within the publishing process.
+- ``backend.events.SocketBroker`` also relays each event to the other worker
+  processes on the host, through one Unix datagram socket per subscribing
+  process in ``EVENT_SOCKET_DIR``. It stands in for an external broker
+  (Redis pub/sub and the like), which would be another ``LocalBroker``
+  subclass overriding ``publish`` and ``listen``.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# events a subscriber may fall behind by before it is told it lost some
+BACKLOG = 1000
+SUFFIX = '.sock'
+MAX_DATAGRAM = 64 * 1024
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+class Subscription:
+    """The events published on ``channel`` since subscribing.
+
+    ``get()`` and ``aget()`` return the waiting events, oldest first: an
+    empty list when ``timeout`` passes first, and ``None`` when more than
+    ``BACKLOG`` piled up and were dropped, so the reader must start over.
+    """
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self._events = []
+        self._lost = False
+        self._ready = threading.Condition()
+        self._waiters = set()
+
+    def deliver(self, event):
+        """Called by the broker, from any thread."""
+        with self._ready:
+            if len(self._events) >= BACKLOG:
+                self._events.clear()
+                self._lost = True
+            else:
+                self._events.append(event)
+            self._ready.notify_all()
+            waiters = list(self._waiters)
+        for loop, woken in waiters:
+            loop.call_soon_threadsafe(woken.set)
+
+    def _take(self):
+        if self._lost:
+            self._lost = False
+            return None
+        events, self._events = self._events, []
+        return events
+
+    def get(self, timeout=None):
+        with self._ready:
+            if not self._events and not self._lost:
+                self._ready.wait(timeout)
+            return self._take()
+
+    async def aget(self, timeout=None):
+        woken = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), woken)
+        with self._ready:
+            if self._events or self._lost:
+                return self._take()
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(woken.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._ready:
+                self._waiters.discard(waiter)
+        with self._ready:
+            return self._take()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalBroker:
+    """Delivers events to the subscribers in this process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        self.listen()
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def publish(self, channel, event):
+        self.deliver(channel, event)
+
+    def listen(self):
+        """Start receiving other processes' events; a no-op here."""
+
+
+class SocketBroker(LocalBroker):
+    """Relays events between the worker processes on one host.
+
+    A process binds ``<pid>-<random>.sock`` in ``directory`` when something
+    in it first subscribes, and a thread hands what arrives there to the
+    local subscribers. Publishing sends a datagram to every socket in the
+    directory without blocking; sockets whose process is gone are removed.
+    Without Unix sockets (Windows) it only delivers locally.
+    """
+
+    def __init__(self, directory=None):
+        super().__init__()
+        self.directory = str(directory or settings.EVENT_SOCKET_DIR)
+        self._path = None
+        self._pid = None
+        self._sender = None
+        self._listen_lock = threading.Lock()
+
+    def listen(self):
+        if self._pid == os.getpid() or not hasattr(socket, 'AF_UNIX'):
+            return
+        with self._listen_lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}{SUFFIX}')
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(path)
+            atexit.register(unlink, path)
+            threading.Thread(target=self._receive, args=(receiver,), name='event-relay', daemon=True).start()
+            self._path, self._pid = path, os.getpid()
+
+    def _receive(self, receiver):
+        while True:
+            data = receiver.recv(MAX_DATAGRAM)
+            try:
+                message = json.loads(data)
+                self.deliver(message['channel'], message['event'])
+            except Exception:
+                logger.exception("Dropped a malformed event")
+
+    def publish(self, channel, event):
+        self.deliver(channel, event)
+        if not hasattr(socket, 'AF_UNIX'):
+            return
+        data = json.dumps({'channel': channel, 'event': event}, separators=(',', ':')).encode()
+        if len(data) > MAX_DATAGRAM:
+            logger.warning("Event on %s is %d bytes; not relayed to other workers", channel, len(data))
+            return
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return  # nobody has subscribed yet
+        own = self._path if self._pid == os.getpid() else None
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not name.endswith(SUFFIX) or path == own:
+                continue
+            try:
+                self.sender().sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                unlink(path)  # its process exited without cleaning up
+            except BlockingIOError:
+                logger.warning("Event on %s dropped: %s is not keeping up", channel, name)
+
+    def sender(self):
+        if self._sender is None:
+            sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sender.setblocking(False)
+            self._sender = sender
+        return self._sender
+
+
+def unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def broker():
+    """The ``EVENT_BROKER`` instance for this process."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'EVENT_BROKER', 'backend.events.LocalBroker'))()
+    return _broker
+
+
+def publish(channel, event):
+    broker().publish(channel, event)
+
+
+def subscribe(channel):
+    return broker().subscribe(channel)
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting in ('EVENT_BROKER', 'EVENT_SOCKET_DIR'):
+        _broker = None
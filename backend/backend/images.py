@@ -0,0 +1,205 @@
+"""Resized, re-encoded copies of user-uploaded images.
+
+Screenshots and profile photos arrive as whatever the browser produced, often
+multi-megabyte PNG canvas captures. After an upload commits, a background job
+(``backend.tasks``) writes WebP and JPEG copies at fixed widths with all
+metadata stripped, named ``<original>.w<width>.<format>``.
+
+Unless ``IMAGE_KEEP_ORIGINALS`` is on, the original upload is then replaced by
+a metadata-free WebP no wider than ``IMAGE_MAX_WIDTH``. Either way the job
+sends ``derivatives_written`` when it is done.
+"""
+import logging
+import os
+import tempfile
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+from backend.tasks import submit
+
+logger = logging.getLogger(__name__)
+
+# (format, Pillow format, save options); the last one is written last and
+# marks the set as complete
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+ORIGINAL_OPTIONS = {'quality': 85, 'method': 4}
+
+# (model label, field name) -> derivative widths, filled in by watch()
+_widths = {}
+
+# sent with sender=<model>, pk=<row pk>, field=<field name>
+derivatives_written = Signal()
+
+
+def derivative_name(name, width, fmt):
+    return f'{name}.w{width}.{fmt}'
+
+
+def derivative_names(name, widths):
+    return [derivative_name(name, width, fmt) for width in widths for fmt, _, _ in FORMATS]
+
+
+def widths_for(model, field):
+    return _widths.get((model._meta.label, field))
+
+
+def has_derivatives(file, widths):
+    return file.storage.exists(derivative_name(file.name, widths[-1], FORMATS[-1][0]))
+
+
+def load(file):
+    """Open ``file`` upright, fully decoded, with its metadata dropped."""
+    with file.storage.open(file.name, 'rb') as fh:
+        image = Image.open(fh)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    image.info = {}
+    return image
+
+
+def resized(image, width):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def encode(image, pillow_format, options):
+    if pillow_format == 'JPEG' and image.mode == 'RGBA':
+        flat = Image.new('RGB', image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel('A'))
+        image = flat
+    out = BytesIO()
+    image.save(out, pillow_format, **options)
+    return out.getvalue()
+
+
+def write(storage, name, data):
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as out:
+        out.write(data)
+    if storage.file_permissions_mode is not None:
+        os.chmod(tmp_path, storage.file_permissions_mode)
+    os.replace(tmp_path, path)
+
+
+def replace_original(model, pk, field, file, image):
+    """Swap the upload for a bounded WebP and return the file name now in use."""
+    storage, name = file.storage, file.name
+    webp = encode(resized(image, settings.IMAGE_MAX_WIDTH), 'WEBP', ORIGINAL_OPTIONS)
+    if name.lower().endswith('.webp'):
+        write(storage, name, webp)
+        return name
+
+    new_name = storage.get_available_name(os.path.splitext(name)[0] + '.webp')
+    write(storage, new_name, webp)
+    # only if the row still points at the file we processed
+    if not model._base_manager.filter(pk=pk, **{field: name}).update(**{field: new_name}):
+        storage.delete(new_name)
+        return None
+    storage.delete(name)
+    return new_name
+
+
+def process(label, pk, field):
+    """Background job: write derivatives for ``label`` row ``pk``'s ``field``."""
+    model = apps.get_model(label)
+    instance = model._base_manager.filter(pk=pk).first()
+    file = getattr(instance, field, None)
+    if not file:
+        return
+    widths = _widths[(label, field)]
+    try:
+        image = load(file)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        logger.warning("Could not read %s %s %s: %s", label, pk, field, exc)
+        return
+
+    name = file.name
+    if not settings.IMAGE_KEEP_ORIGINALS:
+        name = replace_original(model, pk, field, file, image)
+        if name is None:
+            return
+    for width in widths:
+        small = resized(image, width)
+        for fmt, pillow_format, options in FORMATS:
+            write(file.storage, derivative_name(name, width, fmt), encode(small, pillow_format, options))
+    derivatives_written.send(sender=model, pk=pk, field=field)
+
+
+def delete_derivatives(file, widths):
+    for derivative in derivative_names(file.name, widths):
+        file.storage.delete(derivative)
+
+
+def watch(model, field, widths):
+    """Keep derivatives of ``model.field`` at ``widths``; call from AppConfig.ready()."""
+    label = model._meta.label
+    _widths[(label, field)] = tuple(sorted(widths))
+    uid = f'images:{label}.{field}'
+
+    def remember_previous(sender, instance, update_fields=None, **kwargs):
+        if instance.pk and (update_fields is None or field in update_fields):
+            instance.__dict__[f'_previous_{field}'] = (
+                sender._base_manager.filter(pk=instance.pk).values_list(field, flat=True).first()
+            )
+
+    def schedule(sender, instance, created, **kwargs):
+        file = getattr(instance, field)
+        if created:
+            changed = True
+        elif f'_previous_{field}' in instance.__dict__:
+            previous = instance.__dict__.pop(f'_previous_{field}')
+            changed = previous != file.name
+            if previous and changed:
+                delete_derivatives(file.field.attr_class(instance, file.field, previous), widths)
+        else:
+            changed = False  # saved with update_fields that leave the image alone
+        if file and changed:
+            pk = instance.pk
+            transaction.on_commit(lambda: submit(process, label, pk, field))
+
+    def cleanup(sender, instance, **kwargs):
+        file = getattr(instance, field)
+        if file:
+            delete_derivatives(file, widths)
+
+    pre_save.connect(remember_previous, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(schedule, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(cleanup, sender=model, weak=False, dispatch_uid=uid)
+
+
+class DerivativeField(serializers.Field):
+    """``{"webp": {"320": url, ...}, "jpeg": {...}}`` for an image field, or
+    None until its derivatives have been written."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, file):
+        widths = widths_for(type(file.instance), file.field.name) if file else None
+        if not widths or not has_derivatives(file, widths):
+            return None
+        request = self.context.get('request')
+        urls = {}
+        for fmt, _, _ in FORMATS:
+            urls[fmt] = {}
+            for width in widths:
+                url = file.storage.url(derivative_name(file.name, width, fmt))
+                urls[fmt][str(width)] = request.build_absolute_uri(url) if request else url
+        return urls
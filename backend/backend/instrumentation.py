@@ -0,0 +1,243 @@
+"""Per-request timing: ``Server-Timing`` headers, a log line and rolling
+percentiles.
+
+``ServerTimingMiddleware`` records for every request:
+
+- ``db``: number of queries and time spent executing them, on every
+  configured database;
+- ``serialize``: time spent producing DRF ``serializer.data``;
+- ``view``: time from entering the view to having the rendered response;
+- ``app``: the whole request, from this middleware's point of view.
+
+They are sent back as ``Server-Timing`` (browser devtools show it on the
+Timing tab), logged as one JSON line on the ``backend.requests`` logger
+(at INFO, off unless ``REQUEST_LOG_LEVEL`` turns it on), and kept in a
+window of the last ``REQUEST_METRICS_WINDOW`` requests per URL name. The
+window is per worker process; ``GET /api/metrics/`` (staff only) returns
+its p50/p95/p99, along with the hit ratios of the tiered caches
+(``backend.cache``) in the same process.
+
+Queries are counted by a wrapper installed on every database connection,
+which reports to the request in the current context. Under ASGI that
+includes queries an async view runs on other threads.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from . import cache
+
+logger = logging.getLogger('backend.requests')
+
+FIELDS = ('app_ms', 'view_ms', 'db_ms', 'serialize_ms', 'queries')
+PERCENTILES = (50, 95, 99)
+
+_current = ContextVar('request_metrics', default=None)
+_windows = defaultdict(lambda: deque(maxlen=getattr(settings, 'REQUEST_METRICS_WINDOW', 1000)))
+_lock = threading.Lock()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.serialize_depth = 0
+        self.view_started = None
+        self.view = 0.0
+        # an async view may run several queries at once
+        self.lock = threading.Lock()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.db += elapsed
+                self.queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def track(connection, **kwargs):
+    """Install ``record_query`` on ``connection`` once. First in line, so
+    other ``execute_wrapper()`` blocks still pop their own wrapper."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+connection_created.connect(track, dispatch_uid='backend.instrumentation.track')
+
+
+@contextmanager
+def serializing():
+    """Count the block as serialization time, once however deeply nested
+    (a ``SerializerMethodField`` may build another serializer's ``.data``)."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.serialize_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_depth -= 1
+        if not metrics.serialize_depth:
+            metrics.serialize += time.perf_counter() - started
+
+
+def _timed_data(data):
+    def timed(self):
+        with serializing():
+            return data.fget(self)
+    return property(timed, doc=data.__doc__)
+
+
+def instrument_serializers():
+    # Every Serializer.data and ListSerializer.data ends in BaseSerializer.data.
+    if not getattr(serializers.BaseSerializer.data, '_timed', False):
+        serializers.BaseSerializer.data = _timed_data(serializers.BaseSerializer.data)
+        serializers.BaseSerializer.data.fget._timed = True
+
+
+def url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match and match.view_name else '<unresolved>'
+
+
+def server_timing(sample):
+    return ', '.join([
+        f'db;dur={sample["db_ms"]:.1f};desc="{sample["queries"]} queries"',
+        f'serialize;dur={sample["serialize_ms"]:.1f}',
+        f'view;dur={sample["view_ms"]:.1f}',
+        f'app;dur={sample["app_ms"]:.1f}',
+    ])
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, -(-len(ordered) * pct // 100) - 1)
+    return ordered[index]
+
+
+def record(name, sample):
+    with _lock:
+        _windows[name].append(tuple(sample[field] for field in FIELDS))
+
+
+def summary():
+    """``{url_name: {'count': n, field: {'p50': .., 'p95': .., 'p99': ..}}}``."""
+    with _lock:
+        windows = {name: list(samples) for name, samples in _windows.items()}
+    result = {}
+    for name, samples in sorted(windows.items()):
+        stats = {'count': len(samples)}
+        for i, field in enumerate(FIELDS):
+            ordered = sorted(sample[i] for sample in samples)
+            stats[field] = {f'p{pct}': round(percentile(ordered, pct), 2) for pct in PERCENTILES}
+        result[name] = stats
+    return result
+
+
+def reset():
+    with _lock:
+        _windows.clear()
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        instrument_serializers()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            track(connection)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(self, request, response, metrics, started):
+        finished = time.perf_counter()
+        if metrics.view_started is not None:
+            metrics.view = finished - metrics.view_started
+
+        sample = {
+            'app_ms': (finished - started) * 1000,
+            'view_ms': metrics.view * 1000,
+            'db_ms': metrics.db * 1000,
+            'serialize_ms': metrics.serialize * 1000,
+            'queries': metrics.queries,
+        }
+        name = url_name(request)
+        record(name, sample)
+        response['Server-Timing'] = server_timing(sample)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'url_name': name,
+                'status': response.status_code,
+                **{field: round(value, 2) for field, value in sample.items()},
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    """Rolling per-URL-name percentiles and cache hit ratios for this
+    worker process."""
+    return Response({
+        'window': getattr(settings, 'REQUEST_METRICS_WINDOW', 1000),
+        'endpoints': summary(),
+        'caches': cache.stats(),
+    })
@@ -0,0 +1,126 @@
+"""Lean read serializers for the list endpoints.
+
+A ``RowSerializer`` turns ``.values()`` rows into the dicts a DRF
+``ModelSerializer`` builds from model instances, skipping the instances,
+the bound fields and the ``ReturnDict``s. A subclass names the columns it
+reads and lists its output as ``(key, source)`` pairs in ``fields()``: a
+column name is copied from the row, a function is called with it. Per
+request, ``compile_row()`` turns that list into one function returning a
+dict display, which the page's rows are mapped through. Datetimes are left
+as ``datetime`` objects; ``backend.renderers.JSONRenderer`` writes them as
+DRF's ``DateTimeField`` would.
+
+``LeanListMixin`` serves a view's GET list with its
+``row_serializer_class``; every other action keeps the DRF serializer. The
+tests compare both paths byte for byte, and ``manage.py
+benchmark_serializers`` times them.
+"""
+from functools import lru_cache
+
+from . import instrumentation
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+@lru_cache(maxsize=None)
+def _row_factory(layout):
+    """Source-compiled ``row_to_dict`` for ``((key, column or None), ...)``;
+    a ``None`` column takes the next function passed to the factory."""
+    params, items = [], []
+    for i, (key, column) in enumerate(layout):
+        if column is None:
+            params.append(f'f{i}')
+            items.append(f'{key!r}: f{i}(row)')
+        else:
+            items.append(f'{key!r}: row[{column!r}]')
+    source = (
+        f'def factory({", ".join(params)}):\n'
+        f'    def row_to_dict(row):\n'
+        f'        return {{{", ".join(items)}}}\n'
+        f'    return row_to_dict\n'
+    )
+    namespace = {}
+    exec(source, namespace)
+    return namespace['factory']
+
+
+def compile_row(fields):
+    """``row -> dict`` for ``[(key, source)]``, keys in that order. A string
+    source copies that column; a callable is called with the row."""
+    layout = tuple((key, None if callable(source) else source) for key, source in fields)
+    return _row_factory(layout)(*(source for _, source in fields if callable(source)))
+
+
+def file_url(storage, request=None):
+    """``name -> url`` as DRF's ``FileField`` writes it: absolute when
+    there is a request. Callers skip empty names (DRF writes None)."""
+    if request is None:
+        return storage.url
+    return lambda name: request.build_absolute_uri(storage.url(name))
+
+
+def nested(prefix, serializer_class):
+    """``serializer_class``'s columns, reached through ``prefix`` (``'teacher__'``)."""
+    return tuple(prefix + column for column in serializer_class.columns)
+
+
+class RowSerializer:
+    """Read-only stand-in for a ``ModelSerializer`` with ``many=True``, over
+    ``.values()`` rows; see the module docstring."""
+    columns = ()
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        if not many:
+            raise TypeError(f"{type(self).__name__} only serializes lists of rows.")
+        self.instance = instance
+        self.context = context or {}
+
+    @classmethod
+    def select(cls, queryset):
+        """``queryset`` as rows of ``columns``, plus its annotations (the
+        pagination may order on them)."""
+        return queryset.prefetch_related(None).values(*cls.columns, *queryset.query.annotations)
+
+    def prepare(self, rows):
+        """Batch-load what the page's rows need beyond their own columns."""
+
+    def fields(self, prefix=''):
+        """``[(key, source)]`` for ``compile_row()``; ``prefix`` when the
+        columns are reached through a relation."""
+        return [(column, prefix + column) for column in self.columns]
+
+    def mapper(self, prefix=''):
+        return compile_row(self.fields(prefix))
+
+    @property
+    def data(self):
+        with instrumentation.serializing():
+            rows = self.instance if isinstance(self.instance, list) else list(self.instance)
+            self.prepare(rows)
+            return list(map(self.mapper(), rows))
+
+
+class LeanListMixin:
+    """Serve GET lists through ``row_serializer_class`` from ``.values()``
+    rows. ``lean_rows = False``, or ``lean_list()`` returning False for a
+    request, keeps the DRF serializer."""
+    row_serializer_class = None
+    lean_rows = True
+
+    def lean_list(self):
+        # generic list views have no action; viewsets map HEAD to 'list' too
+        return (
+            self.lean_rows and self.request.method in READ_METHODS
+            and getattr(self, 'action', 'list') == 'list'
+        )
+
+    def get_serializer_class(self):
+        if self.lean_list():
+            return self.row_serializer_class
+        return super().get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.lean_list():
+            return self.row_serializer_class.select(queryset)
+        return queryset
@@ -0,0 +1,75 @@
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.profiling import SUFFIX
+
+
+def read_folded(path):
+    samples = Counter()
+    with open(path) as fh:
+        for line in fh:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack and count.isdigit():
+                samples[stack] += int(count)
+    return samples
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge the sampled request profiles in PROFILE_DIR by endpoint: write one "
+        "collapsed-stack file per URL name and print the hottest frames."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("endpoints", nargs="*", help="URL names to aggregate (default: all).")
+        parser.add_argument("--output", help="Directory for the merged .folded files (default: PROFILE_DIR).")
+        parser.add_argument("--top", type=int, default=10, help="Frames to list per endpoint.")
+        parser.add_argument("--delete", action="store_true", help="Remove the per-request files once merged.")
+
+    def handle(self, *args, **options):
+        root = str(settings.PROFILE_DIR)
+        if not os.path.isdir(root):
+            raise CommandError(f"No profiles in {root}.")
+        output = options["output"] or root
+        os.makedirs(output, exist_ok=True)
+        endpoints = options["endpoints"] or sorted(
+            name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name))
+        )
+
+        for name in endpoints:
+            directory = os.path.join(root, name)
+            files = sorted(f for f in os.listdir(directory) if f.endswith(SUFFIX)) if os.path.isdir(directory) else []
+            if not files:
+                self.stderr.write(f"{name}: no profiles")
+                continue
+
+            merged = Counter()
+            for filename in files:
+                merged.update(read_folded(os.path.join(directory, filename)))
+            target = os.path.join(output, f"{name}{SUFFIX}")
+            with open(target, "w") as out:
+                for stack, count in merged.most_common():
+                    out.write(f"{stack} {count}\n")
+            if options["delete"]:
+                for filename in files:
+                    os.remove(os.path.join(directory, filename))
+
+            total = sum(merged.values())
+            self.stdout.write(self.style.SUCCESS(f"{name}: {len(files)} profile(s), {total} samples -> {target}"))
+            self.report(merged, total, options["top"])
+
+    def report(self, merged, total, top):
+        if not total:
+            return
+        own, inclusive = Counter(), Counter()
+        for stack, count in merged.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+        self.stdout.write("  self%   total%  frame")
+        for frame, count in own.most_common(top):
+            self.stdout.write(f"  {100 * count / total:5.1f}  {100 * inclusive[frame] / total:6.1f}  {frame}")
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Workers are spawned processes that configure Django for their mode, so this
+# module must import without loaded settings or models; those imports are
+# made inside the functions.
+
+# (name, role, path): the endpoints asgi_urls serves asynchronously
+ROUTES = [
+    ('GET /api/dashboard/stats/', 'teacher', '/api/dashboard/stats/'),
+    ('GET /api/dashboard/stats/', 'student', '/api/dashboard/stats/'),
+    ('GET /api/assignments/?page_size=50', 'teacher', '/api/assignments/?page_size=50'),
+    ('GET /api/assignments/?page_size=50', 'student', '/api/assignments/?page_size=50'),
+    ('GET /api/submissions/?page_size=50', 'teacher', '/api/submissions/?page_size=50'),
+    ('GET /api/submissions/?page_size=50', 'student', '/api/submissions/?page_size=50'),
+    ('GET /api/models/?page_size=50', 'student', '/api/models/?page_size=50'),
+]
+MODES = ('sync', 'async')
+
+
+def setup(mode):
+    os.environ['ASYNC_READ_VIEWS'] = '1' if mode == 'async' else '0'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    # the test clients send "Host: testserver", as the test runner allows
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+
+
+def result(response, started):
+    """One request: ``(status, seconds, bytes, queries)``, as in benchmark_endpoints."""
+    from .benchmark_endpoints import QUERIES_RE
+    elapsed = time.perf_counter() - started
+    match = QUERIES_RE.search(response.get('Server-Timing', ''))
+    return response.status_code, elapsed, len(response.content), int(match.group(1)) if match else None
+
+
+def run_sync(calls, concurrency, deadline):
+    """``concurrency`` threads, each sending one request at a time."""
+    from django.db import connections
+    from django.test import Client
+
+    samples = []
+    lock = threading.Lock()
+
+    def work(offset):
+        client = Client()
+        mine = []
+        i = offset
+        try:
+            while time.perf_counter() < deadline:
+                path, token = calls[i % len(calls)]
+                started = time.perf_counter()
+                mine.append(result(client.get(path, headers={'Authorization': f'Bearer {token}'}), started))
+                i += concurrency
+        finally:
+            connections.close_all()
+        with lock:
+            samples.extend(mine)
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+async def run_async(calls, concurrency, deadline):
+    """``concurrency`` tasks on one event loop, each sending one request at a time."""
+    from asgiref.sync import ThreadSensitiveContext
+    from django.test import AsyncClient
+
+    async def work(offset):
+        client = AsyncClient()
+        mine = []
+        i = offset
+        while time.perf_counter() < deadline:
+            path, token = calls[i % len(calls)]
+            started = time.perf_counter()
+            # as ASGIHandler does (AsyncClient does not): each request's
+            # synchronous work gets a thread of its own
+            async with ThreadSensitiveContext():
+                response = await client.get(path, headers={'Authorization': f'Bearer {token}'})
+            mine.append(result(response, started))
+            i += concurrency
+        return mine
+
+    batches = await asyncio.gather(*(work(offset) for offset in range(concurrency)))
+    return [sample for batch in batches for sample in batch]
+
+
+def worker(mode, calls, concurrency, warmup, duration, ready, start, results):
+    """A worker process: serve ``calls`` in ``mode`` for ``duration`` seconds
+    once every worker has warmed up."""
+    setup(mode)
+    run = run_sync if mode == 'sync' else (lambda *args: asyncio.run(run_async(*args)))
+    run(calls, concurrency, time.perf_counter() + warmup)
+    ready.release()
+    start.wait()
+    results.put(run(calls, concurrency, time.perf_counter() + duration))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests per second of the synchronous views (WSGI) with the "
+        "async read path (ASGI, backend.aio) on the dashboard and the assignment, "
+        "submission and model lists. Each mode runs the same number of worker "
+        "processes against the current database (see seed_data), each worker "
+        "keeping --concurrency requests in flight: threads for sync, tasks on one "
+        "event loop for async. A sync gunicorn worker serves one request at a "
+        "time, so compare --sync-concurrency 1 with the async figure too."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('routes', nargs='*', help="Only routes whose name contains one of these.")
+        parser.add_argument('--mode', choices=MODES, action='append', help="Run only this mode (repeatable).")
+        parser.add_argument('--workers', type=int, default=2, help="Worker processes per mode.")
+        parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight per async worker.")
+        parser.add_argument('--sync-concurrency', type=int,
+                            help="Threads per sync worker (default: --concurrency).")
+        parser.add_argument('--duration', type=float, default=10.0, help="Measured seconds per route and mode.")
+        parser.add_argument('--warmup', type=float, default=1.0, help="Unmeasured seconds first.")
+        parser.add_argument('--users', type=int, default=10, help="Teachers and students to act as, each.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path', help="Write the results here ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        from .benchmark_endpoints import summarize
+
+        self.table = self.stderr if options['json_path'] == '-' else self.stdout
+        modes = options['mode'] or list(MODES)
+        concurrency = {
+            'sync': options['sync_concurrency'] or options['concurrency'],
+            'async': options['concurrency'],
+        }
+        tokens = self.tokens(random.Random(options['seed']), options['users'])
+        routes = [
+            route for route in ROUTES
+            if not options['routes'] or any(part in route[0] for part in options['routes'])
+        ]
+        if not routes:
+            raise CommandError("No route matches.")
+        if options['workers'] < 1 or min(concurrency.values()) < 1:
+            raise CommandError("--workers and the concurrency must be at least 1.")
+
+        results = {}
+        for name, role, path in routes:
+            key = f'{name} [{role}]'
+            calls = [(path, token) for token in tokens[role]]
+            results[key] = {}
+            for mode in modes:
+                samples, wall = self.run(mode, calls, concurrency[mode], options)
+                results[key][mode] = summarize(samples, wall)
+            self.report(key, results[key])
+
+        output = {
+            'config': {
+                'workers': options['workers'], 'concurrency': concurrency, 'duration': options['duration'],
+                'users': options['users'], 'seed': options['seed'],
+            },
+            'routes': results,
+        }
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(output, indent=2, sort_keys=True))
+        elif options['json_path']:
+            with open(options['json_path'], 'w') as out:
+                json.dump(output, out, indent=2, sort_keys=True)
+                out.write('\n')
+
+    def tokens(self, rng, count):
+        """Access tokens for ``count`` teachers with assignments and students
+        with an inbox, by role."""
+        from assignments.models import InboxEntry
+        from users.models import User
+        from users.serializers import CustomTokenObtainPairSerializer
+
+        ids = {
+            'teacher': list(User.objects.filter(role='teacher', created_assignments__isnull=False).distinct()
+                            .order_by('id').values_list('id', flat=True)),
+            'student': list(InboxEntry.objects.order_by('student').values_list('student', flat=True).distinct()),
+        }
+        if not ids['teacher'] or not ids['student']:
+            raise CommandError("Need teachers with assignments and students with an inbox; run seed_data first.")
+        return {
+            role: [
+                str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+                for user in User.objects.filter(pk__in=rng.sample(pks, min(count, len(pks)))).order_by('id')
+            ]
+            for role, pks in ids.items()
+        }
+
+    def run(self, mode, calls, concurrency, options):
+        """Run the workers for one route and mode; returns the samples and the
+        measured wall time."""
+        context = multiprocessing.get_context('spawn')
+        ready, start, results = context.Semaphore(0), context.Event(), context.Queue()
+        processes = [
+            context.Process(
+                target=worker,
+                args=(mode, calls, concurrency, options['warmup'], options['duration'], ready, start, results),
+            )
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.acquire()
+        started = time.perf_counter()
+        start.set()
+        samples = []
+        for _ in processes:
+            samples.extend(results.get())
+        wall = time.perf_counter() - started
+        for process in processes:
+            process.join()
+        if any(process.exitcode for process in processes):
+            raise CommandError(f"A {mode} worker failed.")
+        return samples, wall
+
+    def report(self, key, stats):
+        for mode, numbers in stats.items():
+            latency = numbers['latency_ms']
+            self.table.write(
+                f"{key:<48} {mode:<5} {numbers['rps']:>8.1f} req/s {numbers['errors']:>4} err  "
+                f"p50 {latency['p50']:>8.1f}  p95 {latency['p95']:>8.1f}  p99 {latency['p99']:>8.1f} ms"
+            )
+        if len(stats) == 2 and stats['sync']['rps']:
+            self.table.write(f"{'':<48} async/sync {stats['async']['rps'] / stats['sync']['rps']:.2f}x")
+
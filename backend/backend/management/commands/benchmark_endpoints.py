@@ -0,0 +1,252 @@
+import json
+import random
+import re
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+from assignments.models import Cohort, InboxEntry, Submission
+from backend.instrumentation import percentile
+from users.models import User
+from users.serializers import CustomTokenObtainPairSerializer
+
+from .seed_data import PASSWORD
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+# methods that change data; login and refresh are POSTs that write nothing
+WRITES = ('put', 'patch')
+
+
+class Actor:
+    """A user the benchmark acts as, with the ids its requests need."""
+
+    def __init__(self, user, **ids):
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
+        self.user = user
+        self.role = user.role
+        self.access = str(refresh.access_token)
+        self.refresh = str(refresh)
+        self.__dict__.update(ids)
+
+
+# (name, role or None for both, method, builder). A builder returns
+# (path, data) for an actor, or None when the actor has nothing to request.
+ROUTES = [
+    ('POST /api/login/', None, 'post', lambda a: ('/api/login/', {'username': a.user.username, 'password': PASSWORD})),
+    ('POST /api/refresh/', None, 'post', lambda a: ('/api/refresh/', {'refresh': a.refresh})),
+    ('GET /api/assignments/', None, 'get', lambda a: ('/api/assignments/', None)),
+    ('GET /api/assignments/?page_size=50', None, 'get', lambda a: ('/api/assignments/?page_size=50', None)),
+    ('GET /api/assignments/?expand=my_submission', 'student', 'get',
+     lambda a: ('/api/assignments/?expand=my_submission&page_size=50', None)),
+    ('GET /api/assignments/{id}/', None, 'get', lambda a: (f'/api/assignments/{a.assignment}/', None)),
+    ('GET /api/assignments/{id}/submissions_status/', 'teacher', 'get',
+     lambda a: (f'/api/assignments/{a.assignment}/submissions_status/', None)),
+    ('GET /api/assignments/{id}/submissions_status/export/', 'teacher', 'get',
+     lambda a: (f'/api/assignments/{a.assignment}/submissions_status/export/', None)),
+    ('GET /api/submissions/', None, 'get', lambda a: ('/api/submissions/', None)),
+    ('GET /api/submissions/{id}/', 'student', 'get',
+     lambda a: a.draft and (f'/api/submissions/{a.draft.pk}/', None)),
+    ('PATCH /api/submissions/{id}/', 'student', 'patch',
+     lambda a: a.draft and (f'/api/submissions/{a.draft.pk}/', {'content': a.draft.content})),
+    ('GET /api/cohorts/', 'teacher', 'get', lambda a: ('/api/cohorts/', None)),
+    ('GET /api/cohorts/{id}/members/', 'teacher', 'get',
+     lambda a: a.cohort and (f'/api/cohorts/{a.cohort}/members/', None)),
+    ('PUT /api/cohorts/{id}/members/', 'teacher', 'put',
+     lambda a: a.cohort and (f'/api/cohorts/{a.cohort}/members/', {'students': a.members})),
+    ('GET /api/dashboard/stats/', None, 'get', lambda a: ('/api/dashboard/stats/', None)),
+    ('GET /api/users/students/?page_size=50', 'teacher', 'get', lambda a: ('/api/users/students/?page_size=50', None)),
+    ('GET /api/users/students/', 'teacher', 'get', lambda a: ('/api/users/students/', None)),
+    ('GET /api/users/models/', 'teacher', 'get', lambda a: ('/api/users/models/', None)),
+    ('GET /api/models/?page_size=50', None, 'get', lambda a: ('/api/models/?page_size=50', None)),
+    ('GET /api/users/profile/', 'teacher', 'get', lambda a: ('/api/users/profile/', None)),
+    ('PATCH /api/users/profile/update/', 'teacher', 'patch',
+     lambda a: ('/api/users/profile/update/', {'bio': a.user.bio or ''})),
+]
+
+
+def request(client, actor, method, path, data):
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {actor.access}'}
+    if method == 'get':
+        return client.get(path, **headers)
+    if path.startswith('/api/users/profile/update/'):
+        return client.patch(path, encode_multipart(BOUNDARY, data), content_type=MULTIPART_CONTENT, **headers)
+    return getattr(client, method)(path, data, content_type='application/json', **headers)
+
+
+def measure(client, actor, method, path, data):
+    """One request: ``(status, seconds, bytes, queries)``."""
+    started = time.perf_counter()
+    response = request(client, actor, method, path, data)
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    elapsed = time.perf_counter() - started
+    match = QUERIES_RE.search(response.get('Server-Timing', ''))
+    return response.status_code, elapsed, len(body), int(match.group(1)) if match else None
+
+
+def summarize(results, wall):
+    latencies = sorted(result[1] * 1000 for result in results)
+    sizes = sorted(result[2] for result in results)
+    queries = [result[3] for result in results if result[3] is not None]
+    statuses = {}
+    for result in results:
+        statuses[str(result[0])] = statuses.get(str(result[0]), 0) + 1
+    return {
+        'requests': len(results),
+        'errors': sum(1 for result in results if result[0] >= 400),
+        'status': statuses,
+        'rps': round(len(results) / wall, 1) if wall else None,
+        'latency_ms': {
+            **{f'p{pct}': round(percentile(latencies, pct), 2) for pct in (50, 95, 99)},
+            'mean': round(statistics.fmean(latencies), 2),
+            'max': round(latencies[-1], 2),
+        },
+        'queries': {'min': min(queries), 'max': max(queries)} if queries else None,
+        'bytes': {'p50': percentile(sizes, 50), 'max': sizes[-1]},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API route in-process with the test client from concurrent "
+        "threads, acting as teachers and students from the current database (see "
+        "seed_data). Reports latency percentiles, query counts and response sizes, "
+        "optionally as JSON to diff between commits. Writes are idempotent: draft "
+        "saves, cohort members and profiles are saved with their current values."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('routes', nargs='*', help="Only routes whose name contains one of these.")
+        parser.add_argument('--requests', type=int, default=100, help="Measured requests per route.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per route first.")
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--users', type=int, default=10, help="Teachers and students to act as, each.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--read-only', action='store_true', help="Skip the PUT and PATCH routes.")
+        parser.add_argument('--no-response-cache', action='store_true',
+                            help="Build every response afresh (RESPONSE_CACHE = None).")
+        parser.add_argument('--json', dest='json_path', help="Write the results here ('-' for stdout).")
+        parser.add_argument('--compare', help="A previous --json file to compare against.")
+
+    def handle(self, *args, **options):
+        # keep stdout clean for the JSON when it goes there
+        self.table = self.stderr if options['json_path'] == '-' else self.stdout
+        if options['no_response_cache']:
+            settings.RESPONSE_CACHE = None
+        rng = random.Random(options['seed'])
+        actors = {'teacher': self.teachers(rng, options['users']), 'student': self.students(rng, options['users'])}
+        if not actors['teacher'] or not actors['student']:
+            raise CommandError("Need teachers with assignments and students with an inbox; run seed_data first.")
+
+        routes = [
+            route for route in ROUTES
+            if (not options['routes'] or any(part in route[0] for part in options['routes']))
+            and not (options['read_only'] and route[2] in WRITES)
+        ]
+        results = {}
+        for name, role, method, build in routes:
+            for actor_role in ([role] if role else ['teacher', 'student']):
+                calls = [(actor, build(actor)) for actor in actors[actor_role]]
+                calls = [(actor, target) for actor, target in calls if target]
+                if not calls:
+                    self.stderr.write(f"{name} [{actor_role}]: no {actor_role} has anything to request, skipped")
+                    continue
+                key = f'{name} [{actor_role}]'
+                self.run(calls, method, options['warmup'], options['threads'])
+                samples, wall = self.run(calls, method, options['requests'], options['threads'])
+                results[key] = summarize(samples, wall)
+                self.report(key, results[key])
+
+        output = {
+            'config': {
+                name: options[name]
+                for name in ('requests', 'warmup', 'threads', 'users', 'seed', 'read_only', 'no_response_cache')
+            },
+            'routes': results,
+        }
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(output, indent=2, sort_keys=True))
+        elif options['json_path']:
+            with open(options['json_path'], 'w') as out:
+                json.dump(output, out, indent=2, sort_keys=True)
+                out.write('\n')
+        if options['compare']:
+            with open(options['compare']) as fh:
+                self.compare(json.load(fh)['routes'], results)
+
+    def teachers(self, rng, count):
+        ids = list(User.objects.filter(role='teacher', created_assignments__isnull=False).distinct()
+                   .order_by('id').values_list('id', flat=True))
+        actors = []
+        for user in User.objects.filter(pk__in=rng.sample(ids, min(count, len(ids)))).order_by('id'):
+            assignment = user.created_assignments.order_by('-created_at', '-id').values_list('id', flat=True).first()
+            cohort = Cohort.objects.filter(teacher=user).order_by('id').values_list('id', flat=True).first()
+            members = list(User.objects.filter(cohort_memberships__cohort=cohort).order_by('id').values_list('id', flat=True))
+            actors.append(Actor(user, assignment=assignment, cohort=cohort, members=members))
+        return actors
+
+    def students(self, rng, count):
+        ids = list(InboxEntry.objects.order_by('student').values_list('student', flat=True).distinct())
+        actors = []
+        for user in User.objects.filter(pk__in=rng.sample(ids, min(count, len(ids)))).order_by('id'):
+            assignment = InboxEntry.objects.filter(student=user).order_by('-created_at', '-assignment').values_list(
+                'assignment', flat=True,
+            ).first()
+            draft = Submission.objects.filter(student=user, status='draft').order_by('id').first()
+            actors.append(Actor(user, assignment=assignment, draft=draft))
+        return actors
+
+    def run(self, calls, method, requests, threads):
+        """Send ``requests`` requests round-robin over ``calls`` from
+        ``threads`` threads; returns the samples and the wall time."""
+        samples = []
+        lock = threading.Lock()
+
+        def work(offset):
+            client = Client(SERVER_NAME='localhost')
+            mine = []
+            try:
+                for i in range(offset, requests, threads):
+                    actor, (path, data) = calls[i % len(calls)]
+                    mine.append(measure(client, actor, method, path, data))
+            finally:
+                connections.close_all()
+            with lock:
+                samples.extend(mine)
+
+        workers = [threading.Thread(target=work, args=(offset,)) for offset in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return samples, time.perf_counter() - started
+
+    def report(self, key, stats):
+        latency, queries = stats['latency_ms'], stats['queries']
+        self.table.write(
+            f"{key:<64} {stats['requests']:>5} req {stats['errors']:>4} err  "
+            f"p50 {latency['p50']:>8.1f}  p95 {latency['p95']:>8.1f}  p99 {latency['p99']:>8.1f} ms  "
+            f"{'?' if queries is None else queries['max']:>4} queries  {stats['bytes']['p50'] / 1024:>9.1f} KiB"
+        )
+
+    def compare(self, before, after):
+        self.table.write("")
+        self.table.write(f"{'route':<64} {'p50':>17} {'p95':>17} {'queries':>9}")
+        for key, new in after.items():
+            old = before.get(key)
+            if old is None:
+                self.table.write(f"{key:<64} (not in the baseline)")
+                continue
+            cells = []
+            for pct in ('p50', 'p95'):
+                was, now = old['latency_ms'][pct], new['latency_ms'][pct]
+                change = f"{100 * (now - was) / was:+.0f}%" if was else 'n/a'
+                cells.append(f"{now:>8.1f} ({change:>6})")
+            queries = [stats['queries']['max'] if stats['queries'] else None for stats in (old, new)]
+            self.table.write(f"{key:<64} {cells[0]} {cells[1]} {queries[0]!s:>4}->{queries[1]!s:<4}")
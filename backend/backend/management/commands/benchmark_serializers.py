@@ -0,0 +1,126 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import renderers
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from assignments.models import InboxEntry
+from assignments.views import AssignmentViewSet
+from backend import renderers as lean_renderers
+from models3d.views import Model3DListCreateView
+from users.models import User
+from users.views import StudentListView
+
+# (name, role, view class, viewset actions, query string): the lists served by backend.lean
+ROUTES = [
+    ('assignments', 'teacher', AssignmentViewSet, {'get': 'list'}, ''),
+    ('assignments', 'student', AssignmentViewSet, {'get': 'list'}, ''),
+    ('models?lod=compact', 'student', Model3DListCreateView, None, '?lod=compact'),
+    ('users/students', 'teacher', StudentListView, None, ''),
+]
+# (mode, lean_rows, renderer)
+MODES = [
+    ('drf', False, renderers.JSONRenderer()),
+    ('lean', True, lean_renderers.JSONRenderer()),
+]
+
+
+def list_view(view_class, actions, user, query):
+    """``view_class`` set up for a GET list as ``user``, as its dispatch() would."""
+    # a host settings.ALLOWED_HOSTS has outside the test runner
+    request = APIRequestFactory().get(f'/{query}', HTTP_HOST='localhost')
+    force_authenticate(request, user=user)
+    view = view_class()
+    if actions:
+        view.action_map = actions
+    view.args, view.kwargs = (), {}
+    view.request = view.initialize_request(request)
+    view.headers = view.default_response_headers
+    view.initial(view.request)
+    return view
+
+
+def run(view, lean_rows, renderer, rows):
+    """One pass: ``(seconds fetching, serializing, rendering, body)``."""
+    view.lean_rows = lean_rows
+    started = time.perf_counter()
+    page = list(view.filter_queryset(view.get_queryset())[:rows])
+    fetched = time.perf_counter()
+    data = view.get_serializer(page, many=True).data
+    serialized = time.perf_counter()
+    body = renderer.render(data)
+    rendered = time.perf_counter()
+    return fetched - started, serialized - fetched, rendered - serialized, body
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the DRF serializers and JSONRenderer with the lean row serializers "
+        "(backend.lean) and backend.renderers on the assignment, model and student "
+        "lists, in-process on the current database (see seed_data). Checks that both "
+        "produce the same bytes and reports the median milliseconds to fetch, "
+        "serialize and render --rows rows. Serializing includes the queries run after "
+        "the fetch (the lean path's page-wide lookups); fetching includes the DRF "
+        "path's prefetches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help="Rows per list (at most).")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed passes per list and mode.")
+        parser.add_argument('--json', dest='json_path', help="Write the results here ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError("--rows and --repeat must be at least 1.")
+        users = self.users()
+        self.table = self.stderr if options['json_path'] == '-' else self.stdout
+
+        results = {}
+        for name, role, view_class, actions, query in ROUTES:
+            key = f'{name} [{role}]'
+            view = list_view(view_class, actions, users[role], query)
+            bodies, results[key] = {}, {}
+            for mode, lean_rows, renderer in MODES:
+                run(view, lean_rows, renderer, options['rows'])  # warm up
+                passes = [run(view, lean_rows, renderer, options['rows']) for _ in range(options['repeat'])]
+                bodies[mode] = passes[-1][3]
+                results[key][mode] = {
+                    step: round(statistics.median(p[i] for p in passes) * 1000, 3)
+                    for i, step in enumerate(('fetch_ms', 'serialize_ms', 'render_ms'))
+                }
+                results[key][mode]['total_ms'] = round(sum(results[key][mode].values()), 3)
+            results[key]['bytes'] = len(bodies['lean'])
+            results[key]['identical'] = bodies['lean'] == bodies['drf']
+            self.report(key, results[key])
+
+        if not all(stats['identical'] for stats in results.values()):
+            self.stderr.write("The lean output differs from the DRF serializers'.")
+        output = {'config': {'rows': options['rows'], 'repeat': options['repeat']}, 'routes': results}
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(output, indent=2, sort_keys=True))
+        elif options['json_path']:
+            with open(options['json_path'], 'w') as out:
+                json.dump(output, out, indent=2, sort_keys=True)
+                out.write('\n')
+
+    def users(self):
+        """A teacher with assignments and a student with an inbox, by role."""
+        teacher = User.objects.filter(role='teacher', created_assignments__isnull=False).order_by('id').first()
+        student = InboxEntry.objects.values_list('student', flat=True).order_by('student').first()
+        if teacher is None or student is None:
+            raise CommandError("Need a teacher with assignments and a student with an inbox; run seed_data first.")
+        return {'teacher': teacher, 'student': User.objects.get(pk=student)}
+
+    def report(self, key, stats):
+        for mode, _, _ in MODES:
+            numbers = stats[mode]
+            self.table.write(
+                f"{key:<32} {mode:<5} fetch {numbers['fetch_ms']:>8.2f}  serialize {numbers['serialize_ms']:>8.2f}  "
+                f"render {numbers['render_ms']:>8.2f}  total {numbers['total_ms']:>8.2f} ms"
+            )
+        speedup = stats['drf']['total_ms'] / stats['lean']['total_ms'] if stats['lean']['total_ms'] else 0
+        self.table.write(
+            f"{'':<32} {stats['bytes']} bytes, identical: {stats['identical']}, lean/drf {speedup:.2f}x faster"
+        )
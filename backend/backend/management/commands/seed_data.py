@@ -0,0 +1,201 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from assignments import inbox
+from assignments.models import Assignment, Cohort, CohortMembership, InboxEntry, Submission
+from models3d.models import Model3D
+from users.models import User
+
+PREFIX = 'seed-'
+PASSWORD = 'seed-password'
+BATCH_SIZE = 2000
+
+
+class Buffer:
+    """Collects unsaved rows and bulk-inserts them ``BATCH_SIZE`` at a time."""
+
+    def __init__(self, model):
+        self.model = model
+        self.rows = []
+        self.written = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.model.objects.bulk_create(self.rows, batch_size=BATCH_SIZE)
+        self.written += len(self.rows)
+        self.rows = []
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with deterministic synthetic data at production-like "
+        "volumes: teachers with models, cohorts and assignments (open to every "
+        f"student, targeted at cohorts, or at students directly), students, and "
+        f"draft and submitted submissions. Seeded users are named {PREFIX}*, all "
+        f"with the password '{PASSWORD}'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=2000)
+        parser.add_argument('--students', type=int, default=20000)
+        parser.add_argument('--assignments', type=int, default=4, help="Assignments per teacher.")
+        parser.add_argument('--cohorts', type=int, default=2, help="Cohorts per teacher.")
+        parser.add_argument('--class-size', type=int, default=30, help="Students per cohort or direct assignment.")
+        parser.add_argument('--open-share', type=float, default=0.005,
+                            help="Share of assignments open to every student.")
+        parser.add_argument('--cohort-share', type=float, default=0.4,
+                            help="Share of assignments targeted at cohorts rather than students.")
+        parser.add_argument('--submit-share', type=float, default=0.6,
+                            help="Share of an assignment's audience that has a submission.")
+        parser.add_argument('--days', type=int, default=60, help="Spread creation dates over this many days.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--reset', action='store_true', help="Delete previously seeded data first.")
+
+    def handle(self, *args, **options):
+        seeded = User.objects.filter(username__startswith=PREFIX)
+        if seeded.exists():
+            if not options['reset']:
+                raise CommandError("The database already has seeded data; pass --reset to replace it.")
+            with transaction.atomic():
+                deleted = self.reset(seeded)
+            self.stdout.write(f"Deleted {deleted} seeded rows.")
+
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            counts = self.seed(rng, options)
+            counts['inbox entries'] = inbox.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ", ".join(f"{count} {name}" for name, count in counts.items()) + "."
+        ))
+
+    def reset(self, seeded):
+        # children first, so each delete is a plain DELETE rather than a cascade
+        # the collector walks object by object
+        assignments = Assignment.objects.filter(teacher__in=seeded)
+        steps = [
+            Submission.objects.filter(Q(assignment__in=assignments) | Q(student__in=seeded)),
+            InboxEntry.objects.filter(Q(assignment__in=assignments) | Q(student__in=seeded)),
+            Assignment.assigned_students.through.objects.filter(Q(assignment__in=assignments) | Q(user__in=seeded)),
+            Assignment.cohorts.through.objects.filter(assignment__in=assignments),
+            CohortMembership.objects.filter(Q(cohort__teacher__in=seeded) | Q(student__in=seeded)),
+            assignments,
+            Cohort.objects.filter(teacher__in=seeded),
+            Model3D.objects.filter(uploaded_by__in=seeded),
+            seeded,
+        ]
+        return sum(queryset.delete()[0] for queryset in steps)
+
+    def seed(self, rng, options):
+        now = timezone.now()
+        password = make_password(PASSWORD)  # hashed once: every seeded user shares it
+        class_size = min(options['class_size'], options['students'])
+
+        students = User.objects.bulk_create([
+            User(username=f'{PREFIX}student-{i:06d}', email=f'student{i}@seed.test', role='student', password=password)
+            for i in range(options['students'])
+        ], batch_size=BATCH_SIZE)
+        teachers = User.objects.bulk_create([
+            User(
+                username=f'{PREFIX}teacher-{i:05d}', email=f'teacher{i}@seed.test', role='teacher', password=password,
+                subject_expertise=rng.choice(('Biology', 'Chemistry', 'Physics', 'Geography')),
+                institution=f'School {rng.randrange(200)}',
+            )
+            for i in range(options['teachers'])
+        ], batch_size=BATCH_SIZE)
+        student_ids = [student.pk for student in students]
+
+        models = Model3D.objects.bulk_create([
+            Model3D(
+                title=f'Model {i}', subject=teacher.subject_expertise, uploaded_by=teacher,
+                file=f'3d_models/seed-{i % 20}.glb', analysis_status='ready',
+            )
+            for i, teacher in enumerate(teachers)
+        ], batch_size=BATCH_SIZE)
+
+        cohorts = Cohort.objects.bulk_create([
+            Cohort(name=f'Class {j + 1}', teacher=teacher)
+            for teacher in teachers for j in range(options['cohorts'])
+        ], batch_size=BATCH_SIZE)
+        members = {}
+        memberships = Buffer(CohortMembership)
+        for cohort in cohorts:
+            members[cohort.pk] = rng.sample(student_ids, class_size)
+            for student_id in members[cohort.pk]:
+                memberships.add(CohortMembership(cohort=cohort, student_id=student_id))
+        memberships.flush()
+        cohorts_of = {}
+        for cohort in cohorts:
+            cohorts_of.setdefault(cohort.teacher_id, []).append(cohort.pk)
+
+        assignments, audiences, created = [], [], []
+        for teacher, model in zip(teachers, models):
+            for j in range(options['assignments']):
+                roll = rng.random()
+                if roll < options['open_share']:
+                    target = ('open', None)
+                elif roll < options['open_share'] + options['cohort_share'] and cohorts_of.get(teacher.pk):
+                    target = ('cohort', rng.choice(cohorts_of[teacher.pk]))
+                else:
+                    target = ('students', rng.sample(student_ids, class_size))
+                created_at = now - timedelta(days=rng.randrange(options['days']), seconds=rng.randrange(86400))
+                assignments.append(Assignment(
+                    title=f'{teacher.subject_expertise} task {j + 1}',
+                    description='Inspect the model and answer the questions.',
+                    teacher=teacher, model=model,
+                    due_date=created_at + timedelta(days=rng.randrange(1, 15)),
+                    tasks=[f'Question {k + 1}' for k in range(rng.randrange(1, 6))],
+                ))
+                audiences.append(target)
+                created.append(created_at)
+        assignments = Assignment.objects.bulk_create(assignments, batch_size=BATCH_SIZE)
+        # created_at is auto_now_add, so bulk_create stamped "now"; restore the spread
+        for assignment, created_at in zip(assignments, created):
+            assignment.created_at = created_at
+        Assignment.objects.bulk_update(assignments, ['created_at'], batch_size=BATCH_SIZE)
+
+        direct = Buffer(Assignment.assigned_students.through)
+        targeted = Buffer(Assignment.cohorts.through)
+        submissions = Buffer(Submission)
+        for assignment, (kind, target) in zip(assignments, audiences):
+            if kind == 'students':
+                audience = target
+                for student_id in target:
+                    direct.add(Assignment.assigned_students.through(assignment=assignment, user_id=student_id))
+            elif kind == 'cohort':
+                audience = members[target]
+                targeted.add(Assignment.cohorts.through(assignment=assignment, cohort_id=target))
+            else:
+                audience = student_ids
+            for student_id in audience:
+                if rng.random() >= options['submit_share']:
+                    continue
+                status = rng.choice(('draft', 'submitted', 'submitted'))
+                submissions.add(Submission(
+                    assignment=assignment, student_id=student_id, status=status,
+                    content={'answers': ['Seeded answer'] * len(assignment.tasks)},
+                    grade=rng.choice(('A', 'B', 'C', None)) if status == 'submitted' else None,
+                ))
+        for buffer in (direct, targeted, submissions):
+            buffer.flush()
+
+        return {
+            'teachers': len(teachers),
+            'students': len(students),
+            'models': len(models),
+            'cohorts': len(cohorts),
+            'cohort memberships': memberships.written,
+            'assignments': len(assignments),
+            'direct assignees': direct.written,
+            'cohort targets': targeted.written,
+            'submissions': submissions.written,
+        }
@@ -0,0 +1,253 @@
+"""Production media serving with byte ranges and conditional GETs.
+
+Replaces ``django.conf.urls.static.static()``, which only works with
+DEBUG on. Model files are large and re-opened constantly, so every response
+carries a strong ETag and ``Last-Modified``; revalidations get a 304 and
+seeks inside a model get a 206 with just the requested bytes.
+
+Blobs may have precompressed ``.br``/``.gz`` siblings (written at ingest);
+the smallest one the client's ``Accept-Encoding`` allows is sent instead,
+with its own ETag and ``Vary: Accept-Encoding``.
+
+With ``MEDIA_SENDFILE_HEADER`` set, the view only does the checks and lets
+the front proxy (nginx ``X-Accel-Redirect`` or Apache/lighttpd
+``X-Sendfile``) transfer the file.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_http_methods
+
+from models3d.storage import BLOB_PREFIX, PRECOMPRESSED
+
+mimetypes.add_type('model/gltf-binary', '.glb')
+mimetypes.add_type('model/gltf+json', '.gltf')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOB_NAME_RE = re.compile(rf'^{BLOB_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/([0-9a-f]{{64}})(\.[\w]+)?$')
+SUFFIXES = dict(PRECOMPRESSED)
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# (path, size, mtime) -> digest for files outside the content-addressed store
+_etags = OrderedDict()
+_MAX_ETAGS = 2048
+
+
+class RangeFile:
+    """Read-only view of ``length`` bytes of ``fh`` starting at ``start``.
+
+    ``fileno()`` is passed through with the descriptor already positioned, so
+    a WSGI server's sendfile() path sends exactly the range.
+    """
+
+    def __init__(self, fh, start, length):
+        fh.seek(start)
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def close(self):
+        self.fh.close()
+
+
+def content_etag(name, path, stat):
+    match = BLOB_NAME_RE.match(name)
+    if match:
+        return quote_etag(match.group(1))
+
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    digest = _etags.get(key)
+    if digest is None:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b''):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        _etags[key] = digest
+        while len(_etags) > _MAX_ETAGS:
+            _etags.popitem(last=False)
+    else:
+        _etags.move_to_end(key)
+    return quote_etag(digest)
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(request, full_path, stat):
+    """Smallest acceptable representation as ``(encoding, path, stat)``;
+    ``encoding`` is None for the file itself."""
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    best = (None, full_path, stat)
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding not in accepted and '*' not in accepted:
+            continue
+        try:
+            candidate = os.stat(full_path + suffix)
+        except OSError:
+            continue
+        if candidate.st_size < best[2].st_size:
+            best = (encoding, full_path + suffix, candidate)
+    return best
+
+
+def etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    # weak comparison, as If-None-Match requires
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag in candidates
+
+
+def not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def requested_range(request, etag, mtime, size):
+    """Return ``(start, end)`` for a satisfiable single range, None for the
+    whole file, or ``False`` if the range can't be satisfied."""
+    header = request.headers.get('Range')
+    if not header:
+        return None
+
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != int(mtime):
+            return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None  # multiple or malformed ranges: send the whole file
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def set_validators(response, validators):
+    for header, value in validators.items():
+        response[header] = value
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_media(request, path):
+    name = path.lstrip('/')
+    if name.startswith(f'{BLOB_PREFIX}/tmp/'):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, ValueError, OSError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    if encoding or not content_type:
+        # e.g. a stored .gz: serve the bytes as-is rather than claim a Content-Encoding
+        content_type = 'application/octet-stream'
+
+    blob = BLOB_NAME_RE.match(name)
+    etag = content_etag(name, full_path, stat)
+    content_encoding = None
+    if blob:
+        content_encoding, full_path, stat = choose_encoding(request, full_path, stat)
+        if content_encoding:
+            # each representation needs its own strong validator
+            etag = quote_etag(f'{blob.group(1)}-{content_encoding}')
+
+    size = stat.st_size
+    validators = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': IMMUTABLE if blob else 'no-cache',
+        'Accept-Ranges': 'bytes',
+    }
+    if blob:
+        validators['Vary'] = 'Accept-Encoding'
+
+    if not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        set_validators(response, validators)
+        return response
+
+    sendfile_header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if sendfile_header:
+        # The proxy handles Range itself; hand it the file and get out of the way.
+        response = HttpResponse(content_type=content_type)
+        if sendfile_header == 'X-Accel-Redirect':
+            response[sendfile_header] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + name + SUFFIXES.get(content_encoding, '')
+        else:
+            response[sendfile_header] = full_path
+        if content_encoding:
+            response['Content-Encoding'] = content_encoding
+        set_validators(response, validators)
+        return response
+
+    byte_range = requested_range(request, etag, stat.st_mtime, size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        set_validators(response, validators)
+        return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = size
+    elif byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(RangeFile(open(full_path, 'rb'), start, length), content_type=content_type, status=206)
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if content_encoding:
+        response['Content-Encoding'] = content_encoding
+    set_validators(response, validators)
+    return response
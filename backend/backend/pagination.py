@@ -0,0 +1,192 @@
+import json
+from base64 import b64decode, b64encode
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on every ordering field, not just the first.
+
+    The cursor stores the ordering values of the last row on the page, so
+    the next page is a ``WHERE (created_at, id) < (...)`` range scan on the
+    matching index. Deep pages cost the same as the first one.
+
+    While ``settings.LEGACY_UNPAGINATED_LISTS`` is on, requests that send
+    neither ``cursor`` nor ``page_size`` still get the plain list.
+    """
+    ordering = ('id',)
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, fetching with the async ORM."""
+        queryset = self.page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def page_queryset(self, queryset, request):
+        """The query for the requested page plus one row, or None when the
+        request gets the legacy unpaginated list."""
+        if self.is_legacy_request(request):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor_values, self.reverse = self.decode_cursor(request)
+        if self.cursor_values is not None:
+            self.cursor_values = self.clean_cursor(queryset, self.cursor_values)
+
+        ordering = self.reversed_ordering() if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor_values is not None:
+            queryset = queryset.filter(self.seek(ordering, self.cursor_values))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = self.cursor_values is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor_values is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def is_legacy_request(self, request):
+        if not getattr(settings, 'LEGACY_UNPAGINATED_LISTS', False):
+            return False
+        params = request.query_params
+        return self.cursor_query_param not in params and self.page_size_query_param not in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size or 50
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def reversed_ordering(self):
+        return tuple(field[1:] if field.startswith('-') else '-' + field for field in self.ordering)
+
+    def seek(self, ordering, values):
+        """Build ``(a, b) > (x, y)`` as ``a > x OR (a = x AND b > y)``."""
+        clauses = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): v for f, v in zip(ordering[:i], values[:i])}
+            clauses.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+        return reduce(or_, clauses)
+
+    def encode_cursor(self, row, reverse):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = row[name] if isinstance(row, dict) else getattr(row, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = b64encode(payload.encode('ascii')).decode('ascii')
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')).decode('ascii'))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def clean_cursor(self, queryset, values):
+        """The cursor's values as their ordering fields' Python values; a
+        tampered value is a 404 rather than an error from the query."""
+        cleaned = []
+        for field_name, value in zip(self.ordering, values):
+            field = self.ordering_field(queryset, field_name.lstrip('-'))
+            try:
+                if value is None:  # the ordering columns are never null
+                    raise ValueError(value)
+                value = field.to_python(value)
+                field.run_validators(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if settings.USE_TZ and hasattr(value, 'tzinfo') and timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            cleaned.append(value)
+        return cleaned
+
+    def ordering_field(self, queryset, name):
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+
+class IdCursorPagination(KeysetPagination):
+    ordering = ('id',)
+
+
+class CreatedAtCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class InboxCursorPagination(KeysetPagination):
+    """Orders on the ``InboxEntry`` columns annotated onto a student's
+    assignments, so pages are range scans of ``inbox_student_created_idx``."""
+    ordering = ('-inbox_created', '-inbox_assignment')
@@ -0,0 +1,162 @@
+"""Opt-in sampling profiler for individual requests.
+
+A request is profiled when a staff user asks for it, with an
+``X-Profile: 1`` header or a ``?_profile=1`` query flag, or when it falls in
+the random ``PROFILE_SAMPLE_RATE`` share of traffic to ``PROFILE_URL_NAMES``.
+While the view runs, a helper thread records the request thread's stack every
+``PROFILE_INTERVAL`` seconds. Nothing is traced, so the view itself runs at
+full speed.
+
+Under ASGI the sampled thread is the one running the request's synchronous
+work (``process_view`` runs there): middleware, authentication, serializers
+and rendering. Queries an async view sends to other threads are not sampled.
+
+Each profile is written in collapsed-stack format (``frame;frame;frame
+count`` per line, as read by flamegraph.pl, speedscope and inferno) to
+``PROFILE_DIR/<url name>/``. ``manage.py aggregate_profiles`` merges them by
+endpoint.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+SUFFIX = '.folded'
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.samples
+
+    def label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for root in sys.path:
+                if root and filename.startswith(root):
+                    filename = os.path.relpath(filename, root)
+                    break
+            # ';' separates frames and ' ' the count in collapsed stacks
+            label = self.labels[code] = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':').replace(' ', '_')
+        return label
+
+    def _run(self):
+        while True:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    stack.append(self.label(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples[';'.join(stack)] += 1
+            if self._stop.wait(self.interval):
+                return
+
+
+def write_profile(name, samples):
+    """Store ``samples`` for URL ``name``; returns the file's path."""
+    directory = os.path.join(settings.PROFILE_DIR, name.replace(os.sep, '_'))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{uuid.uuid4().hex[:8]}{SUFFIX}')
+    with open(path, 'w') as out:
+        for stack, count in samples.most_common():
+            out.write(f'{stack} {count}\n')
+    return path
+
+
+def staff_requested(request):
+    """True when the request asks to be profiled and carries a staff token.
+
+    DRF authenticates inside the view, so the bearer token is checked here.
+    """
+    if request.headers.get(PROFILE_HEADER) != '1' and request.GET.get(PROFILE_PARAM) != '1':
+        return False
+    from users.authentication import ClaimsJWTAuthentication
+    try:
+        result = ClaimsJWTAuthentication().authenticate(request)
+    except APIException:
+        return False
+    user = result[0] if result else getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+class SamplingProfilerMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if getattr(request, '_stack_sampler', None) is None:
+            return response
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if getattr(request, '_stack_sampler', None) is None:
+            return response
+        return await sync_to_async(self.finish)(request, response)
+
+    def finish(self, request, response):
+        samples = request._stack_sampler.stop()
+        name = request.resolver_match.view_name or '<unnamed>'
+        try:
+            path = write_profile(name, samples)
+        except OSError:
+            logger.exception("Could not write profile for %s", name)
+            return response
+        if request._profile_requested:
+            response[PROFILE_HEADER] = os.path.relpath(path, settings.PROFILE_DIR)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        requested = staff_requested(request)
+        if not requested and not self.sampled(request):
+            return None
+        request._profile_requested = requested
+        request._stack_sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL).start()
+        return None
+
+    def sampled(self, request):
+        rate = settings.PROFILE_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return False
+        names = settings.PROFILE_URL_NAMES
+        return names is None or request.resolver_match.view_name in names
@@ -49,20 +49,39 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'backend.pagination.IdCursorPagination',
+    'PAGE_SIZE': 50,
+    # DRF's JSON output, also writing the datetimes of backend.lean rows
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ),
 }
 
+# List endpoints are keyset paginated (?cursor= / ?page_size=). While this is
+# on, requests without either parameter still get the old unpaginated array so
+# the current frontend keeps working; turn it off once every caller follows
+# the `next` links.
+LEGACY_UNPAGINATED_LISTS = True
+
+# users.authentication keeps this many user rows per worker for token version
+# checks, each for up to AUTH_USER_CACHE_TTL seconds. A role change or
+# deactivation reaches other workers within that window.
+AUTH_USER_CACHE_TTL = 30
+AUTH_USER_CACHE_SIZE = 4096
+
 
 MIDDLEWARE = [
+    'backend.instrumentation.ServerTimingMiddleware',
+    'backend.profiling.SamplingProfilerMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "backend.aio.WhiteNoiseMiddleware",
 
-    'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -92,13 +111,72 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# SQLite tuned for several gunicorn workers on one file:
+# - WAL lets readers run alongside the single writer.
+# - synchronous=NORMAL is durable across application crashes and fsyncs only
+#   at checkpoints.
+# - IMMEDIATE transactions take the write lock up front. Writers then queue on
+#   busy_timeout rather than failing on a read-to-write upgrade.
+# - Connections persist for CONN_MAX_AGE and are health-checked before reuse.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=30000;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-32000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
     }
 }
 
+# Under ASGI (asgi.py sets ASYNC_READ_VIEWS=1) the dashboard and the
+# assignment, submission and model lists are served by async views
+# (backend.aio, routed by backend.asgi_urls). Each ASGI request runs its
+# synchronous parts on a thread of its own, so a connection could not be
+# reused by the next request and is closed after each one.
+# `manage.py benchmark_async` compares both paths on the current data; when
+# the database answers from memory, each hop to a thread costs more than the
+# async path saves, and WSGI serves more requests per worker.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+if ASYNC_READ_VIEWS:
+    ROOT_URLCONF = 'backend.asgi_urls'
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Response cache (assignments.versions). The list, dashboard and catalog
+# responses are kept under their ETag, so a write that bumps a version
+# counter moves readers to a new key and old entries age out. The
+# "responses" cache keeps LOCAL_MAX_ENTRIES per worker process in front of
+# a directory shared by the workers on this host (backend.cache). Set
+# RESPONSE_CACHE to None to always build responses afresh.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'backend.cache.TieredCache',
+        'LOCATION': BASE_DIR / 'response_cache',
+        'TIMEOUT': 600,
+        'OPTIONS': {'LOCAL_MAX_ENTRIES': 512, 'MAX_ENTRIES': 20000},
+    },
+}
+RESPONSE_CACHE = 'responses'
+# tests keep it in a temporary directory and start each test with it empty
+TEST_RUNNER = 'backend.test_runner.DiscoverRunner'
+
+# Serialize write transactions across threads and worker processes
+# (backend.db.write_queue) so bursts of saves wait in line rather than
+# racing SQLite's busy handler.
+SQLITE_WRITE_QUEUE = True
+
 ALLOWED_HOSTS = [
     "edu3d-project-backup.onrender.com",
     "localhost",
@@ -145,8 +223,10 @@ STATIC_URL = 'static/'
 
 AUTH_USER_MODEL = 'users.User'
 CORS_ALLOW_ALL_ORIGINS = True
+# the roster page reads the live stream's Link (assignments.live)
+CORS_EXPOSE_HEADERS = ['Link']
 
-INSTALLED_APPS += ['models3d', 'assignments']
+INSTALLED_APPS += ['models3d', 'assignments', 'backend']
 
 
 MEDIA_URL = '/media/'
@@ -154,3 +234,76 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Media is served by backend.media_views.serve_media (Range, ETag, 304s).
+# Set MEDIA_SENDFILE_HEADER to "X-Accel-Redirect" (nginx) or "X-Sendfile"
+# (Apache/lighttpd) to have the proxy stream the bytes instead. For nginx,
+# MEDIA_ACCEL_REDIRECT_PREFIX must be an `internal` location aliased to
+# MEDIA_ROOT:
+#     location /protected-media/ { internal; alias /path/to/backend/media/; }
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+
+
+# Resumable model uploads (models3d.uploads). Partial files live outside
+# MEDIA_ROOT so they are never served, and sessions idle for longer than
+# CHUNKED_UPLOAD_EXPIRY seconds are removed by `manage.py purge_uploads`.
+CHUNKED_UPLOAD_DIR = BASE_DIR / "upload_chunks"
+CHUNKED_UPLOAD_MAX_SIZE = 1024 * 1024 * 1024
+CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60
+
+
+# Model ingest, thumbnails and image derivatives (backend.tasks) run in this
+# many worker processes. 0 runs them inline in the saving process.
+BACKGROUND_WORKERS = 2
+
+
+# Screenshot/profile photo derivatives (backend.images). Originals are
+# replaced by a WebP no wider than IMAGE_MAX_WIDTH unless kept explicitly.
+IMAGE_KEEP_ORIGINALS = False
+IMAGE_MAX_WIDTH = 2048
+
+
+# Change events (backend.events) feed the live submission roster
+# (assignments.live). SocketBroker shares them between the worker processes
+# on this host through Unix sockets in EVENT_SOCKET_DIR; LocalBroker keeps
+# them within one process. A stream ends after LIVE_STREAM_TIMEOUT seconds
+# and the browser reconnects. The stream is only served with
+# ASYNC_READ_VIEWS (under ASGI it holds no thread while it waits); under
+# WSGI the roster page polls submissions_status with its ETag instead.
+EVENT_BROKER = 'backend.events.SocketBroker'
+EVENT_SOCKET_DIR = BASE_DIR / 'event_sockets'
+LIVE_STREAM_TIMEOUT = 300
+
+
+# Per-request timing (backend.instrumentation). Each response carries a
+# Server-Timing header and each request logs one JSON line on
+# "backend.requests" at INFO. REQUEST_LOG_LEVEL defaults to WARNING, so the
+# lines are off (tests included) until a deployment sets it to INFO. The
+# last REQUEST_METRICS_WINDOW requests per URL name feed the percentiles at
+# /api/metrics/ (staff only, per worker process).
+REQUEST_METRICS_WINDOW = 1000
+
+# Sampled request profiles (backend.profiling). Staff can profile a request
+# with "X-Profile: 1" or ?_profile=1; otherwise PROFILE_SAMPLE_RATE of the
+# requests to PROFILE_URL_NAMES (None: every URL) are profiled. Collapsed
+# stacks land in PROFILE_DIR/<url name>/; merge them with
+# `manage.py aggregate_profiles`.
+PROFILE_DIR = BASE_DIR / "profiles"
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_URL_NAMES = ('assignment-list', 'dashboard-stats', 'submission-list')
+PROFILE_INTERVAL = 0.005
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'backend.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,53 @@
+"""Process pool for CPU-heavy work that shouldn't hold a request worker.
+
+Model ingest, thumbnail rendering and image derivatives are all submitted
+here. ``BACKGROUND_WORKERS = 0`` runs jobs inline in the calling process
+(tests, management commands).
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _executor_for(workers):
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the parent holds DB connections and request threads
+        _executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def _run(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def _log_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Background job failed", exc_info=exc)
+
+
+def submit(func, *args):
+    """Run ``func(*args)`` in the pool; ``func`` must be a module-level function."""
+    workers = getattr(settings, 'BACKGROUND_WORKERS', 0)
+    if not workers:
+        func(*args)
+        return
+    future = _executor_for(workers).submit(_run, func, *args)
+    future.add_done_callback(_log_failure)
@@ -0,0 +1,50 @@
+"""The test runner (``TEST_RUNNER``): Django's, with the response cache
+(``RESPONSE_CACHE``, ``backend.cache``) moved out of the working tree and
+emptied before every test.
+
+Each test starts from a database without version rows, and a scope without
+a row counts as version 0 (``assignments.versions``). Without this, a test
+could get the cached response of an earlier test, or an earlier run, for
+the same user and URL. Covers serial runs; ``--parallel`` workers share the
+run's cache directory.
+"""
+import shutil
+import tempfile
+import unittest
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+from django.test.runner import DiscoverRunner as BaseDiscoverRunner
+
+
+def clear_response_cache():
+    alias = getattr(settings, 'RESPONSE_CACHE', None)
+    if alias:
+        caches[alias].clear()
+
+
+class ClearResponseCacheMixin:
+    def startTest(self, test):
+        clear_response_cache()
+        super().startTest(test)
+
+
+class DiscoverRunner(BaseDiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.response_cache_dir = tempfile.mkdtemp(prefix='response_cache-')
+        alias = settings.RESPONSE_CACHE
+        self.response_cache_override = override_settings(CACHES={
+            **settings.CACHES, alias: {**settings.CACHES[alias], 'LOCATION': self.response_cache_dir},
+        })
+        self.response_cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.response_cache_override.disable()
+        shutil.rmtree(self.response_cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+        return type(f'ClearResponseCache{base.__name__}', (ClearResponseCacheMixin, base), {})
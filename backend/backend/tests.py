@@ -0,0 +1,487 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import datetime
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+from rest_framework.test import APIClient
+
+from assignments import inbox, live
+from assignments.models import Assignment, Cohort, CohortMembership, InboxEntry, Submission
+from backend import cache, events, renderers
+from backend.management.commands.benchmark_endpoints import ROUTES
+from models3d.models import Model3D
+from users import authentication
+from users.models import Model3D as UserModel3D, User
+from users.serializers import CustomTokenObtainPairSerializer
+
+
+class SamplingProfilerTests(TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        overrides = override_settings(PROFILE_DIR=self.profile_dir, PROFILE_INTERVAL=0.0005)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client = APIClient()
+
+    def login(self, **fields):
+        user = User.objects.create(username='ops', role='teacher', **fields)
+        self.addCleanup(authentication.forget, user.pk)
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return user
+
+    def profiles(self, name='assignment-list'):
+        directory = os.path.join(self.profile_dir, name)
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_staff_flag_profiles_the_request(self):
+        self.login(is_staff=True)
+        response = self.client.get('/api/assignments/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.profiles()), 1)
+        self.assertEqual(response['X-Profile'], os.path.join('assignment-list', self.profiles()[0]))
+
+        self.client.get('/api/assignments/?_profile=1')
+        self.assertEqual(len(self.profiles()), 2)
+
+    def test_flag_is_ignored_for_other_users(self):
+        self.login()
+        response = self.client.get('/api/assignments/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(self.profiles(), [])
+
+    def test_sampled_traffic_and_aggregation(self):
+        self.login()
+        with override_settings(PROFILE_SAMPLE_RATE=1.0):
+            for _ in range(3):
+                self.client.get('/api/assignments/')
+            self.client.get('/api/users/students/')  # not a profiled URL name
+        self.assertEqual(len(self.profiles()), 3)
+        self.assertEqual(self.profiles('student-list'), [])
+
+        out = StringIO()
+        call_command('aggregate_profiles', 'assignment-list', '--delete', stdout=out)
+        self.assertIn('assignment-list: 3 profile(s)', out.getvalue())
+        self.assertEqual(self.profiles(), [])
+        with open(os.path.join(self.profile_dir, 'assignment-list.folded')) as merged:
+            for line in merged:
+                stack, count = line.rsplit(' ', 1)
+                self.assertTrue(int(count) > 0 and ';' in stack)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SeedAndBenchmarkTests(TransactionTestCase):
+    # committed data, so the benchmark's threads can read it
+    SIZES = ['--teachers', '3', '--students', '12', '--assignments', '4', '--class-size', '4', '--open-share', '0.2']
+
+    def setUp(self):
+        self.addCleanup(authentication._users.clear)
+
+    def seed(self, *args):
+        call_command('seed_data', *self.SIZES, *args, stdout=StringIO())
+        return (
+            list(Assignment.objects.order_by('id').values_list('teacher__username', 'title', 'created_at')),
+            list(Submission.objects.order_by('id').values_list('assignment__title', 'student__username', 'status')),
+        )
+
+    def test_seeding_is_deterministic_and_fills_the_inbox(self):
+        first = self.seed()
+        self.assertEqual(len(first[0]), 12)
+        self.assertTrue(first[1])
+        for assignment in Assignment.objects.all():
+            inbox = set(InboxEntry.objects.filter(assignment=assignment).values_list('student', flat=True))
+            self.assertEqual(inbox, set(assignment.audience().values_list('id', flat=True)))
+
+        second = self.seed('--reset')
+        self.assertEqual([row[:2] for row in first[0]], [row[:2] for row in second[0]])
+        self.assertEqual(first[1], second[1])
+
+    def test_serializer_benchmark_matches_the_drf_output(self):
+        self.seed()
+        out = StringIO()
+        call_command('benchmark_serializers', '--rows', '20', '--repeat', '1', '--json', '-', stdout=out, stderr=StringIO())
+        routes = json.loads(out.getvalue())['routes']
+        self.assertEqual(len(routes), 4)
+        for key, stats in routes.items():
+            self.assertTrue(stats['identical'], key)
+            self.assertGreater(stats['lean']['total_ms'], 0)
+
+    def test_benchmark_covers_every_route(self):
+        self.seed()
+        path = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(path))
+        call_command(
+            'benchmark_endpoints', '--requests', '2', '--warmup', '0', '--threads', '1', '--users', '2',
+            '--json', path, stdout=StringIO(),
+        )
+        with open(path) as fh:
+            routes = json.load(fh)['routes']
+        self.assertEqual({key.rsplit(' [', 1)[0] for key in routes}, {route[0] for route in ROUTES})
+        for key, stats in routes.items():
+            self.assertEqual(stats['errors'], 0, key)
+            self.assertEqual(stats['requests'], 2)
+            self.assertIsNotNone(stats['queries'], key)
+
+
+# the measured GET repeats the warm-up one: without this it is a cache hit
+@override_settings(RESPONSE_CACHE=None)
+class QueryBudgetTests(TestCase):
+    """Every list route costs the same number of queries with N rows as with
+    10N. Timings are left to ``manage.py benchmark_endpoints``."""
+    N = 60  # more than one page of 50
+    ROUTES = [
+        ('teacher', '/api/assignments/'),
+        ('teacher', '/api/assignments/?page_size=50'),
+        ('teacher', '/api/submissions/'),
+        ('teacher', '/api/submissions/?page_size=50'),
+        ('teacher', '/api/dashboard/stats/'),
+        ('teacher', '/api/users/students/'),
+        ('teacher', '/api/users/students/?page_size=50'),
+        ('teacher', '/api/models/'),
+        ('teacher', '/api/models/?page_size=50'),
+        ('teacher', '/api/users/models/'),
+        ('teacher', '/api/users/models/?page_size=50'),
+        ('student', '/api/assignments/'),
+        ('student', '/api/assignments/?page_size=50'),
+        ('student', '/api/assignments/?expand=my_submission&page_size=50'),
+        ('student', '/api/submissions/'),
+        ('student', '/api/submissions/?page_size=50'),
+        ('student', '/api/dashboard/stats/'),
+        ('student', '/api/models/?page_size=50'),
+    ]
+
+    def setUp(self):
+        self.teacher = User.objects.create(username='teacher', role='teacher')
+        self.student = User.objects.create(username='student', role='student')
+        self.cohort = Cohort.objects.create(name='Year 9', teacher=self.teacher)
+        CohortMembership.objects.create(cohort=self.cohort, student=self.student)
+        self.clients = {}
+        for user in (self.teacher, self.student):
+            self.clients[user.role] = APIClient()
+            self.clients[user.role].force_authenticate(user)
+
+    def grow(self, n):
+        """Bring each collection the routes list up to ``n`` rows: students,
+        both model catalogs, the teacher's assignments (for a cohort, for
+        students directly, or open) and a submission per assignment from the
+        student and from one other student."""
+        have = Assignment.objects.count()
+        now = timezone.now()
+        students = User.objects.bulk_create([
+            User(username=f'student-{i}', role='student') for i in range(have, n)
+        ])
+        Model3D.objects.bulk_create([
+            Model3D(title=f'Model {i}', subject='Biology', file=f'3d_models/m{i}.glb', uploaded_by=self.teacher)
+            for i in range(have, n)
+        ])
+        UserModel3D.objects.bulk_create([
+            UserModel3D(title=f'Model {i}', subject='Biology', file=f'models/m{i}.glb', uploaded_by=self.teacher)
+            for i in range(have, n)
+        ])
+        model = Model3D.objects.first()
+        assignments = Assignment.objects.bulk_create([
+            Assignment(
+                title=f'Task {i}', description='', teacher=self.teacher, model=model,
+                due_date=now + timedelta(days=1), tasks=['q1', 'q2'],
+            )
+            for i in range(have, n)
+        ])
+        # through rows directly: the inbox is rebuilt once below
+        Assignment.cohorts.through.objects.bulk_create([
+            Assignment.cohorts.through(assignment=assignment, cohort=self.cohort)
+            for i, assignment in enumerate(assignments, start=have) if i % 3 == 1
+        ])
+        # a few open to everyone; the rest to the student and one other directly
+        Assignment.assigned_students.through.objects.bulk_create([
+            Assignment.assigned_students.through(assignment=assignment, user=student)
+            for i, (assignment, other) in enumerate(zip(assignments, students), start=have)
+            if i % 3 != 1 and i % 30
+            for student in (self.student, other)
+        ])
+        Submission.objects.bulk_create([
+            Submission(assignment=assignment, student=student, status=('draft', 'submitted')[i % 2], content={})
+            for i, assignment in enumerate(assignments)
+            for student in (self.student, students[i])
+        ])
+        inbox.rebuild()
+
+    def measure(self, role, path):
+        """Query count for one GET."""
+        client = self.clients[role]
+        self.assertEqual(client.get(path).status_code, 200)  # warm up
+        with CaptureQueriesContext(connection) as queries:
+            client.get(path)
+        # the version lookup plus the view's own queries
+        self.assertGreater(len(queries), 1, f"{path} was served without running the view")
+        return len(queries)
+
+    def test_cost_does_not_grow_with_the_data(self):
+        self.grow(self.N)
+        small = {(role, path): self.measure(role, path) for role, path in self.ROUTES}
+        self.grow(10 * self.N)
+        for role, path in self.ROUTES:
+            with self.subTest(role=role, path=path):
+                self.assertEqual(self.measure(role, path), small[role, path], "query count grew with the rows")
+
+
+@override_settings(ROOT_URLCONF='backend.asgi_urls')
+class AsyncReadPathTests(TestCase):
+    PATHS = [
+        ('teacher', '/api/assignments/'),
+        ('teacher', '/api/assignments/?page_size=1'),
+        ('teacher', '/api/submissions/'),
+        ('teacher', '/api/dashboard/stats/'),
+        ('teacher', '/api/models/?page_size=1'),
+        ('student', '/api/assignments/'),
+        ('student', '/api/assignments/?expand=my_submission&page_size=1'),
+        ('student', '/api/submissions/?page_size=1'),
+        ('student', '/api/dashboard/stats/'),
+        ('student', '/api/models/'),
+    ]
+
+    def setUp(self):
+        self.addCleanup(authentication._users.clear)
+        teacher = User.objects.create(username='teacher', role='teacher')
+        student = User.objects.create(username='student', role='student')
+        model = Model3D.objects.create(title='Heart', subject='Biology', file='3d_models/heart.glb', uploaded_by=teacher)
+        Model3D.objects.create(title='Lung', subject='Biology', file='3d_models/lung.glb', uploaded_by=teacher)
+        for i in range(3):
+            assignment = Assignment.objects.create(
+                title=f'Task {i}', description='Look closely', teacher=teacher, model=model,
+                due_date=timezone.now() + timedelta(days=1), tasks=['q1'],
+            )
+            if i:
+                assignment.assigned_students.add(student)
+            Submission.objects.create(assignment=assignment, student=student, status='submitted', content={})
+        self.tokens = {
+            user.role: str(CustomTokenObtainPairSerializer.get_token(user).access_token) for user in (teacher, student)
+        }
+
+    def get_async(self, role, path):
+        return async_to_sync(self.async_client.get)(path, headers={'Authorization': f'Bearer {self.tokens[role]}'})
+
+    def get_sync(self, role, path):
+        with override_settings(ROOT_URLCONF='backend.urls'):
+            return self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {self.tokens[role]}')
+
+    def test_routes_resolve_to_async_views(self):
+        for _, path in self.PATHS:
+            self.assertTrue(iscoroutinefunction(resolve(path.split('?')[0]).func), path)
+
+    def test_same_responses_as_the_sync_views(self):
+        for role, path in self.PATHS:
+            with self.subTest(role=role, path=path):
+                expected, response = self.get_sync(role, path), self.get_async(role, path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+                self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    def test_conditional_gets(self):
+        for role, path in self.PATHS:
+            if path.startswith('/api/models/'):
+                continue
+            with self.subTest(role=role, path=path):
+                tag = self.get_sync(role, path)['ETag']
+                self.assertEqual(self.get_async(role, path)['ETag'], tag)
+                response = async_to_sync(self.async_client.get)(
+                    path, headers={'Authorization': f'Bearer {self.tokens[role]}', 'If-None-Match': tag},
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_errors_and_other_methods(self):
+        self.assertEqual(async_to_sync(self.async_client.get)('/api/assignments/').status_code, 401)
+        self.assertEqual(self.get_async('student', '/api/assignments/?cursor=x').status_code, 404)
+
+        response = async_to_sync(self.async_client.post)(
+            '/api/assignments/',
+            {'title': 'New', 'description': 'Fresh', 'model': Model3D.objects.first().pk,
+             'due_date': timezone.now() + timedelta(days=2), 'tasks': ['q1']},
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {self.tokens["teacher"]}'},
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+    @override_settings(ASYNC_READ_VIEWS=True, EVENT_BROKER='backend.events.LocalBroker')
+    def test_live_roster_is_an_async_stream(self):
+        assignment = Assignment.objects.first()
+        change = {'student_id': 1, 'status': 'draft'}
+
+        async def read():
+            response = await self.async_client.get(
+                f'/api/assignments/{assignment.pk}/submissions_status/stream/',
+                headers={'Authorization': f'Bearer {self.tokens["teacher"]}'},
+            )
+            self.assertTrue(response.is_async)
+            chunks = aiter(response.streaming_content)
+            snapshot = await anext(chunks)
+            threading.Timer(0.05, events.publish, (live.channel(assignment.pk), change)).start()
+            return snapshot, await anext(chunks)
+
+        snapshot, status = async_to_sync(read)()
+        self.assertIn(b'event: snapshot', snapshot)
+        self.assertEqual(status, f'event: status\ndata: {json.dumps(change, separators=(",", ":"))}\n\n'.encode())
+
+
+class EventBrokerTests(TestCase):
+    def setUp(self):
+        # short path: Unix socket names are limited to about 100 bytes
+        self.directory = tempfile.mkdtemp(prefix='ev')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_local_delivery_and_unsubscribe(self):
+        broker = events.LocalBroker()
+        with broker.subscribe('a') as first, broker.subscribe('b') as other:
+            broker.publish('a', {'n': 1})
+            broker.publish('a', {'n': 2})
+            self.assertEqual(first.get(0), [{'n': 1}, {'n': 2}])
+            self.assertEqual(other.get(0), [])
+        broker.publish('a', {'n': 3})
+        self.assertEqual(first.get(0), [])
+
+    def test_reader_that_falls_behind_starts_over(self):
+        broker = events.LocalBroker()
+        with broker.subscribe('a') as subscription:
+            for n in range(events.BACKLOG + 1):
+                broker.publish('a', n)
+            self.assertIsNone(subscription.get(0))
+            broker.publish('a', 'next')
+            self.assertEqual(subscription.get(0), ['next'])
+
+    def test_async_reader_is_woken_from_another_thread(self):
+        broker = events.LocalBroker()
+
+        async def read():
+            with broker.subscribe('a') as subscription:
+                threading.Timer(0.05, broker.publish, ('a', 'late')).start()
+                return await subscription.aget(5), await subscription.aget(0.01)
+
+        started = time.perf_counter()
+        self.assertEqual(async_to_sync(read)(), (['late'], []))
+        self.assertLess(time.perf_counter() - started, 2)
+
+    @skipUnless(hasattr(socket, 'AF_UNIX'), "needs Unix sockets")
+    def test_socket_broker_relays_between_processes(self):
+        # two brokers stand in for two worker processes
+        worker, other = events.SocketBroker(self.directory), events.SocketBroker(self.directory)
+        with worker.subscribe('a') as subscription:
+            # a socket left behind by a process that died
+            stale = os.path.join(self.directory, f'1-dead{events.SUFFIX}')
+            dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            dead.bind(stale)
+            dead.close()
+
+            other.publish('a', {'n': 1})
+            self.assertEqual(subscription.get(5), [{'n': 1}])
+            self.assertFalse(os.path.exists(stale))
+            # the publisher's own subscribers get it once, not again by socket
+            worker.publish('a', {'n': 2})
+            self.assertEqual(subscription.get(5), [{'n': 2}])
+            self.assertEqual(subscription.get(0.2), [])
+
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        overrides = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'tiered': {
+                'BACKEND': 'backend.cache.TieredCache',
+                'LOCATION': directory,
+                'OPTIONS': {'LOCAL_MAX_ENTRIES': 2},
+            },
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.cache = caches['tiered']
+
+    def test_local_tier_is_a_bounded_lru_over_the_shared_tier(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, [key])
+        self.assertEqual(len(self.cache.local._entries), 2)
+        self.assertEqual(self.cache.get('b'), ['b'])
+        self.assertEqual(self.cache.get('a'), ['a'])  # evicted here, still shared
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+        self.assertEqual(
+            cache.stats()['tiered'],
+            {'local_hits': 1, 'shared_hits': 1, 'misses': 1, 'local_entries': 2, 'hit_ratio': 0.6667},
+        )
+        # "a" moved to the front, so "c" went
+        self.assertNotIn(self.cache.make_key('c'), self.cache.local._entries)
+
+    def test_workers_share_what_another_one_stored(self):
+        self.cache.set('key', {'rows': [1, 2]})
+        # another worker process starts with an empty LRU of its own
+        other = cache.TieredCache(self.cache.shared._dir, {})
+        other.local = cache.LocalTier(2)
+        self.assertEqual(other.get('key'), {'rows': [1, 2]})
+        self.assertEqual(other.get('key'), {'rows': [1, 2]})
+        self.assertEqual((other.local.counts['shared_hits'], other.local.counts['local_hits']), (1, 1))
+
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+
+class JSONRendererTests(TestCase):
+    def row(self, i):
+        return {
+            'id': i, 'title': f'Täsk {i} \u2028 \u2029 «»', 'score': Decimal('1.5'), 'due': datetime.date(2025, 1, i % 28 + 1),
+            'tags': ['a', None, True, 2.5], 'nested': {'empty': [], 'none': None},
+        }
+
+    def assertSameAsDRF(self, data, media_type=None, context=None):
+        self.assertEqual(
+            renderers.JSONRenderer().render(data, media_type, context),
+            DRFJSONRenderer().render(data, media_type, context),
+        )
+
+    def test_matches_drf(self):
+        rows = [self.row(i) for i in range(5)]
+        self.assertSameAsDRF(rows)
+        self.assertSameAsDRF({'next': None, 'previous': 'x', 'results': rows})
+        self.assertSameAsDRF(rows, 'application/json; indent=4')
+        self.assertSameAsDRF(rows, None, {'indent': 2})
+        self.assertSameAsDRF([])
+        self.assertSameAsDRF('plain')
+        self.assertEqual(renderers.JSONRenderer().render(None), b'')
+
+    def test_datetimes_are_written_as_the_serializer_field_does(self):
+        field = DateTimeField()
+        values = [
+            timezone.now(),
+            datetime.datetime(2025, 3, 1, 12, 30, tzinfo=datetime.timezone.utc),
+            datetime.datetime(2025, 3, 1, 12, 30, 0, 5, tzinfo=datetime.timezone(timedelta(hours=2))),
+            datetime.datetime(2025, 3, 1, 12, 30),
+        ]
+        for zone in ('UTC', 'Europe/Paris'):
+            with self.subTest(zone=zone), timezone.override(zone):
+                self.assertEqual(
+                    json.loads(renderers.JSONRenderer().render(values)), [field.to_representation(v) for v in values],
+                )
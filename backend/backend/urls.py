@@ -15,13 +15,13 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from users.views import CustomTokenObtainPairView
+from users.views import CustomTokenObtainPairView, VersionedTokenRefreshView
+from .instrumentation import request_metrics
+from .media_views import serve_media
 
 
 
@@ -29,14 +29,12 @@ urlpatterns = [
     path('admin/', admin.site.urls),
 
     path("api/login/", CustomTokenObtainPairView.as_view()),
-    path('api/refresh/', TokenRefreshView.as_view()),
+    path('api/refresh/', VersionedTokenRefreshView.as_view()),
 
+    path('api/metrics/', request_metrics, name='request-metrics'),
     path('api/users/', include('users.urls')),
     path('api/models/', include('models3d.urls')),
     path('api/', include('assignments.urls')),
-]
-
-
 
-
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
+]
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class Models3DConfig(AppConfig):
     name = 'models3d'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,538 @@
+"""Minimal glTF 2.0 / GLB reader and writer built on NumPy.
+
+Only what ingest needs: accessor data as arrays, geometry stats, and writing
+simplified GLBs. The GLB binary chunk is memory-mapped, so a 500 MB model is
+never read into memory as a whole; accessors are strided views onto the map.
+"""
+import json
+import struct
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+GLB_MAGIC = b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+DTYPE_COMPONENTS = {np.dtype(v): k for k, v in COMPONENT_DTYPES.items()}
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+MODE_TRIANGLES = 4
+QUANTIZATION = 'KHR_mesh_quantization'
+# geometry encodings copy_scene() strips; LOD output never uses them and
+# quantize() re-adds QUANTIZATION itself
+GEOMETRY_EXTENSIONS = {'KHR_draco_mesh_compression', 'EXT_meshopt_compression', QUANTIZATION}
+TARGET_ARRAY_BUFFER = 34962
+TARGET_ELEMENT_ARRAY_BUFFER = 34963
+
+
+class GLTFError(Exception):
+    """The file isn't a glTF we can read."""
+
+
+class Document:
+    def __init__(self, gltf, binary=None):
+        self.gltf = gltf
+        self.binary = binary
+
+    def buffer_view_bytes(self, index):
+        view = self.gltf['bufferViews'][index]
+        if view.get('buffer', 0) != 0 or self.binary is None:
+            raise GLTFError("Only the embedded GLB buffer is supported.")
+        start = view.get('byteOffset', 0)
+        return self.binary[start:start + view['byteLength']]
+
+    def accessor(self, index, normalize=True):
+        """Accessor ``index`` as an ``(count, components)`` array.
+
+        Integer attributes flagged ``normalized`` are scaled to floats, so
+        quantized meshes read back the same as float ones.
+        """
+        acc = self.gltf['accessors'][index]
+        if 'sparse' in acc:
+            raise GLTFError("Sparse accessors are not supported.")
+        dtype = np.dtype(COMPONENT_DTYPES[acc['componentType']])
+        components = TYPE_SIZES[acc['type']]
+        count = acc['count']
+        if 'bufferView' not in acc:
+            return np.zeros((count, components), dtype=np.float32)
+
+        view = self.gltf['bufferViews'][acc['bufferView']]
+        data = self.buffer_view_bytes(acc['bufferView'])
+        stride = view.get('byteStride') or dtype.itemsize * components
+        array = np.ndarray(
+            shape=(count, components), dtype=dtype, buffer=data,
+            offset=acc.get('byteOffset', 0), strides=(stride, dtype.itemsize),
+        )
+        if normalize and acc.get('normalized') and dtype.kind in 'iu':
+            info = np.iinfo(dtype)
+            scaled = array.astype(np.float32) / info.max
+            return np.maximum(scaled, -1.0) if dtype.kind == 'i' else scaled
+        return array
+
+    def triangle_primitives(self, compressed=False):
+        """Yield ``(mesh_index, primitive)`` for triangle-list primitives.
+
+        Draco primitives raise unless ``compressed`` is set, in which case only
+        their accessor metadata (counts, min/max) is usable.
+        """
+        for mesh_index, mesh in enumerate(self.gltf.get('meshes', [])):
+            for primitive in mesh.get('primitives', []):
+                if not compressed and 'KHR_draco_mesh_compression' in primitive.get('extensions', {}):
+                    raise GLTFError("Draco-compressed meshes are not supported.")
+                if primitive.get('mode', MODE_TRIANGLES) == MODE_TRIANGLES and 'POSITION' in primitive['attributes']:
+                    yield mesh_index, primitive
+
+    def indices(self, primitive):
+        if 'indices' in primitive:
+            return np.asarray(self.accessor(primitive['indices'])).reshape(-1).astype(np.uint32)
+        count = self.gltf['accessors'][primitive['attributes']['POSITION']]['count']
+        return np.arange(count, dtype=np.uint32)
+
+
+def load(path):
+    """Open a .glb (memory-mapped) or .gltf file."""
+    with open(path, 'rb') as fh:
+        return _parse(fh, lambda offset, length: np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(length,)))
+
+
+def loads(data):
+    """Like load() for GLB/glTF bytes already in memory."""
+    return _parse(BytesIO(data), lambda offset, length: np.frombuffer(data, dtype=np.uint8, count=length, offset=offset))
+
+
+def _parse(fh, map_binary):
+    header = fh.read(12)
+    if header[:4] != GLB_MAGIC:
+        fh.seek(0)
+        try:
+            return Document(json.load(fh))
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise GLTFError("Not a glTF file.") from exc
+
+    chunk = fh.read(8)
+    if len(header) < 12 or len(chunk) < 8:
+        raise GLTFError("Truncated GLB header.")
+    magic, version, length = struct.unpack('<4sII', header)
+    if version != 2:
+        raise GLTFError(f"Unsupported GLB version {version}.")
+    json_length, json_type = struct.unpack('<II', chunk)
+    if json_type != CHUNK_JSON:
+        raise GLTFError("GLB does not start with a JSON chunk.")
+    gltf = json.loads(fh.read(json_length))
+
+    binary = None
+    chunk = fh.read(8)
+    if len(chunk) == 8:
+        bin_length, bin_type = struct.unpack('<II', chunk)
+        if bin_type == CHUNK_BIN and bin_length:
+            binary = map_binary(fh.tell(), bin_length)
+    return Document(gltf, binary)
+
+
+def image_size(document, image):
+    if 'bufferView' not in image or document.binary is None:
+        return None
+    try:
+        with Image.open(BytesIO(document.buffer_view_bytes(image['bufferView']).tobytes())) as img:
+            return {'width': img.width, 'height': img.height, 'mime': image.get('mimeType', '')}
+    except (OSError, GLTFError):
+        return None
+
+
+def stored_to_float(acc, values):
+    """``min``/``max`` hold raw stored values; scale them like ``accessor()`` does."""
+    values = np.asarray(values, dtype=np.float64)
+    dtype = np.dtype(COMPONENT_DTYPES[acc['componentType']])
+    if acc.get('normalized') and dtype.kind in 'iu':
+        values = np.maximum(values / np.iinfo(dtype).max, -1.0)
+    return values
+
+
+def analyze(path):
+    """Vertex/triangle counts, bounding box and embedded texture sizes."""
+    document = load(path)
+    gltf = document.gltf
+    vertices = triangles = 0
+    lo = np.full(3, np.inf)
+    hi = np.full(3, -np.inf)
+
+    for mesh_index, primitive in document.triangle_primitives(compressed=True):
+        position = gltf['accessors'][primitive['attributes']['POSITION']]
+        vertices += position['count']
+        if 'indices' in primitive:
+            triangles += gltf['accessors'][primitive['indices']]['count'] // 3
+        else:
+            triangles += position['count'] // 3
+
+        if 'min' in position and 'max' in position:
+            lo = np.minimum(lo, stored_to_float(position, position['min'][:3]))
+            hi = np.maximum(hi, stored_to_float(position, position['max'][:3]))
+        elif document.binary is not None and 'bufferView' in position:
+            points = document.accessor(primitive['attributes']['POSITION'])
+            if len(points):
+                lo = np.minimum(lo, points.min(axis=0))
+                hi = np.maximum(hi, points.max(axis=0))
+
+    bbox = None
+    if np.isfinite(lo).all():
+        bbox = {'min': [float(v) for v in lo], 'max': [float(v) for v in hi]}
+    textures = [size for size in (image_size(document, img) for img in gltf.get('images', [])) if size]
+    return {'vertex_count': vertices, 'triangle_count': triangles, 'bbox': bbox, 'textures': textures}
+
+
+def cluster_vertices(positions, indices, cells):
+    """Vertex-clustering decimation on a ``cells``-per-axis grid.
+
+    Returns ``(remap, cluster_count, triangles)``: the cluster of each input
+    vertex and the surviving, de-duplicated triangles over cluster ids.
+    """
+    lo = positions.min(axis=0)
+    size = float((positions.max(axis=0) - lo).max()) / cells or 1.0
+    grid = np.floor((positions - lo) / size).astype(np.int64)
+    dims = grid.max(axis=0) + 1
+    keys = (grid[:, 0] * dims[1] + grid[:, 1]) * dims[2] + grid[:, 2]
+    _, remap, counts = np.unique(keys, return_inverse=True, return_counts=True)
+
+    tris = remap[indices.reshape(-1, 3)]
+    keep = (tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 0] != tris[:, 2])
+    tris = tris[keep]
+    if len(tris):
+        _, first = np.unique(np.sort(tris, axis=1), axis=0, return_index=True)
+        tris = tris[np.sort(first)]
+    return remap, len(counts), tris
+
+
+def average_by_cluster(values, remap, clusters):
+    counts = np.bincount(remap, minlength=clusters).astype(np.float64)
+    out = np.empty((clusters, values.shape[1]), dtype=np.float32)
+    for column in range(values.shape[1]):
+        out[:, column] = np.bincount(remap, weights=values[:, column], minlength=clusters) / counts
+    return out
+
+
+def decimate(positions, indices, ratio):
+    """Pick the finest grid whose clustering keeps at most ``ratio`` of the triangles."""
+    target = max(1, int(len(indices) // 3 * ratio))
+    best = None
+    low, high = 1, 2048
+    while low <= high:
+        cells = (low + high) // 2
+        remap, clusters, tris = cluster_vertices(positions, indices, cells)
+        if len(tris) <= target:
+            best = (remap, clusters, tris)
+            low = cells + 1
+        else:
+            high = cells - 1
+    return best
+
+
+class GLBWriter:
+    """Accumulates buffer views and accessors for a single-buffer GLB."""
+
+    def __init__(self, gltf):
+        self.gltf = gltf
+        self.gltf['bufferViews'] = []
+        self.gltf['accessors'] = []
+        self.chunks = []
+        self.length = 0
+
+    def add_view(self, data, target=None, stride=None):
+        pad = (-self.length) % 4
+        if pad:
+            self.chunks.append(b'\0' * pad)
+            self.length += pad
+        view = {'buffer': 0, 'byteOffset': self.length, 'byteLength': len(data)}
+        if target:
+            view['target'] = target
+        if stride:
+            view['byteStride'] = stride
+        self.chunks.append(data)
+        self.length += len(data)
+        self.gltf['bufferViews'].append(view)
+        return len(self.gltf['bufferViews']) - 1
+
+    def add_accessor(self, array, type_, target=TARGET_ARRAY_BUFFER, normalized=False):
+        array = np.ascontiguousarray(array)
+        dtype = array.dtype
+        components = TYPE_SIZES[type_]
+        stride = None
+        if target == TARGET_ARRAY_BUFFER:
+            # vertex attribute elements must be 4-byte aligned
+            row = array.dtype.itemsize * components
+            if row % 4:
+                padded = np.zeros((len(array), (row + 3) // 4 * 4), dtype=np.uint8)
+                padded[:, :row] = array.reshape(len(array), -1).view(np.uint8)
+                stride = padded.shape[1]
+                array = padded
+        accessor = {
+            'bufferView': self.add_view(array.tobytes(), target, stride),
+            'componentType': DTYPE_COMPONENTS[dtype],
+            'count': len(array),
+            'type': type_,
+        }
+        if normalized:
+            accessor['normalized'] = True
+        self.gltf['accessors'].append(accessor)
+        return len(self.gltf['accessors']) - 1
+
+    def to_bytes(self):
+        self.gltf['buffers'] = [{'byteLength': self.length}] if self.length else []
+        json_bytes = json.dumps(self.gltf, separators=(',', ':')).encode('utf-8')
+        json_bytes += b' ' * ((-len(json_bytes)) % 4)
+        binary = b''.join(self.chunks)
+        binary += b'\0' * ((-len(binary)) % 4)
+
+        out = BytesIO()
+        total = 12 + 8 + len(json_bytes) + (8 + len(binary) if binary else 0)
+        out.write(struct.pack('<4sII', GLB_MAGIC, 2, total))
+        out.write(struct.pack('<II', len(json_bytes), CHUNK_JSON))
+        out.write(json_bytes)
+        if binary:
+            out.write(struct.pack('<II', len(binary), CHUNK_BIN))
+            out.write(binary)
+        return out.getvalue()
+
+
+def copy_scene(document):
+    """Shallow copy of everything but geometry, with embedded images re-homed
+    by the caller. Skins, animations and morph targets are dropped."""
+    source = document.gltf
+    gltf = {'asset': {'version': '2.0', 'generator': 'edu3d-lod'}}
+    if 'EXT_meshopt_compression' in source.get('extensionsRequired', []):
+        raise GLTFError("Meshopt-compressed buffers are not supported.")
+    for key in ('scene', 'scenes', 'materials', 'textures', 'samplers', 'cameras'):
+        if key in source:
+            gltf[key] = json.loads(json.dumps(source[key]))
+    for key in ('extensionsUsed', 'extensionsRequired'):
+        kept = [ext for ext in source.get(key, []) if ext not in GEOMETRY_EXTENSIONS]
+        if kept:
+            gltf[key] = kept
+    gltf['nodes'] = [
+        {k: v for k, v in node.items() if k not in ('skin', 'weights')}
+        for node in source.get('nodes', [])
+    ]
+    return gltf
+
+
+def copy_images(document, writer):
+    images = []
+    for image in document.gltf.get('images', []):
+        image = dict(image)
+        if 'bufferView' in image:
+            image['bufferView'] = writer.add_view(document.buffer_view_bytes(image['bufferView']).tobytes())
+        images.append(image)
+    if images:
+        writer.gltf['images'] = images
+
+
+def build_lod(path, ratio):
+    """A decimated GLB keeping about ``ratio`` of the triangles, or None if the
+    model is too small for that to help."""
+    document = load(path)
+    writer = GLBWriter(copy_scene(document))
+    copy_images(document, writer)
+
+    meshes = [{'primitives': []} for _ in document.gltf.get('meshes', [])]
+    before = after = 0
+    for mesh_index, primitive in document.triangle_primitives():
+        positions = document.accessor(primitive['attributes']['POSITION']).astype(np.float32)
+        indices = document.indices(primitive)
+        indices = indices[:len(indices) // 3 * 3]
+        before += len(indices) // 3
+        if len(positions) == 0 or len(indices) < 3:
+            continue
+        result = decimate(positions, indices, ratio)
+        if result is None:
+            continue
+        remap, clusters, tris = result
+        if not len(tris):
+            continue
+        after += len(tris)
+
+        new_positions = average_by_cluster(positions, remap, clusters)
+        attributes = {
+            'POSITION': writer.add_accessor(new_positions, 'VEC3'),
+        }
+        accessor = writer.gltf['accessors'][attributes['POSITION']]
+        accessor['min'] = [float(v) for v in new_positions.min(axis=0)]
+        accessor['max'] = [float(v) for v in new_positions.max(axis=0)]
+
+        if 'NORMAL' in primitive['attributes']:
+            normals = average_by_cluster(document.accessor(primitive['attributes']['NORMAL']).astype(np.float32), remap, clusters)
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            normals = np.where(lengths > 0, normals / np.where(lengths > 0, lengths, 1), [0, 0, 1]).astype(np.float32)
+            attributes['NORMAL'] = writer.add_accessor(normals, 'VEC3')
+        if 'TEXCOORD_0' in primitive['attributes']:
+            uvs = average_by_cluster(document.accessor(primitive['attributes']['TEXCOORD_0']).astype(np.float32), remap, clusters)
+            attributes['TEXCOORD_0'] = writer.add_accessor(uvs, 'VEC2')
+
+        index_dtype = np.uint16 if clusters < 65536 else np.uint32
+        new_primitive = {
+            'attributes': attributes,
+            'indices': writer.add_accessor(tris.astype(index_dtype).reshape(-1, 1), 'SCALAR', TARGET_ELEMENT_ARRAY_BUFFER),
+        }
+        if 'material' in primitive:
+            new_primitive['material'] = primitive['material']
+        meshes[mesh_index]['primitives'].append(new_primitive)
+
+    if not before or after >= before:
+        return None
+
+    # meshes that lost every primitive are dropped and node references renumbered
+    renumber = {}
+    kept = []
+    for old, mesh in enumerate(meshes):
+        if mesh['primitives']:
+            renumber[old] = len(kept)
+            kept.append(mesh)
+    for node in writer.gltf['nodes']:
+        if 'mesh' in node:
+            if node['mesh'] in renumber:
+                node['mesh'] = renumber[node['mesh']]
+            else:
+                del node['mesh']
+    writer.gltf['meshes'] = kept
+    return writer.to_bytes()
+
+
+def spread_bits(values):
+    """Spread the low 10 bits of each value three apart, for Morton codes."""
+    v = values.astype(np.uint64) & 0x3FF
+    v = (v | (v << 16)) & 0x030000FF
+    v = (v | (v << 8)) & 0x0300F00F
+    v = (v | (v << 4)) & 0x030C30C3
+    v = (v | (v << 2)) & 0x09249249
+    return v
+
+
+def optimize_order(positions, indices):
+    """Reorder a triangle list for cache locality.
+
+    Triangles are sorted along a Morton curve through their centroids so
+    neighbours are drawn together, then vertices are renumbered in first-use
+    order so vertex fetches walk the buffer forwards. Returns
+    ``(vertex_order, indices)``; vertices no triangle uses are dropped.
+    """
+    tris = indices.reshape(-1, 3)
+    centroids = positions[tris].mean(axis=1)
+    lo = centroids.min(axis=0)
+    extent = float((centroids.max(axis=0) - lo).max()) or 1.0
+    cells = ((centroids - lo) / extent * 1023).astype(np.uint32)
+    codes = spread_bits(cells[:, 0]) | (spread_bits(cells[:, 1]) << 1) | (spread_bits(cells[:, 2]) << 2)
+    flat = tris[np.argsort(codes, kind='stable')].ravel()
+
+    _, first = np.unique(flat, return_index=True)
+    vertex_order = flat[np.sort(first)]
+    remap = np.zeros(len(positions), dtype=np.uint32)
+    remap[vertex_order] = np.arange(len(vertex_order), dtype=np.uint32)
+    return vertex_order, remap[flat]
+
+
+def quantize_attribute(writer, name, values, type_):
+    """Add ``values`` as the smallest KHR_mesh_quantization layout for ``name``."""
+    if name in ('NORMAL', 'TANGENT'):
+        return writer.add_accessor(np.round(np.clip(values, -1, 1) * 127).astype(np.int8), type_, normalized=True)
+    if name.startswith('TEXCOORD_') and len(values) and values.min() >= 0 and values.max() <= 1:
+        return writer.add_accessor(np.round(values * 65535).astype(np.uint16), type_, normalized=True)
+    return writer.add_accessor(values.astype(np.float32), type_)
+
+
+def quantize(document):
+    """Re-encode geometry with KHR_mesh_quantization.
+
+    Positions become normalized int16 in each mesh's bounding cube (a child
+    node carries the dequantizing translation and uniform scale), normals and
+    tangents int8, and UVs in [0, 1] uint16. Triangle lists are reordered with
+    optimize_order(). Returns GLB bytes, or None for files this rewrite would
+    damage (skins, animations, morph targets) or that are already compressed.
+    """
+    source = document.gltf
+    meshes = source.get('meshes', [])
+    primitives = [primitive for mesh in meshes for primitive in mesh.get('primitives', [])]
+    if source.get('skins') or source.get('animations') or any('targets' in p for p in primitives):
+        return None
+    if QUANTIZATION in source.get('extensionsUsed', []) or any(
+        'KHR_draco_mesh_compression' in p.get('extensions', {}) for p in primitives
+    ):
+        return None
+    if not any('POSITION' in p.get('attributes', {}) for p in primitives):
+        return None
+
+    writer = GLBWriter(copy_scene(document))
+    copy_images(document, writer)
+
+    out_meshes = []
+    dequantize = []
+    for mesh in meshes:
+        prims = [p for p in mesh.get('primitives', []) if 'POSITION' in p.get('attributes', {})]
+        positions = [document.accessor(p['attributes']['POSITION']).astype(np.float64) for p in prims]
+        points = [pos for pos in positions if len(pos)]
+        if points:
+            lo = np.min([pos.min(axis=0) for pos in points], axis=0)
+            hi = np.max([pos.max(axis=0) for pos in points], axis=0)
+        else:
+            lo = hi = np.zeros(3)
+        center = (lo + hi) / 2
+        scale = float((hi - lo).max()) / 2 or 1.0
+        dequantize.append((center, scale))
+
+        out_prims = []
+        for primitive, position in zip(prims, positions):
+            mode = primitive.get('mode', MODE_TRIANGLES)
+            indices = document.indices(primitive) if 'indices' in primitive or mode == MODE_TRIANGLES else None
+            if mode == MODE_TRIANGLES:
+                indices = indices[:len(indices) // 3 * 3]
+                if not len(indices):
+                    continue
+                vertex_order, indices = optimize_order(position, indices)
+            else:
+                vertex_order = np.arange(len(position))
+
+            quantized = np.round((position[vertex_order] - center) / scale * 32767)
+            quantized = np.clip(quantized, -32767, 32767).astype(np.int16)
+            attributes = {'POSITION': writer.add_accessor(quantized, 'VEC3', normalized=True)}
+            accessor = writer.gltf['accessors'][attributes['POSITION']]
+            accessor['min'] = [int(v) for v in quantized.min(axis=0)]
+            accessor['max'] = [int(v) for v in quantized.max(axis=0)]
+
+            for name, index in primitive['attributes'].items():
+                if name == 'POSITION' or name.startswith(('JOINTS_', 'WEIGHTS_')):
+                    continue
+                type_ = document.gltf['accessors'][index]['type']
+                values = document.accessor(index).astype(np.float32)[vertex_order]
+                attributes[name] = quantize_attribute(writer, name, values, type_)
+
+            new_primitive = {'attributes': attributes}
+            if indices is not None:
+                index_dtype = np.uint16 if len(vertex_order) < 65536 else np.uint32
+                new_primitive['indices'] = writer.add_accessor(
+                    indices.astype(index_dtype).reshape(-1, 1), 'SCALAR', TARGET_ELEMENT_ARRAY_BUFFER,
+                )
+            for key in ('material', 'mode', 'extras'):
+                if key in primitive:
+                    new_primitive[key] = primitive[key]
+            out_prims.append(new_primitive)
+        if not out_prims:
+            return None
+        out_meshes.append({**{k: v for k, v in mesh.items() if k not in ('primitives', 'weights')}, 'primitives': out_prims})
+
+    nodes = writer.gltf['nodes']
+    for node in list(nodes):
+        if 'mesh' not in node:
+            continue
+        center, scale = dequantize[node['mesh']]
+        nodes.append({'mesh': node.pop('mesh'), 'translation': [float(v) for v in center], 'scale': [scale] * 3})
+        node.setdefault('children', []).append(len(nodes) - 1)
+    writer.gltf['meshes'] = out_meshes
+    for key in ('extensionsUsed', 'extensionsRequired'):
+        writer.gltf[key] = writer.gltf.get(key, []) + [QUANTIZATION]
+    return writer.to_bytes()
@@ -0,0 +1,108 @@
+"""Post-upload analysis of model files.
+
+Once a ``Model3D`` is committed its file is parsed for vertex/triangle counts,
+bounding box and texture sizes, and (for .glb files) a quantized full-detail
+copy and lighter LOD variants are written to the content-addressed store.
+Every stored variant also gets gzip/brotli copies for the media view. The
+work runs in the ``backend.tasks`` process pool so a large mesh never holds a
+request worker or the GIL.
+"""
+import logging
+import os
+import time
+
+from django.core.files.base import ContentFile
+
+from backend.db import write_queue
+from backend.tasks import submit
+from . import gltf, thumbnails
+from .models import Model3D
+from .storage import model_storage
+
+logger = logging.getLogger(__name__)
+
+# (field, fraction of triangles kept)
+LOD_LEVELS = (
+    ('lod_medium', 0.5),
+    ('lod_low', 0.15),
+)
+
+
+def ingest(model_id):
+    """Analyze model ``model_id`` and regenerate its LODs."""
+    model = Model3D.objects.filter(pk=model_id).first()
+    if model is None or not model.file:
+        return None
+
+    path = model.file.path
+    seconds = {}
+    staged = {}
+    try:
+        started = time.perf_counter()
+        stats = gltf.analyze(path)
+        seconds['analyze'] = time.perf_counter() - started
+
+        if path.lower().endswith('.glb'):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            started = time.perf_counter()
+            staged['file_compact'] = stage(f'{stem}-compact.glb', gltf.quantize(gltf.load(path)))
+            seconds['quantize'] = time.perf_counter() - started
+            for field, ratio in LOD_LEVELS:
+                started = time.perf_counter()
+                data = gltf.build_lod(path, ratio)
+                if data:
+                    data = gltf.quantize(gltf.loads(data)) or data
+                staged[field] = stage(f'{stem}-{field}.glb', data)
+                seconds[field] = time.perf_counter() - started
+        variants = adopt(model, staged)
+
+        started = time.perf_counter()
+        names = {'file': model.file.name, **variants}
+        # files not yet moved by dedupe_model_files have no blob to sit next to
+        sizes = {field: model_storage.precompress(name) for field, name in names.items() if model_storage.is_blob(name)}
+        seconds['precompress'] = time.perf_counter() - started
+    except Exception as exc:
+        # a malformed upload must not take the worker down with it
+        expected = isinstance(exc, gltf.GLTFError)
+        logger.warning("Could not analyze model %s: %s", model_id, exc, exc_info=not expected)
+        model.analysis_status = 'failed'
+        model.save(update_fields=['analysis_status'])
+        return model
+    finally:
+        for entry in staged.values():
+            if entry and os.path.exists(entry[1]):
+                os.remove(entry[1])
+
+    model.vertex_count = stats['vertex_count']
+    model.triangle_count = stats['triangle_count']
+    model.bbox = stats['bbox']
+    model.textures = stats['textures']
+    model.encoding_report = {'sizes': sizes, 'seconds': {step: round(s, 4) for step, s in seconds.items()}}
+    model.analysis_status = 'ready'
+    model.save(update_fields=['vertex_count', 'triangle_count', 'bbox', 'textures', 'encoding_report', 'analysis_status'])
+    thumbnails.render_thumbnails(model.file.name)
+    return model
+
+
+def stage(filename, data):
+    """``(filename, path, digest)`` of ``data`` staged in the store, or None
+    without data."""
+    return (filename, *model_storage.stage(ContentFile(data))) if data else None
+
+
+def adopt(model, staged):
+    """Move the staged variants into the store and point ``model`` at them,
+    in one ``write_queue()`` turn (see ``models3d.signals.release()``).
+    Returns the names by field; a variant without data is ``''``."""
+    variants = {}
+    with write_queue():
+        for field, entry in staged.items():
+            variants[field] = model_storage.adopt(entry[1], entry[0], entry[2]) if entry else ''
+            getattr(model, field).name = variants[field]
+        if variants:
+            model.save(update_fields=list(variants))
+    return variants
+
+
+def schedule(model_id):
+    submit(ingest, model_id)
@@ -0,0 +1,93 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from backend.db import write_queue
+from models3d.signals import BLOB_FIELDS, reference_count
+from models3d.storage import BLOB_PREFIX, model_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing model files into the content-addressed blob store, "
+        "repointing every Model3D row and dropping duplicate copies."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without touching anything.")
+        parser.add_argument("--prune", action="store_true", help="Also delete blobs no model row references.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        legacy = set()
+        for model, field in BLOB_FIELDS:
+            legacy.update(
+                name for name in model.objects.values_list(field, flat=True).distinct()
+                if name and not model_storage.is_blob(name)
+            )
+
+        moved = reclaimed = 0
+        for name in sorted(legacy):
+            if not model_storage.exists(name):
+                self.stderr.write(f"missing: {name}")
+                continue
+            size = model_storage.size(name)
+            if dry_run:
+                self.stdout.write(f"would move {name} ({size} bytes)")
+                continue
+
+            # the blob and the rows repointed at it commit in one writer turn
+            with model_storage.open(name, "rb") as fh, model_storage.adopting(File(fh), name) as blob:
+                duplicate = reference_count(blob) > 0
+                for model, field in BLOB_FIELDS:
+                    model.objects.filter(**{field: name}).update(**{field: blob})
+            model_storage.delete(name)
+            moved += 1
+            if duplicate:
+                reclaimed += size
+            self.stdout.write(f"{name} -> {blob}{' (deduplicated)' if duplicate else ''}")
+
+        if options["prune"]:
+            reclaimed += self.prune(dry_run)
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} file(s), reclaimed {reclaimed} bytes."))
+
+    def prune(self, dry_run):
+        """Delete blobs no row references, with their derived files. The
+        derived files of referenced blobs (precompressed copies,
+        thumbnails) are kept."""
+        root = model_storage.path(BLOB_PREFIX)
+        names = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d != "tmp"]
+            for filename in filenames:
+                names.append(os.path.relpath(os.path.join(dirpath, filename), model_storage.location).replace(os.sep, "/"))
+
+        keep = set()
+        for name in names:
+            if reference_count(name):
+                keep.add(name)
+                keep.update(model_storage.derived_names(name))
+
+        reclaimed = 0
+        # a blob sorts before its derived files, which its delete() removes too
+        for name in sorted(set(names) - keep):
+            if not model_storage.exists(name):
+                continue
+            size = model_storage.size(name)
+            if dry_run:
+                reclaimed += size
+                self.stdout.write(f"would prune {name}")
+                continue
+            derived = [d for d in model_storage.derived_names(name) if d not in keep]
+            freed = size + sum(model_storage.size(d) for d in derived)
+            with write_queue():
+                # adopted by a save since the scan (see models3d.signals.release)
+                if reference_count(name):
+                    continue
+                model_storage.delete(name)  # and its derived files
+            reclaimed += freed
+            for pruned in (name, *derived):
+                self.stdout.write(f"pruned {pruned}")
+        return reclaimed
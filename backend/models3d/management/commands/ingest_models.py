@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from models3d import ingest
+from models3d.models import Model3D
+
+
+class Command(BaseCommand):
+    help = "Analyze model files and (re)build their LODs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Model ids to process (default: all not yet ready).")
+        parser.add_argument("--all", action="store_true", help="Reprocess every model, including ready ones.")
+
+    def handle(self, *args, **options):
+        models = Model3D.objects.order_by("id")
+        if options["ids"]:
+            models = models.filter(id__in=options["ids"])
+        elif not options["all"]:
+            models = models.exclude(analysis_status="ready")
+
+        done = failed = 0
+        for model_id in models.values_list("id", flat=True):
+            model = ingest.ingest(model_id)
+            if model is None:
+                continue
+            if model.analysis_status == "ready":
+                done += 1
+                self.stdout.write(f"{model_id}: {model.vertex_count} vertices, {model.triangle_count} triangles")
+            else:
+                failed += 1
+                self.stderr.write(f"{model_id}: failed")
+        self.stdout.write(self.style.SUCCESS(f"Ingested {done} model(s), {failed} failed."))
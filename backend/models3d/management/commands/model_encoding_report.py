@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from models3d.models import Model3D
+
+VARIANTS = ("file", "file_compact", "lod_medium", "lod_low")
+
+
+def smallest(sizes):
+    return min(sizes.values()) if sizes else None
+
+
+class Command(BaseCommand):
+    help = "Show stored variant sizes and ingest timings for each model."
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Model ids to report (default: all analyzed models).")
+
+    def handle(self, *args, **options):
+        models = Model3D.objects.filter(analysis_status="ready").order_by("id")
+        if options["ids"]:
+            models = models.filter(id__in=options["ids"])
+
+        header = f"{'id':>6}  {'title':<24} {'variant':<13} {'identity':>12} {'gzip':>12} {'br':>12} {'best':>7}"
+        self.stdout.write(header)
+        original_total = served_total = 0
+        for model in models.only("id", "title", "encoding_report"):
+            sizes = model.encoding_report.get("sizes", {})
+            original = sizes.get("file", {}).get("identity")
+            for variant in VARIANTS:
+                row = sizes.get(variant)
+                if not row:
+                    continue
+                ratio = f"{smallest(row) / original:.1%}" if original else "-"
+                self.stdout.write(
+                    f"{model.id:>6}  {model.title[:24]:<24} {variant:<13} {row['identity']:>12} "
+                    f"{row.get('gzip', '-'):>12} {row.get('br', '-'):>12} {ratio:>7}"
+                )
+            seconds = model.encoding_report.get("seconds", {})
+            if seconds:
+                timings = ", ".join(f"{step} {value:.2f}s" for step, value in seconds.items())
+                self.stdout.write(f"{'':>8}{timings}")
+            if original:
+                original_total += original
+                served_total += min(smallest(sizes["file"]), smallest(sizes.get("file_compact", {})) or original)
+
+        if original_total:
+            self.stdout.write(self.style.SUCCESS(
+                f"Full detail: {original_total} bytes uploaded, {served_total} bytes at best "
+                f"({served_total / original_total:.1%})."
+            ))
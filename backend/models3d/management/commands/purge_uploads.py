@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from models3d import uploads
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned chunked upload sessions and their partial files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age", type=int, default=None,
+            help="Idle time in seconds before a session is purged (default: CHUNKED_UPLOAD_EXPIRY).",
+        )
+
+    def handle(self, *args, **options):
+        max_age = options["max_age"]
+        removed = uploads.purge_stale(None if max_age is None else timedelta(seconds=max_age))
+        self.stdout.write(f"Purged {removed} stale upload session(s).")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from models3d.signals import BLOB_FIELDS
+from models3d.thumbnails import render_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Render catalog thumbnails for every model file that doesn't have them yet."
+
+    def handle(self, *args, **options):
+        names = set()
+        for model, field in BLOB_FIELDS:
+            if field == "file":
+                names.update(model.objects.exclude(file="").values_list("file", flat=True).distinct())
+
+        rendered = failed = 0
+        for name in sorted(names):
+            if render_thumbnails(name):
+                rendered += 1
+            else:
+                failed += 1
+                self.stderr.write(f"{name}: no thumbnail")
+        self.stdout.write(self.style.SUCCESS(f"{rendered} file(s) have thumbnails, {failed} without."))
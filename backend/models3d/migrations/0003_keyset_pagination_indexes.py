@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models3d', '0002_alter_model3d_uploaded_by'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='model3d',
+            index=models.Index(fields=['created_at', 'id'], name='model3d_created_id_idx'),
+        ),
+    ]
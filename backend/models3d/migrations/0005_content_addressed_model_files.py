@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:58
+
+import models3d.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models3d', '0004_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='model3d',
+            name='file',
+            field=models.FileField(db_index=True, storage=models3d.storage.ContentAddressedStorage(), upload_to='3d_models/'),
+        ),
+    ]
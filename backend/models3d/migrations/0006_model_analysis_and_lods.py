@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:03
+
+import models3d.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models3d', '0005_content_addressed_model_files'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model3d',
+            name='analysis_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='bbox',
+            field=models.JSONField(blank=True, help_text="{'min': [x, y, z], 'max': [x, y, z]}", null=True),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='lod_low',
+            field=models.FileField(blank=True, db_index=True, storage=models3d.storage.ContentAddressedStorage(), upload_to='3d_models/lod/'),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='lod_medium',
+            field=models.FileField(blank=True, db_index=True, storage=models3d.storage.ContentAddressedStorage(), upload_to='3d_models/lod/'),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='textures',
+            field=models.JSONField(blank=True, default=list, help_text='Embedded image sizes'),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='triangle_count',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='vertex_count',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
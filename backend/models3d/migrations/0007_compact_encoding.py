@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:06
+
+import models3d.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('models3d', '0006_model_analysis_and_lods'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model3d',
+            name='encoding_report',
+            field=models.JSONField(blank=True, default=dict, help_text='Variant sizes and ingest timings'),
+        ),
+        migrations.AddField(
+            model_name='model3d',
+            name='file_compact',
+            field=models.FileField(blank=True, db_index=True, help_text='Full detail, KHR_mesh_quantization encoded', storage=models3d.storage.ContentAddressedStorage(), upload_to='3d_models/compact/'),
+        ),
+    ]
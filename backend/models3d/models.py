@@ -1,13 +1,23 @@
+import uuid
+from pathlib import Path
+
+from django.conf import settings
 from django.db import models
 
 # Create your models here.
 from django.db import models
 from users.models import User
+from .storage import model_storage
 
 class Model3D(models.Model):
+    ANALYSIS_CHOICES = (
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
     title = models.CharField(max_length=200)
     subject = models.CharField(max_length=100)
-    file = models.FileField(upload_to='3d_models/')
+    file = models.FileField(upload_to='3d_models/', storage=model_storage, db_index=True)
     uploaded_by = models.ForeignKey(
     User,
     on_delete=models.CASCADE,
@@ -16,5 +26,46 @@ class Model3D(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Filled in by models3d.ingest after upload
+    analysis_status = models.CharField(max_length=10, choices=ANALYSIS_CHOICES, default='pending')
+    vertex_count = models.PositiveBigIntegerField(null=True, blank=True)
+    triangle_count = models.PositiveBigIntegerField(null=True, blank=True)
+    bbox = models.JSONField(null=True, blank=True, help_text="{'min': [x, y, z], 'max': [x, y, z]}")
+    textures = models.JSONField(default=list, blank=True, help_text="Embedded image sizes")
+    lod_medium = models.FileField(upload_to='3d_models/lod/', storage=model_storage, db_index=True, blank=True)
+    lod_low = models.FileField(upload_to='3d_models/lod/', storage=model_storage, db_index=True, blank=True)
+    file_compact = models.FileField(
+        upload_to='3d_models/compact/', storage=model_storage, db_index=True, blank=True,
+        help_text="Full detail, KHR_mesh_quantization encoded",
+    )
+    encoding_report = models.JSONField(default=dict, blank=True, help_text="Variant sizes and ingest timings")
+
+    class Meta:
+        indexes = [
+            # keyset pagination on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='model3d_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class UploadSession(models.Model):
+    """A resumable, chunked upload of a model file that hasn't been finalized yet."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    title = models.CharField(max_length=200)
+    subject = models.CharField(max_length=100)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def temp_path(self):
+        return Path(settings.CHUNKED_UPLOAD_DIR) / f"{self.pk}.part"
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
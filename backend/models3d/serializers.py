@@ -1,8 +1,117 @@
 from rest_framework import serializers
-from .models import Model3D
+
+from backend import lean
+from . import thumbnails
+from .models import Model3D, UploadSession
+
+
+def thumbnail_urls(storage, name, request=None):
+    """``{"webp": {"128": url, ...}, "png": {...}}`` for the model file
+    ``name``, or None until its thumbnails have been rendered."""
+    if not name or not thumbnails.has_thumbnails(name):
+        return None
+    urls = {}
+    for fmt in thumbnails.THUMBNAIL_FORMATS:
+        urls[fmt] = {}
+        for size in thumbnails.THUMBNAIL_SIZES:
+            url = storage.url(thumbnails.thumbnail_name(name, size, fmt))
+            urls[fmt][str(size)] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+class ThumbnailField(serializers.Field):
+    """``thumbnail_urls()`` of a model file."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'file')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, file):
+        if not file:
+            return None
+        return thumbnail_urls(file.storage, file.name, self.context.get('request'))
+
+
+LOD_FIELDS = {'compact': 'file_compact', 'medium': 'lod_medium', 'low': 'lod_low'}
+
 
 class Model3DSerializer(serializers.ModelSerializer):
+    """``?lod=compact``, ``medium`` or ``low`` serves that variant as ``file``
+    where one exists; every available variant is listed under ``lods``.
+    ``compact`` is full detail with quantized (KHR_mesh_quantization) geometry."""
+    lods = serializers.SerializerMethodField()
+    thumbnail = ThumbnailField()
+
     class Meta:
         model = Model3D
-        fields = '__all__'
-        read_only_fields = ['uploaded_by']
+        exclude = ['lod_medium', 'lod_low', 'file_compact', 'encoding_report']
+        read_only_fields = ['uploaded_by', 'analysis_status', 'vertex_count', 'triangle_count', 'bbox', 'textures']
+
+    def file_url(self, file):
+        request = self.context.get('request')
+        return request.build_absolute_uri(file.url) if request else file.url
+
+    def get_lods(self, obj):
+        lods = {'full': self.file_url(obj.file)} if obj.file else {}
+        for level, field in LOD_FIELDS.items():
+            file = getattr(obj, field)
+            if file:
+                lods[level] = self.file_url(file)
+        return lods
+
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        request = self.context.get('request')
+        field = LOD_FIELDS.get(request.query_params.get('lod')) if request is not None else None
+        if field and getattr(obj, field):
+            data['file'] = self.file_url(getattr(obj, field))
+        return data
+
+
+class Model3DRowSerializer(lean.RowSerializer):
+    """``Model3DSerializer`` for list responses (``backend.lean``)."""
+    columns = (
+        'id', 'title', 'subject', 'file', *LOD_FIELDS.values(), 'created_at', 'analysis_status',
+        'vertex_count', 'triangle_count', 'bbox', 'textures', 'uploaded_by',
+    )
+
+    def fields(self, prefix=''):
+        request = self.context.get('request')
+        storage = Model3D._meta.get_field('file').storage
+        url = lean.file_url(storage, request)
+        file = prefix + 'file'
+        levels = [(level, prefix + field) for level, field in LOD_FIELDS.items()]
+        served = LOD_FIELDS.get(request.query_params.get('lod')) if request is not None else None
+        served = prefix + served if served else file
+
+        def lods(row):
+            found = {'full': url(row[file])} if row[file] else {}
+            for level, column in levels:
+                if row[column]:
+                    found[level] = url(row[column])
+            return found
+
+        def file_value(row):
+            # the requested variant where there is one
+            name = row[served] or row[file]
+            return url(name) if name else None
+
+        return [
+            ('id', prefix + 'id'),
+            ('lods', lods),
+            ('thumbnail', lambda row: thumbnail_urls(storage, row[file], request)),
+            ('title', prefix + 'title'),
+            ('subject', prefix + 'subject'),
+            ('file', file_value),
+            *((column, prefix + column) for column in (
+                'created_at', 'analysis_status', 'vertex_count', 'triangle_count', 'bbox', 'textures', 'uploaded_by',
+            )),
+        ]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'title', 'subject', 'filename', 'size', 'offset', 'sha256', 'created_at']
+        read_only_fields = ['id', 'offset', 'created_at']
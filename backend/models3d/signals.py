@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from backend.db import write_queue
+
+from users.models import Model3D as UserModel3D
+from .models import Model3D
+
+# Every (model, field) whose files live in the shared content-addressed
+# store. A blob is referenced once per row and field across all of them.
+BLOB_FIELDS = (
+    (Model3D, 'file'),
+    (Model3D, 'lod_medium'),
+    (Model3D, 'lod_low'),
+    (Model3D, 'file_compact'),
+    (UserModel3D, 'file'),
+)
+
+
+def fields_of(sender):
+    return [field for model, field in BLOB_FIELDS if model is sender]
+
+
+def reference_count(name):
+    return sum(model.objects.filter(**{field: name}).count() for model, field in BLOB_FIELDS)
+
+
+def release(storage, name):
+    """Delete blob ``name`` after commit if no row references it anymore.
+
+    The check and the delete take a turn in ``write_queue()``, as does every
+    ``adopt()`` of a blob together with the rows pointing at it (see
+    ``ContentAddressedStorage``), so a blob just reused by an uncommitted
+    save is counted rather than deleted under it.
+    """
+    if not name:
+        return
+
+    def delete_if_unreferenced():
+        with write_queue():
+            if reference_count(name) == 0:
+                storage.delete(name)
+
+    transaction.on_commit(delete_if_unreferenced)
+
+
+@receiver(pre_save, sender=Model3D)
+@receiver(pre_save, sender=UserModel3D)
+def remember_previous_files(sender, instance, **kwargs):
+    if instance.pk:
+        fields = fields_of(sender)
+        instance._previous_files = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+@receiver(post_save, sender=Model3D)
+@receiver(post_save, sender=UserModel3D)
+def release_replaced_files(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_files', {})
+    for field, name in previous.items():
+        current = getattr(instance, field)
+        if name and name != current.name:
+            release(current.storage, name)
+
+
+@receiver(post_delete, sender=Model3D)
+@receiver(post_delete, sender=UserModel3D)
+def release_deleted_files(sender, instance, **kwargs):
+    for field in fields_of(sender):
+        file = getattr(instance, field)
+        release(file.storage, file.name)
+
+
+@receiver(post_save, sender=Model3D)
+def analyze_new_file(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_files', {}).get('file')
+    if created or (previous is not None and previous != instance.file.name):
+        from . import ingest
+        model_id = instance.pk
+        transaction.on_commit(lambda: ingest.schedule(model_id))
+
+
+@receiver(post_save, sender=UserModel3D)
+def render_new_thumbnail(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_files', {}).get('file')
+    if created or (previous is not None and previous != instance.file.name):
+        from backend.tasks import submit
+        from .thumbnails import render_thumbnails
+        name = instance.file.name
+        transaction.on_commit(lambda: submit(render_thumbnails, name))
@@ -0,0 +1,176 @@
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from backend.db import write_queue
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz copies are written
+    brotli = None
+
+BLOB_PREFIX = "blobs"
+# (Content-Encoding, suffix) of the precompressed copies kept next to a blob
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+# a copy that doesn't save at least this much isn't worth a second lookup
+MIN_SAVING = 0.05
+READ_SIZE = 1024 * 1024
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Store each file once, under the SHA-256 of its bytes.
+
+    ``skull.glb`` with digest ``ab12...`` is saved as ``blobs/ab/12/ab12....glb``
+    whatever directory ``upload_to`` asked for, so re-uploads of the same model
+    share one blob and no directory grows past a few hundred entries. Blobs are
+    freed by ``models3d.signals`` once no model row points at them.
+
+    That check runs in ``write_queue()``, so a blob is only safe to reuse
+    if it is adopted, and the rows pointing at it committed, in one
+    ``write_queue()`` block: ``adopting()``, or ``stage()`` and ``adopt()``.
+    """
+
+    def blob_name(self, digest, filename):
+        ext = os.path.splitext(filename)[1].lower()
+        return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save().
+        return name
+
+    def stage(self, content):
+        """Copy ``content`` into the store's tmp directory, hashing it on the
+        way, and return ``(path, digest)`` for ``adopt()``. The caller
+        removes ``path`` if it never adopts it."""
+        tmp_dir = self.path(f"{BLOB_PREFIX}/tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        # Hash while copying to a temp file, then rename into place: one pass
+        # over the data, and readers never see a half-written blob.
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    hasher.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return tmp_path, hasher.hexdigest()
+
+    def stage_file(self, path):
+        """Move the local file ``path`` into the store's tmp directory (a
+        copy only across filesystems), so that ``adopt()`` is a rename."""
+        tmp_dir = self.path(f"{BLOB_PREFIX}/tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        os.close(fd)
+        shutil.move(path, tmp_path)
+        return tmp_path
+
+    @contextmanager
+    def adopting(self, content, filename):
+        """Stage ``content``, then yield its blob name inside
+        ``write_queue()``; save the rows that point at it in the block."""
+        path, digest = self.stage(content)
+        try:
+            with write_queue():
+                yield self.adopt(path, filename, digest)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _save(self, name, content):
+        path, digest = self.stage(content)
+        try:
+            return self.adopt(path, name, digest)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def adopt(self, path, filename, digest):
+        """Move a local file with a known digest into the store and return its name.
+
+        If the blob already exists the local copy is simply dropped.
+        """
+        name = self.blob_name(digest, filename)
+        target = self.path(name)
+        if os.path.exists(target):
+            os.remove(path)
+            return name
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
+        if self.file_permissions_mode is not None:
+            os.chmod(target, self.file_permissions_mode)
+        return name
+
+    def is_blob(self, name):
+        return name.startswith(f"{BLOB_PREFIX}/")
+
+    def derived_names(self, name):
+        """Files derived from blob ``name`` (precompressed copies, thumbnails):
+        everything in its directory named ``<blob>.<something>``."""
+        directory, filename = os.path.split(self.path(name))
+        if not os.path.isdir(directory):
+            return []
+        prefix = os.path.dirname(name)
+        return [
+            f"{prefix}/{entry}" for entry in os.listdir(directory)
+            if entry.startswith(filename + ".")
+        ]
+
+    def delete(self, name):
+        super().delete(name)
+        if name and self.is_blob(name):
+            for derived in self.derived_names(name):
+                super().delete(derived)
+
+    def precompress(self, name):
+        """Write gzip and brotli copies of blob ``name`` for the media view to
+        serve as-is. Returns the size of each kept representation by encoding."""
+        path = self.path(name)
+        sizes = {"identity": os.path.getsize(path)}
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding == "br" and brotli is None:
+                continue
+            target = path + suffix
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, "wb") as out, open(path, "rb") as src:
+                    if encoding == "gzip":
+                        # mtime=0 keeps the output (and so its ETag) reproducible
+                        with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=9, mtime=0) as gz:
+                            shutil.copyfileobj(src, gz, READ_SIZE)
+                    else:
+                        compressor = brotli.Compressor(quality=11)
+                        for block in iter(lambda: src.read(READ_SIZE), b""):
+                            out.write(compressor.process(block))
+                        out.write(compressor.finish())
+                size = os.path.getsize(tmp_path)
+                if size <= sizes["identity"] * (1 - MIN_SAVING):
+                    os.replace(tmp_path, target)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(target, self.file_permissions_mode)
+                    sizes[encoding] = size
+                elif os.path.exists(target):
+                    os.remove(target)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return sizes
+
+
+model_storage = ContentAddressedStorage()
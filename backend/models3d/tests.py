@@ -1,3 +1,527 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import Http404
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.media_views import serve_media
+from users.models import Model3D as UserModel3D, User
+from . import gltf, signals, thumbnails, uploads
+from .models import Model3D, UploadSession
+from .storage import model_storage
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp, 'media'),
+            CHUNKED_UPLOAD_DIR=os.path.join(self.tmp, 'chunks'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.teacher = User.objects.create(username='teacher', role='teacher')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+        self.data = os.urandom(300_000)
+
+    def start(self, **extra):
+        payload = {'title': 'Skull', 'subject': 'Anatomy', 'filename': 'skull.glb', 'size': len(self.data)}
+        payload.update(extra)
+        return self.client.post('/api/models/uploads/', payload, format='json')
+
+    def put_chunk(self, session_id, offset, chunk):
+        return self.client.generic(
+            'PUT', f'/api/models/uploads/{session_id}/', chunk,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_chunks_resume_and_finalize(self):
+        sha = hashlib.sha256(self.data).hexdigest()
+        session_id = self.start(sha256=sha).json()['id']
+
+        self.assertEqual(self.put_chunk(session_id, 0, self.data[:100_000]).json()['offset'], 100_000)
+
+        # a retried/out-of-order chunk is refused with the offset to resume from
+        conflict = self.put_chunk(session_id, 50_000, self.data[50_000:150_000])
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.json()['offset'], 100_000)
+
+        resume = self.client.get(f'/api/models/uploads/{session_id}/').json()['offset']
+        self.put_chunk(session_id, resume, self.data[resume:200_000])
+        self.assertEqual(self.client.post(f'/api/models/uploads/{session_id}/complete/').status_code, 409)
+        self.put_chunk(session_id, 200_000, self.data[200_000:])
+
+        response = self.client.post(f'/api/models/uploads/{session_id}/complete/')
+        self.assertEqual(response.status_code, 201)
+        model = Model3D.objects.get()
+        self.assertEqual(model.uploaded_by, self.teacher)
+        with model.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.data)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'chunks')), [])
+
+    def test_checksum_mismatch_keeps_session(self):
+        session_id = self.start(sha256='0' * 64).json()['id']
+        self.put_chunk(session_id, 0, self.data)
+        response = self.client.post(f'/api/models/uploads/{session_id}/complete/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Model3D.objects.exists())
+        self.assertTrue(UploadSession.objects.filter(pk=session_id).exists())
+
+    def test_rejects_oversized_chunk_and_bad_extension(self):
+        self.assertEqual(self.start(filename='skull.exe').status_code, 400)
+        session_id = self.start(size=10).json()['id']
+        self.assertEqual(self.put_chunk(session_id, 0, self.data[:20]).status_code, 400)
+        self.assertEqual(UploadSession.objects.get().offset, 0)
+
+    def test_sessions_are_private(self):
+        session_id = self.start().json()['id']
+        self.client.force_authenticate(User.objects.create(username='other', role='teacher'))
+        self.assertEqual(self.put_chunk(session_id, 0, self.data[:10]).status_code, 404)
+
+    def test_chunk_streams_outside_a_transaction(self):
+        session_id = self.start().json()['id']
+        depth = len(connection.atomic_blocks)  # the test case's own
+        data = self.data
+
+        class Stream(io.BytesIO):
+            def read(stream, size=-1):
+                # an open transaction would hold SQLite's write lock
+                self.assertEqual(len(connection.atomic_blocks), depth)
+                return super().read(size)
+
+        session = uploads.append_chunk(session_id, self.teacher, 0, Stream(data[:1000]))
+        self.assertEqual((session.offset, UploadSession.objects.get().offset), (1000, 1000))
+
+    def test_finalize_hashes_outside_a_transaction(self):
+        session_id = self.start().json()['id']
+        self.put_chunk(session_id, 0, self.data)
+        uploads._hashers.clear()  # as on a worker that saw none of the chunks
+        depth = len(connection.atomic_blocks)
+        hasher_for = uploads._hasher_for
+
+        def rehash(session):
+            self.assertEqual(len(connection.atomic_blocks), depth)
+            return hasher_for(session)
+
+        with mock.patch.object(uploads, '_hasher_for', rehash):
+            model = uploads.finalize(session_id, self.teacher)
+        self.assertEqual(model.file.name, model_storage.blob_name(hashlib.sha256(self.data).hexdigest(), 'skull.glb'))
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_offset_moved_during_a_chunk_is_a_conflict(self):
+        session_id = self.start().json()['id']
+
+        class Stream(io.BytesIO):
+            def read(stream, size=-1):
+                # e.g. the session was finalized by another request meanwhile
+                UploadSession.objects.filter(pk=session_id).update(offset=5)
+                return super().read(size)
+
+        with self.assertRaises(uploads.OffsetMismatch) as raised:
+            uploads.append_chunk(session_id, self.teacher, 0, Stream(self.data[:1000]))
+        self.assertEqual(raised.exception.expected, 5)
+        self.assertEqual(UploadSession.objects.get().offset, 5)
+
+    def test_interrupted_chunk_can_be_retried(self):
+        sha = hashlib.sha256(self.data).hexdigest()
+        session_id = self.start(sha256=sha).json()['id']
+        self.put_chunk(session_id, 0, self.data[:100_000])
+
+        class Broken(io.BytesIO):
+            def read(stream, size=-1):
+                if stream.tell() >= 50_000:
+                    raise OSError("connection reset")
+                return super().read(min(size, 50_000))
+
+        with self.assertRaises(OSError):
+            uploads.append_chunk(session_id, self.teacher, 100_000, Broken(self.data[100_000:]))
+        self.assertEqual(self.put_chunk(session_id, 100_000, self.data[100_000:]).json()['offset'], len(self.data))
+
+        self.assertEqual(self.client.post(f'/api/models/uploads/{session_id}/complete/').status_code, 201)
+        with Model3D.objects.get().file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.data)
+
+    def test_purge_removes_stale_sessions(self):
+        stale = self.start().json()['id']
+        fresh = self.start().json()['id']
+        UploadSession.objects.filter(pk=stale).update(updated_at=timezone.now() - timedelta(days=2))
+        open(os.path.join(self.tmp, 'chunks', 'orphan.part'), 'wb').close()
+
+        call_command('purge_uploads', stdout=open(os.devnull, 'w'))
+
+        self.assertEqual([str(pk) for pk in UploadSession.objects.values_list('pk', flat=True)], [fresh])
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'chunks')), [f'{fresh}.part'])
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.teacher = User.objects.create(username='teacher', role='teacher')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def upload(self, data, url='/api/models/'):
+        upload = SimpleUploadedFile('heart.GLB', data)
+        response = self.client.post(url, {'title': 'Heart', 'subject': 'Biology', 'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def test_identical_uploads_share_one_blob_across_tables(self):
+        data = b'glTF' + os.urandom(1000)
+        digest = hashlib.sha256(data).hexdigest()
+        first = Model3D.objects.get(pk=self.upload(data))
+        second = Model3D.objects.get(pk=self.upload(data))
+        legacy = UserModel3D.objects.get(pk=self.upload(data, '/api/users/models/'))
+
+        self.assertEqual(first.file.name, f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.glb')
+        self.assertEqual({second.file.name, legacy.file.name}, {first.file.name})
+        path = first.file.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+            second.delete()
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            legacy.delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_command_moves_legacy_files_into_store(self):
+        data = os.urandom(500)
+        os.makedirs(os.path.join(self.tmp, '3d_models'))
+        os.makedirs(os.path.join(self.tmp, 'models'))
+        for name in ('3d_models/a.glb', '3d_models/b.glb', 'models/a.glb'):
+            with open(os.path.join(self.tmp, name), 'wb') as fh:
+                fh.write(data)
+        Model3D.objects.create(title='A', subject='x', file='3d_models/a.glb', uploaded_by=self.teacher)
+        Model3D.objects.create(title='B', subject='x', file='3d_models/b.glb', uploaded_by=self.teacher)
+        UserModel3D.objects.create(title='C', subject='x', file='models/a.glb', uploaded_by=self.teacher)
+
+        call_command('dedupe_model_files', stdout=open(os.devnull, 'w'))
+
+        names = set(Model3D.objects.values_list('file', flat=True)) | set(UserModel3D.objects.values_list('file', flat=True))
+        self.assertEqual(len(names), 1)
+        blob = names.pop()
+        self.assertTrue(blob.startswith('blobs/'))
+        with open(os.path.join(self.tmp, blob), 'rb') as fh:
+            self.assertEqual(fh.read(), data)
+        self.assertEqual(os.listdir(os.path.join(self.tmp, '3d_models')), [])
+        self.assertEqual(os.listdir(os.path.join(self.tmp, 'models')), [])
+
+    def test_prune_keeps_files_derived_from_referenced_blobs(self):
+        kept = Model3D.objects.get(pk=self.upload(b'glTF' + os.urandom(1000))).file.name
+        orphan = Model3D.objects.get(pk=self.upload(b'glTF' + os.urandom(1000))).file.name
+        Model3D.objects.filter(file=orphan).delete()  # the row goes, the blob stays behind
+        for name in (kept, orphan):
+            for suffix in ('.gz', '.br', '.thumb128.png', '.thumb512.webp'):
+                with open(os.path.join(self.tmp, name + suffix), 'wb') as fh:
+                    fh.write(b'derived')
+
+        call_command('dedupe_model_files', '--prune', '--dry-run', stdout=open(os.devnull, 'w'))
+        self.assertTrue(model_storage.exists(orphan))
+
+        call_command('dedupe_model_files', '--prune', stdout=open(os.devnull, 'w'))
+        blobs = sorted(
+            name for name in (os.path.relpath(os.path.join(d, f), self.tmp) for d, _, files in os.walk(self.tmp) for f in files)
+            if name.startswith('blobs/')
+        )
+        self.assertEqual(blobs, sorted([kept, *(kept + s for s in ('.br', '.gz', '.thumb128.png', '.thumb512.webp'))]))
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.data = bytes(range(256)) * 40
+        teacher = User.objects.create(username='teacher', role='teacher')
+        self.model = Model3D.objects.create(
+            title='Gear', subject='Engineering', uploaded_by=teacher,
+            file=SimpleUploadedFile('gear.glb', self.data),
+        )
+        self.url = f'/media/{self.model.file.name}'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download_has_strong_content_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(self.data).hexdigest()}"')
+        self.assertEqual(response['Content-Type'], 'model/gltf-binary')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_conditional_requests_return_304(self):
+        first = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(self.body(response), self.data[100:200])
+
+        suffix = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(self.body(suffix), self.data[-10:])
+
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-').status_code, 416)
+        stale = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect', MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect_hands_off_to_proxy(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.model.file.name}')
+        self.assertEqual(response.content, b'')
+
+    def test_missing_and_traversal_paths_404(self):
+        self.assertEqual(self.client.get('/media/blobs/nope.glb').status_code, 404)
+        with self.assertRaises(Http404):
+            serve_media(RequestFactory().get('/media/x'), '../manage.py')
+
+
+def grid_glb(n=60):
+    """An ``n`` x ``n`` quad grid on the unit square as GLB bytes."""
+    xs, ys = np.meshgrid(np.linspace(0, 1, n + 1), np.linspace(0, 1, n + 1))
+    positions = np.stack([xs.ravel(), ys.ravel(), np.zeros(xs.size)], axis=1).astype(np.float32)
+    corner = (np.arange(n)[:, None] * (n + 1) + np.arange(n)[None, :]).ravel()
+    quads = np.stack([corner, corner + 1, corner + n + 2, corner, corner + n + 2, corner + n + 1], axis=1)
+
+    writer = gltf.GLBWriter({'asset': {'version': '2.0'}, 'scene': 0, 'scenes': [{'nodes': [0]}], 'nodes': [{'mesh': 0}]})
+    position = writer.add_accessor(positions, 'VEC3')
+    writer.gltf['accessors'][position].update(min=[0, 0, 0], max=[1, 1, 0])
+    indices = writer.add_accessor(quads.astype(np.uint16).reshape(-1, 1), 'SCALAR', gltf.TARGET_ELEMENT_ARRAY_BUFFER)
+    writer.gltf['meshes'] = [{'primitives': [{'attributes': {'POSITION': position}, 'indices': indices}]}]
+    return writer.to_bytes()
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class BlobReleaseTests(TransactionTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.teacher = User.objects.create(username='teacher', role='teacher')
+
+    def test_release_waits_for_a_save_adopting_the_same_blob(self):
+        data = b'glTF' + os.urandom(1000)
+        old = Model3D.objects.create(title='Old', subject='x', uploaded_by=self.teacher, file=SimpleUploadedFile('a.glb', data))
+        name = old.file.name
+        Model3D.objects.filter(pk=old.pk).update(file='')  # no longer referenced; released below
+        adopted, proceed = threading.Event(), threading.Event()
+
+        def save():
+            try:
+                with model_storage.adopting(ContentFile(data), 'b.glb') as blob:
+                    adopted.set()
+                    proceed.wait(5)
+                    Model3D.objects.create(title='New', subject='x', uploaded_by=self.teacher, file=blob)
+            finally:
+                connections.close_all()
+
+        def release():
+            try:
+                signals.release(model_storage, name)  # outside a transaction: checks right away
+            finally:
+                connections.close_all()
+
+        saver = threading.Thread(target=save)
+        saver.start()
+        self.assertTrue(adopted.wait(5))
+        releaser = threading.Thread(target=release)
+        releaser.start()
+        releaser.join(0.2)  # the new row isn't committed yet
+        proceed.set()
+        saver.join()
+        releaser.join()
+
+        self.assertEqual(Model3D.objects.get(title='New').file.name, name)
+        self.assertTrue(model_storage.exists(name))
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class IngestTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.teacher = User.objects.create(username='teacher', role='teacher')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def create(self, data, name='grid.glb'):
+        with self.captureOnCommitCallbacks(execute=True):
+            model = Model3D.objects.create(
+                title='Grid', subject='Maths', uploaded_by=self.teacher,
+                file=SimpleUploadedFile(name, data),
+            )
+        model.refresh_from_db()
+        return model
+
+    def test_analysis_and_lods(self):
+        model = self.create(grid_glb())
+        self.assertEqual(model.analysis_status, 'ready')
+        self.assertEqual((model.vertex_count, model.triangle_count), (61 * 61, 2 * 60 * 60))
+        self.assertEqual(model.bbox, {'min': [0, 0, 0], 'max': [1, 1, 0]})
+
+        medium = gltf.analyze(model.lod_medium.path)
+        low = gltf.analyze(model.lod_low.path)
+        self.assertLessEqual(medium['triangle_count'], model.triangle_count * 0.5)
+        self.assertLess(low['triangle_count'], medium['triangle_count'])
+        self.assertGreater(low['triangle_count'], 0)
+
+        data = self.client.get('/api/models/', {'lod': 'low'}).json()[0]
+        self.assertEqual(set(data['lods']), {'full', 'compact', 'medium', 'low'})
+        self.assertEqual(data['file'], data['lods']['low'])
+        self.assertNotIn('lod_low', data)
+
+    def test_lod_blobs_are_released_with_the_model(self):
+        model = self.create(grid_glb())
+        paths = [model.file.path, model.file_compact.path, model.lod_medium.path, model.lod_low.path]
+        paths += [model.file.path + '.gz', model.file_compact.path + '.gz']
+        self.assertTrue(all(os.path.exists(path) for path in paths))
+        with self.captureOnCommitCallbacks(execute=True):
+            model.delete()
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_unparseable_file_is_marked_failed(self):
+        model = self.create(b'glTF' + os.urandom(100))
+        self.assertEqual(model.analysis_status, 'failed')
+        self.assertFalse(model.lod_low)
+
+        call_command('ingest_models', stdout=open(os.devnull, 'w'), stderr=open(os.devnull, 'w'))
+        self.assertEqual(Model3D.objects.get().analysis_status, 'failed')
+
+    def test_quantized_copy_matches_original(self):
+        model = self.create(grid_glb())
+        source = gltf.load(model.file.path)
+        compact = gltf.load(model.file_compact.path)
+        self.assertIn(gltf.QUANTIZATION, compact.gltf['extensionsRequired'])
+        self.assertLess(model.file_compact.size, model.file.size)
+
+        # dequantize with the node transform and compare triangle by triangle
+        node = compact.gltf['nodes'][compact.gltf['nodes'][0]['children'][0]]
+        (primitive,) = compact.gltf['meshes'][0]['primitives']
+        positions = compact.accessor(primitive['attributes']['POSITION']) * node['scale'][0] + node['translation']
+        triangles = positions[compact.indices(primitive).reshape(-1, 3)]
+        (original,) = source.gltf['meshes'][0]['primitives']
+        expected = source.accessor(original['attributes']['POSITION'])[source.indices(original).reshape(-1, 3)]
+
+        def canonical(tris):
+            keys = np.round(tris, 3).reshape(len(tris), -1)
+            return keys[np.lexsort(keys.T[::-1])]
+
+        np.testing.assert_allclose(canonical(triangles), canonical(expected), atol=1e-3)
+
+    def test_precompressed_variants_are_negotiated(self):
+        model = self.create(grid_glb())
+        self.assertIn('gzip', model.encoding_report['sizes']['file'])
+        self.assertIn('quantize', model.encoding_report['seconds'])
+        url = f'/media/{model.file.name}'
+
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        zipped = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=1, identity;q=0.5')
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertNotEqual(zipped['ETag'], plain['ETag'])
+        body = b''.join(zipped.streaming_content)
+        self.assertEqual(gzip.decompress(body), model.file.read())
+        self.assertEqual(self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=zipped['ETag']).status_code, 304)
+        self.assertNotIn('Content-Encoding', self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0'))
+
+    def test_encoding_report_command(self):
+        self.create(grid_glb())
+        out = io.StringIO()
+        call_command('model_encoding_report', stdout=out)
+        self.assertIn('Grid', out.getvalue())
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.teacher = User.objects.create(username='teacher', role='teacher')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def upload(self, url):
+        upload = SimpleUploadedFile('grid.glb', grid_glb(20))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'title': 'Grid', 'subject': 'Maths', 'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+    def test_rendered_for_both_catalogs(self):
+        self.upload('/api/models/')
+        self.upload('/api/users/models/')
+        for url in ('/api/models/', '/api/users/models/'):
+            thumbnail = self.client.get(url).json()[0]['thumbnail']
+            self.assertEqual(set(thumbnail), {'webp', 'png'})
+            self.assertEqual(set(thumbnail['png']), {'128', '256', '512'})
+
+        name = Model3D.objects.get().file.name
+        with Image.open(model_storage.path(thumbnails.thumbnail_name(name, 256, 'png'))) as image:
+            self.assertEqual(image.size, (256, 256))
+            alpha = np.asarray(image)[:, :, 3]
+        # the grid is drawn in the middle and the corners stay transparent
+        self.assertEqual(alpha[128, 128], 255)
+        self.assertEqual(alpha[0, 0], 0)
+
+    def test_cached_by_content_and_removed_with_blob(self):
+        self.upload('/api/models/')
+        model = Model3D.objects.get()
+        thumb = model_storage.path(thumbnails.thumbnail_name(model.file.name, 128, 'webp'))
+        mtime = os.stat(thumb).st_mtime_ns
+        self.assertTrue(thumbnails.render_thumbnails(model.file.name))
+        self.assertEqual(os.stat(thumb).st_mtime_ns, mtime)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            model.delete()
+        self.assertFalse(os.path.exists(thumb))
+
+    def test_unrenderable_file_has_no_thumbnail(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Model3D.objects.create(
+                title='Junk', subject='x', uploaded_by=self.teacher,
+                file=SimpleUploadedFile('junk.glb', os.urandom(64)),
+            )
+        self.assertIsNone(self.client.get('/api/models/').json()[0]['thumbnail'])
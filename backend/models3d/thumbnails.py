@@ -0,0 +1,280 @@
+"""Catalog thumbnails rendered on the CPU.
+
+A small NumPy rasterizer draws each model flat-shaded from a fixed
+three-quarter view. The image is rendered once at twice the largest size and
+downsampled for each size and format. Thumbnails are written next to the
+model's blob as ``<blob>.thumb<size>.<format>``, so they are cached by
+content hash, are shared by every row that points at the same file, and are
+deleted with the blob. ``thumbnails_rendered`` is sent once a blob's set is
+written.
+"""
+import logging
+import os
+import tempfile
+from io import BytesIO
+
+import numpy as np
+from django.dispatch import Signal
+from PIL import Image
+
+from . import gltf
+from .storage import model_storage
+
+logger = logging.getLogger(__name__)
+
+# sent with name=<blob name>
+thumbnails_rendered = Signal()
+
+THUMBNAIL_SIZES = (128, 256, 512)
+THUMBNAIL_FORMATS = ('webp', 'png')
+SUPERSAMPLE = 2
+# triangles whose screen bounding box fits in SMALL x SMALL pixels are
+# rasterized together; larger ones one at a time
+SMALL = 8
+CHUNK = 8192
+
+VIEW = np.array([1.0, 0.8, 1.4])
+LIGHT = np.array([0.4, 1.0, 0.9])
+AMBIENT = 0.3
+DEFAULT_COLOR = np.array([0.75, 0.75, 0.78])
+
+
+def thumbnail_name(name, size, fmt):
+    return f'{name}.thumb{size}.{fmt}'
+
+
+def has_thumbnails(name):
+    # written last, so its presence means the whole set is there
+    return model_storage.exists(thumbnail_name(name, THUMBNAIL_SIZES[-1], THUMBNAIL_FORMATS[-1]))
+
+
+def node_matrix(node):
+    if 'matrix' in node:
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T
+    x, y, z, w = node.get('rotation', (0, 0, 0, 1))
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get('scale', (1, 1, 1)))
+    matrix[:3, 3] = node.get('translation', (0, 0, 0))
+    return matrix
+
+
+def scene_nodes(document):
+    """Yield ``(node, world_matrix)`` for every node in the default scene."""
+    source = document.gltf
+    nodes = source.get('nodes', [])
+    scenes = source.get('scenes', [])
+    if scenes:
+        roots = scenes[source.get('scene', 0)].get('nodes', [])
+    else:
+        children = {child for node in nodes for child in node.get('children', [])}
+        roots = [index for index in range(len(nodes)) if index not in children]
+
+    stack = [(index, np.eye(4)) for index in roots]
+    seen = set()
+    while stack:
+        index, parent = stack.pop()
+        if index in seen:
+            continue
+        seen.add(index)
+        world = parent @ node_matrix(nodes[index])
+        yield nodes[index], world
+        stack.extend((child, world) for child in nodes[index].get('children', []))
+
+
+def base_color(document, primitive):
+    materials = document.gltf.get('materials', [])
+    if 'material' not in primitive or primitive['material'] >= len(materials):
+        return DEFAULT_COLOR
+    factor = materials[primitive['material']].get('pbrMetallicRoughness', {}).get('baseColorFactor')
+    return np.array(factor[:3]) if factor else DEFAULT_COLOR
+
+
+def world_triangles(document):
+    """All triangles in world space as ``(T, 3, 3)``, with an RGB colour each."""
+    meshes = document.gltf.get('meshes', [])
+    triangles, colors = [], []
+    for node, world in scene_nodes(document):
+        if 'mesh' not in node:
+            continue
+        for primitive in meshes[node['mesh']].get('primitives', []):
+            if primitive.get('mode', gltf.MODE_TRIANGLES) != gltf.MODE_TRIANGLES:
+                continue
+            if 'POSITION' not in primitive.get('attributes', {}):
+                continue
+            if 'KHR_draco_mesh_compression' in primitive.get('extensions', {}):
+                raise gltf.GLTFError("Draco-compressed meshes are not supported.")
+            positions = document.accessor(primitive['attributes']['POSITION']).astype(np.float64)
+            indices = document.indices(primitive)
+            indices = indices[:len(indices) // 3 * 3]
+            if not len(positions) or not len(indices):
+                continue
+            positions = positions @ world[:3, :3].T + world[:3, 3]
+            triangles.append(positions[indices.reshape(-1, 3)])
+            colors.append(np.broadcast_to(base_color(document, primitive), (len(triangles[-1]), 3)))
+    if not triangles:
+        return np.empty((0, 3, 3)), np.empty((0, 3))
+    return np.concatenate(triangles), np.concatenate(colors)
+
+
+def shade(triangles, colors, light):
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = normals / np.where(lengths > 0, lengths, 1)
+    # two-sided: plenty of uploads have inconsistent winding
+    intensity = AMBIENT + (1 - AMBIENT) * np.abs(normals @ light)
+    linear = np.clip(colors * intensity[:, None], 0, 1)
+    return np.round(255 * linear ** (1 / 2.2)).astype(np.uint8)
+
+
+def project(triangles, resolution):
+    """Orthographic projection fitting the bounding sphere into the frame.
+
+    Returns screen ``x``, ``y`` and a depth that grows towards the camera,
+    each ``(T, 3)``, plus the camera's ``(right, up, forward)`` axes.
+    """
+    points = triangles.reshape(-1, 3)
+    center = (points.min(axis=0) + points.max(axis=0)) / 2
+    radius = float(np.linalg.norm(points - center, axis=1).max()) or 1.0
+
+    forward = VIEW / np.linalg.norm(VIEW)
+    right = np.cross([0.0, 1.0, 0.0], forward)
+    right /= np.linalg.norm(right)
+    up = np.cross(forward, right)
+
+    relative = triangles - center
+    scale = resolution / 2 * 0.95 / radius
+    x = resolution / 2 + (relative @ right) * scale
+    y = resolution / 2 - (relative @ up) * scale
+    return x, y, relative @ forward, (right, up, forward)
+
+
+def fragments(x, y, z, ids, xmin, ymin, width, height, resolution):
+    """Pixel index, depth and triangle id of every covered pixel centre.
+
+    Candidate pixels are the ``width`` x ``height`` grid from each triangle's
+    ``(xmin, ymin)``; all arrays are per triangle.
+    """
+    ox, oy = np.meshgrid(np.arange(width), np.arange(height))
+    px = xmin[:, None] + ox.ravel()
+    py = ymin[:, None] + oy.ravel()
+    cx, cy = px + 0.5, py + 0.5
+
+    x0, x1, x2 = (x[:, i, None] for i in range(3))
+    y0, y1, y2 = (y[:, i, None] for i in range(3))
+    area = (x1 - x0) * (y2 - y0) - (x2 - x0) * (y1 - y0)
+    w0 = ((x1 - cx) * (y2 - cy) - (x2 - cx) * (y1 - cy)) / area
+    w1 = ((x2 - cx) * (y0 - cy) - (x0 - cx) * (y2 - cy)) / area
+    w2 = 1 - w0 - w1
+    inside = (w0 >= 0) & (w1 >= 0) & (w2 >= 0) & (px < resolution) & (py < resolution)
+
+    depth = w0 * z[:, 0, None] + w1 * z[:, 1, None] + w2 * z[:, 2, None]
+    return (py * resolution + px)[inside], depth[inside], np.broadcast_to(ids[:, None], inside.shape)[inside]
+
+
+def resolve(zbuffer, idbuffer, pixels, depth, ids):
+    """Keep the nearest fragment per pixel, against what's already drawn."""
+    if not len(pixels):
+        return
+    order = np.lexsort((-depth, pixels))
+    pixels, depth, ids = pixels[order], depth[order], ids[order]
+    first = np.r_[True, pixels[1:] != pixels[:-1]]
+    pixels, depth, ids = pixels[first], depth[first], ids[first]
+    closer = depth > zbuffer[pixels]
+    zbuffer[pixels[closer]] = depth[closer]
+    idbuffer[pixels[closer]] = ids[closer]
+
+
+def rasterize(triangles, colors, resolution):
+    """Render to an RGBA array of ``resolution`` x ``resolution``."""
+    x, y, z, (right, up, forward) = project(triangles, resolution)
+    light = LIGHT @ np.array([right, up, forward])
+    light /= np.linalg.norm(light)
+    shaded = shade(triangles, colors, light)
+
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+    xmin = np.clip(np.floor(x.min(axis=1) - 0.5), 0, resolution).astype(np.int64)
+    ymin = np.clip(np.floor(y.min(axis=1) - 0.5), 0, resolution).astype(np.int64)
+    xmax = np.clip(np.ceil(x.max(axis=1) - 0.5), -1, resolution - 1).astype(np.int64)
+    ymax = np.clip(np.ceil(y.max(axis=1) - 0.5), -1, resolution - 1).astype(np.int64)
+    width, height = xmax - xmin + 1, ymax - ymin + 1
+    visible = (np.abs(area) > 1e-12) & (width > 0) & (height > 0)
+
+    zbuffer = np.full(resolution * resolution, -np.inf)
+    idbuffer = np.full(resolution * resolution, -1, dtype=np.int64)
+    small = np.flatnonzero(visible & (width <= SMALL) & (height <= SMALL))
+    for start in range(0, len(small), CHUNK):
+        ids = small[start:start + CHUNK]
+        resolve(zbuffer, idbuffer, *fragments(
+            x[ids], y[ids], z[ids], ids, xmin[ids], ymin[ids], SMALL, SMALL, resolution,
+        ))
+    for index in np.flatnonzero(visible & ((width > SMALL) | (height > SMALL))):
+        ids = np.array([index])
+        resolve(zbuffer, idbuffer, *fragments(
+            x[ids], y[ids], z[ids], ids, xmin[ids], ymin[ids], width[index], height[index], resolution,
+        ))
+
+    image = np.zeros((resolution * resolution, 4), dtype=np.uint8)
+    covered = idbuffer >= 0
+    image[covered, :3] = shaded[idbuffer[covered]]
+    image[covered, 3] = 255
+    return image.reshape(resolution, resolution, 4)
+
+
+def render(path):
+    """Render the model at ``path`` as a PIL image at the largest thumbnail
+    size. Raises ``gltf.GLTFError`` if it has nothing to draw."""
+    triangles, colors = world_triangles(gltf.load(path))
+    if not len(triangles):
+        raise gltf.GLTFError("Model has no triangles to render.")
+    resolution = THUMBNAIL_SIZES[-1] * SUPERSAMPLE
+    image = Image.fromarray(rasterize(triangles, colors, resolution), 'RGBA')
+    return image.resize((THUMBNAIL_SIZES[-1],) * 2, Image.LANCZOS)
+
+
+def encode(image, fmt):
+    out = BytesIO()
+    if fmt == 'webp':
+        image.save(out, 'WEBP', quality=80, method=5)
+    else:
+        image.save(out, 'PNG', optimize=True)
+    return out.getvalue()
+
+
+def write(name, data):
+    path = model_storage.path(name)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as out:
+        out.write(data)
+    if model_storage.file_permissions_mode is not None:
+        os.chmod(tmp_path, model_storage.file_permissions_mode)
+    os.replace(tmp_path, path)
+
+
+def render_thumbnails(name):
+    """Render every size and format for blob ``name`` unless already cached.
+
+    Returns True when thumbnails exist afterwards.
+    """
+    if not name or not model_storage.is_blob(name):
+        return False
+    if has_thumbnails(name):
+        return True
+    try:
+        largest = render(model_storage.path(name))
+    except Exception as exc:
+        logger.warning("Could not render thumbnail for %s: %s", name, exc, exc_info=not isinstance(exc, gltf.GLTFError))
+        return False
+
+    outputs = []
+    for size in THUMBNAIL_SIZES:
+        image = largest if size == largest.width else largest.resize((size, size), Image.LANCZOS)
+        outputs.extend((thumbnail_name(name, size, fmt), encode(image, fmt)) for fmt in THUMBNAIL_FORMATS)
+    for thumb, data in outputs:
+        write(thumb, data)
+    thumbnails_rendered.send(sender=None, name=name)
+    return True
@@ -0,0 +1,222 @@
+"""Resumable chunked uploads for large model files.
+
+A client opens an ``UploadSession``, PUTs the file in order with the byte
+offset of each chunk, and finalizes it once ``offset == size``. Chunks are
+appended straight to a ``.part`` file on disk, never buffered whole, and the
+SHA-256 is updated as the bytes go by.
+
+A chunk is written to disk outside any transaction. Under
+``transaction_mode=IMMEDIATE`` an open transaction holds SQLite's write
+lock, and a chunk arrives as slowly as the client's network allows. The
+``.part`` file's own lock puts chunks of one session in line, and the new
+offset is committed in a short transaction that only moves it on from the
+offset the chunk started at.
+"""
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: the offset check alone catches clashing chunks
+    fcntl = None
+
+from django.conf import settings
+from django.utils import timezone
+
+from backend.db import write_queue
+from .models import Model3D, UploadSession
+
+READ_SIZE = 1024 * 1024
+ALLOWED_EXTENSIONS = ('.glb', '.gltf')
+
+# Running hashers for sessions this worker has seen, keyed by session id.
+# A chunk that lands on another worker just rehashes the .part file once.
+_hashers = OrderedDict()
+_MAX_HASHERS = 64
+
+
+class UploadError(Exception):
+    """The chunk or session is inconsistent with what the client claims."""
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, expected):
+        super().__init__(f"Expected offset {expected}.")
+        self.expected = expected
+
+
+def _remember(session_id, offset, hasher):
+    _hashers[session_id] = (offset, hasher)
+    _hashers.move_to_end(session_id)
+    while len(_hashers) > _MAX_HASHERS:
+        _hashers.popitem(last=False)
+
+
+def _hasher_for(session):
+    """A hasher over the session's first ``offset`` bytes. Cached ones are
+    copied: a chunk that fails part-way must not leave its bytes in the
+    cache, which ``_remember()`` only updates once the offset moved."""
+    cached = _hashers.get(session.pk)
+    if cached and cached[0] == session.offset:
+        return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    if session.offset:
+        with open(session.temp_path, 'rb') as part:
+            remaining = session.offset
+            while remaining:
+                block = part.read(min(READ_SIZE, remaining))
+                if not block:
+                    raise UploadError("Upload data on disk is shorter than the recorded offset.")
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def start(owner, title, subject, filename, size, sha256=''):
+    if not filename.lower().endswith(ALLOWED_EXTENSIONS):
+        raise UploadError("Only .glb and .gltf files can be uploaded.")
+    if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise UploadError(f"File size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.")
+
+    session = UploadSession.objects.create(
+        owner=owner, title=title, subject=subject,
+        filename=os.path.basename(filename), size=size, sha256=sha256.lower(),
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    session.temp_path.touch()
+    return session
+
+
+@contextmanager
+def _locked_part(session):
+    """The session's ``.part`` file, open for writing under an exclusive
+    ``flock``: one chunk at a time per session, across threads and workers."""
+    try:
+        part = open(session.temp_path, 'r+b')
+    except FileNotFoundError:
+        # discarded meanwhile (raises DoesNotExist), or the file was lost
+        UploadSession.objects.get(pk=session.pk)
+        raise UploadError("Upload data on disk is missing.")
+    with part:
+        if fcntl is not None:
+            fcntl.flock(part, fcntl.LOCK_EX)
+        yield part
+
+
+def append_chunk(session_id, owner, offset, stream):
+    """Append ``stream`` at ``offset`` and return the updated session.
+
+    No transaction is open while the chunk streams in; see the module
+    docstring.
+    """
+    session = UploadSession.objects.get(pk=session_id, owner=owner)
+    if offset != session.offset:
+        raise OffsetMismatch(session.offset)
+
+    with _locked_part(session) as part:
+        # another request may have moved the offset while this one waited
+        session.refresh_from_db(fields=['offset'])
+        if offset != session.offset:
+            raise OffsetMismatch(session.offset)
+
+        hasher = _hasher_for(session)
+        written = 0
+        part.seek(offset)
+        part.truncate()
+        while True:
+            block = stream.read(READ_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if offset + written > session.size:
+                part.truncate(offset)
+                raise UploadError("Chunk runs past the declared file size.")
+            part.write(block)
+            hasher.update(block)
+        part.flush()
+
+        now = timezone.now()
+        with write_queue():
+            moved = UploadSession.objects.filter(pk=session.pk, offset=offset).update(
+                offset=offset + written, updated_at=now,
+            )
+        if not moved:
+            # finalized or discarded while the chunk streamed in
+            session.refresh_from_db(fields=['offset'])
+            raise OffsetMismatch(session.offset)
+        session.offset, session.updated_at = offset + written, now
+    _remember(session.pk, session.offset, hasher)
+    return session
+
+
+def finalize(session_id, owner):
+    """Move the completed file into media storage and create its ``Model3D``.
+
+    As with a chunk, the file is hashed and moved next to the store outside
+    any transaction, under the ``.part`` file's lock. The rename into place,
+    the insert and the session's removal then take one ``write_queue()``
+    turn (see ``models3d.signals.release()``).
+    """
+    session = UploadSession.objects.get(pk=session_id, owner=owner)
+    if session.offset != session.size:
+        raise OffsetMismatch(session.offset)
+
+    with _locked_part(session):
+        # finalized or discarded while this request waited: DoesNotExist
+        session.refresh_from_db(fields=['offset'])
+        if session.offset != session.size:
+            raise OffsetMismatch(session.offset)
+
+        digest = _hasher_for(session).hexdigest()
+        if session.sha256 and session.sha256 != digest:
+            raise UploadError("SHA-256 of the uploaded data does not match.")
+
+        model = Model3D(title=session.title, subject=session.subject, uploaded_by=owner)
+        storage = model.file.storage
+        staged = storage.stage_file(session.temp_path)
+        try:
+            # adopt() is a rename now; the blob and its row commit in one turn
+            with write_queue():
+                model.file.name = storage.adopt(staged, session.filename, digest)
+                model.save()
+                session.delete()
+        except BaseException:
+            if os.path.exists(staged):
+                shutil.move(staged, session.temp_path)  # the session can be finalized again
+            raise
+    _hashers.pop(session_id, None)
+    return model
+
+
+def discard(session):
+    _hashers.pop(session.pk, None)
+    try:
+        os.remove(session.temp_path)
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def purge_stale(max_age=None):
+    """Delete sessions idle for longer than ``max_age`` and any orphaned .part files."""
+    if max_age is None:
+        max_age = timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY)
+    cutoff = timezone.now() - max_age
+
+    removed = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        discard(session)
+        removed += 1
+
+    upload_dir = settings.CHUNKED_UPLOAD_DIR
+    if os.path.isdir(upload_dir):
+        live = {f"{pk}.part" for pk in UploadSession.objects.values_list('pk', flat=True)}
+        for entry in os.scandir(upload_dir):
+            if entry.name.endswith('.part') and entry.name not in live:
+                os.remove(entry.path)
+    return removed
@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import Model3DListCreateView
+from .views import Model3DListCreateView, UploadSessionCompleteView, UploadSessionCreateView, UploadSessionView
 
 urlpatterns = [
     path("", Model3DListCreateView.as_view(), name="model3d-list-create"),
+    path("uploads/", UploadSessionCreateView.as_view(), name="model3d-upload-create"),
+    path("uploads/<uuid:pk>/", UploadSessionView.as_view(), name="model3d-upload"),
+    path("uploads/<uuid:pk>/complete/", UploadSessionCompleteView.as_view(), name="model3d-upload-complete"),
 ]
@@ -1,16 +1,94 @@
-from rest_framework import generics
+import io
+
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from assignments import versions
+from backend import lean
+from backend.pagination import CreatedAtCursorPagination
 
-from .models import Model3D
-from .serializers import Model3DSerializer
+from . import uploads
+from .models import Model3D, UploadSession
+from .serializers import Model3DRowSerializer, Model3DSerializer, UploadSessionSerializer
+from .storage import model_storage
 
 
-class Model3DListCreateView(generics.ListCreateAPIView):
+class Model3DListCreateView(versions.ConditionalListMixin, lean.LeanListMixin, generics.ListCreateAPIView):
     queryset = Model3D.objects.all()
     serializer_class = Model3DSerializer
-    authentication_classes = [JWTAuthentication]
+    row_serializer_class = Model3DRowSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    # everyone sees the same catalog
+    version_scopes = (versions.MODELS,)
+    version_shared = True
 
     def perform_create(self, serializer):
-        serializer.save(uploaded_by=self.request.user)
+        upload = serializer.validated_data['file']
+        with model_storage.adopting(upload, upload.name) as name:
+            serializer.save(uploaded_by=self.request.user, file=name)
+
+
+class UploadSessionCreateView(APIView):
+    """Open a resumable upload: POST title, subject, filename, size (and optionally sha256)."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            session = uploads.start(request.user, **serializer.validated_data)
+        except uploads.UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionView(APIView):
+    """GET the current offset to resume, PUT the next chunk, DELETE to abandon."""
+    permission_classes = [IsAuthenticated]
+    # chunk bodies are raw file bytes, read straight off the request stream
+    parser_classes = []
+
+    def get(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk, owner=request.user)
+        return Response(UploadSessionSerializer(session).data)
+
+    def put(self, request, pk):
+        try:
+            offset = int(request.headers["Upload-Offset"])
+        except (KeyError, ValueError):
+            return Response({"detail": "Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = uploads.append_chunk(pk, request.user, offset, request.stream or io.BytesIO())
+        except UploadSession.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        except uploads.OffsetMismatch as exc:
+            return Response({"detail": str(exc), "offset": exc.expected}, status=status.HTTP_409_CONFLICT)
+        except uploads.UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UploadSessionSerializer(session).data)
+
+    def delete(self, request, pk):
+        session = get_object_or_404(UploadSession, pk=pk, owner=request.user)
+        uploads.discard(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionCompleteView(APIView):
+    """Finalize a fully received upload into a ``Model3D``."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        try:
+            model = uploads.finalize(pk, request.user)
+        except UploadSession.DoesNotExist:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        except uploads.OffsetMismatch as exc:
+            return Response({"detail": "Upload is incomplete.", "offset": exc.expected}, status=status.HTTP_409_CONFLICT)
+        except uploads.UploadError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = Model3DSerializer(model, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
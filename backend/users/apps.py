@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from backend import images
+        from . import authentication
+        from .models import User
+
+        images.watch(User, 'profile_photo', widths=(96, 256))
+
+        def forget_cached_user(sender, instance, **kwargs):
+            authentication.forget(instance.pk)
+
+        post_save.connect(forget_cached_user, sender=User, weak=False, dispatch_uid='users:forget-cached-user')
+        post_delete.connect(forget_cached_user, sender=User, weak=False, dispatch_uid='users:forget-cached-user')
@@ -0,0 +1,105 @@
+"""JWT authentication that doesn't load the user on every request.
+
+Access tokens carry the user's ``username``, ``role``, staff flag and
+``token_version`` (claim ``ver``), so ``request.user`` is built straight from
+the claims: a real ``User`` instance with every other field deferred, which
+works for ``request.user.id``/``.role`` checks, FK assignment and filters
+without a query.
+
+Revocation is by version: changing a user's role or deactivating them bumps
+``User.token_version`` and tokens carrying an older ``ver`` are refused. The
+current version comes from a small per-worker TTL/LRU cache of full user rows,
+so a bump made in another process takes effect within
+``AUTH_USER_CACHE_TTL`` seconds (immediately in the process that saved it).
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+# User fields carried in the access token, as (field, claim)
+CLAIMS = (
+    ('username', 'username'),
+    ('role', 'role'),
+    ('is_staff', 'staff'),
+    ('token_version', 'ver'),
+)
+
+_users = OrderedDict()
+_lock = threading.Lock()
+
+
+def add_claims(token, user):
+    for field, claim in CLAIMS:
+        token[claim] = getattr(user, field)
+    return token
+
+
+def cached_user(user_id):
+    """The user row for ``user_id`` from the per-worker cache, or None.
+
+    Callers get their own copy, so mutating it can't leak into other requests.
+    """
+    user_id = User._meta.pk.to_python(user_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(user_id)
+        if entry and entry[0] > now:
+            _users.move_to_end(user_id)
+            return copy.copy(entry[1])
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return None
+    with _lock:
+        _users[user_id] = (now + settings.AUTH_USER_CACHE_TTL, user)
+        _users.move_to_end(user_id)
+        while len(_users) > settings.AUTH_USER_CACHE_SIZE:
+            _users.popitem(last=False)
+    return copy.copy(user)
+
+
+def forget(user_id):
+    user_id = User._meta.pk.to_python(user_id)
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def user_from_claims(token):
+    values = {field: token[claim] for field, claim in CLAIMS}
+    # simplejwt stores the id claim as a string
+    values['id'] = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+    values['is_active'] = True
+    # from_db takes deferred-model values in field declaration order
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    return User.from_db(DEFAULT_DB_ALIAS, fields, [values[field] for field in fields])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        current = cached_user(user_id)
+        if current is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not current.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if validated_token.get('ver', 0) != current.token_version:
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        if any(claim not in validated_token for _, claim in CLAIMS):
+            # issued before the claims existed: fall back to the cached row
+            return current
+        return user_from_claims(validated_token)
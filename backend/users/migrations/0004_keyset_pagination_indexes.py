@@ -0,0 +1,22 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_user_bio_user_institution_user_profile_photo_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='model3d',
+            index=models.Index(fields=['uploaded_by', 'created_at', 'id'], name='user_model3d_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'id'], name='user_role_id_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:58
+
+import models3d.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='model3d',
+            name='file',
+            field=models.FileField(db_index=True, storage=models3d.storage.ContentAddressedStorage(), upload_to='models/'),
+        ),
+    ]
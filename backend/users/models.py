@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.contrib.auth import get_user_model
+from models3d.storage import model_storage
 class User(AbstractUser):
     ROLE_CHOICES = (
         ('student', 'Student'),
@@ -14,6 +15,37 @@ class User(AbstractUser):
     institution = models.CharField(max_length=200, blank=True, null=True)
     bio = models.TextField(blank=True, null=True)
 
+    # Bumped whenever role or is_active changes; access tokens carry it and
+    # are refused once it moves on (users.authentication).
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # student directory is keyset paginated on id within a role
+            models.Index(fields=['role', 'id'], name='user_role_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_access = instance.access_state() if {'role', 'is_active'} <= set(field_names) else None
+        return instance
+
+    def access_state(self):
+        return (self.role, self.is_active)
+
+    def save(self, *args, **kwargs):
+        # Only saves through the model bump the version; a queryset .update()
+        # of role or is_active must bump token_version itself.
+        loaded = getattr(self, '_loaded_access', None)
+        if loaded is not None and loaded != self.access_state():
+            self.token_version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+        self._loaded_access = self.access_state()
+
 
 
 User = get_user_model()
@@ -21,7 +53,7 @@ User = get_user_model()
 class Model3D(models.Model):
     title = models.CharField(max_length=100)
     subject = models.CharField(max_length=100)
-    file = models.FileField(upload_to="models/")
+    file = models.FileField(upload_to="models/", storage=model_storage, db_index=True)
     uploaded_by = models.ForeignKey(
     User,
     on_delete=models.CASCADE,
@@ -30,5 +62,10 @@ class Model3D(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['uploaded_by', 'created_at', 'id'], name='user_model3d_owner_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
@@ -1,6 +1,12 @@
 from rest_framework import serializers
+from backend import lean
+from backend.images import DerivativeField
+from models3d.serializers import ThumbnailField, thumbnail_urls
+from .authentication import add_claims
 from .models import User, Model3D
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -21,25 +27,74 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # claims read by users.authentication.ClaimsJWTAuthentication; access
+        # tokens minted from this refresh token inherit them
+        return add_claims(super().get_token(user), user)
+
     def validate(self, attrs):
         data = super().validate(attrs)
         data["role"] = self.user.role
         return data
 
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuse to mint access tokens from a refresh token whose version has
+    been bumped since it was issued."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        current = User.objects.filter(
+            pk=refresh.payload.get(api_settings.USER_ID_CLAIM)
+        ).values_list("token_version", flat=True).first()
+        if current is None or refresh.payload.get("ver", 0) != current:
+            raise InvalidToken("Token has been revoked.")
+        return super().validate(attrs)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'role', 'first_name', 'last_name']
 
+
+class UserRowSerializer(lean.RowSerializer):
+    """``UserSerializer`` for list responses (``backend.lean``)."""
+    columns = ('id', 'username', 'email', 'role', 'first_name', 'last_name')
+
 class TeacherProfileSerializer(serializers.ModelSerializer):
+    profile_photo_thumb = DerivativeField(source='profile_photo')
+
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 
-                  'profile_photo', 'subject_expertise', 'institution', 'bio']
+                  'profile_photo', 'profile_photo_thumb', 'subject_expertise', 'institution', 'bio']
         read_only_fields = ['id', 'username', 'email']
 
 class Model3DSerializer(serializers.ModelSerializer):
+    thumbnail = ThumbnailField()
+
     class Meta:
         model = Model3D
         fields = "__all__"
         read_only_fields = ["uploaded_by"]
+
+
+class Model3DRowSerializer(lean.RowSerializer):
+    """``Model3DSerializer`` for list responses (``backend.lean``)."""
+    columns = ('id', 'title', 'subject', 'file', 'created_at', 'uploaded_by')
+
+    def fields(self, prefix=''):
+        request = self.context.get('request')
+        storage = Model3D._meta.get_field('file').storage
+        url = lean.file_url(storage, request)
+        file = prefix + 'file'
+        return [
+            ('id', prefix + 'id'),
+            ('thumbnail', lambda row: thumbnail_urls(storage, row[file], request)),
+            ('title', prefix + 'title'),
+            ('subject', prefix + 'subject'),
+            ('file', lambda row: url(row[file]) if row[file] else None),
+            ('created_at', prefix + 'created_at'),
+            ('uploaded_by', prefix + 'uploaded_by'),
+        ]
@@ -1,3 +1,105 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import authentication
+from .models import User
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ClaimsAuthenticationTests(TestCase):
+    def setUp(self):
+        self.addCleanup(authentication._users.clear)
+        self.teacher = User.objects.create_user(username='teacher', password='pw', role='teacher')
+        self.client = APIClient()
+
+    def login(self):
+        tokens = self.client.post('/api/login/', {'username': 'teacher', 'password': 'pw'}, format='json').json()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        return tokens
+
+    def test_access_token_carries_role_and_version(self):
+        token = AccessToken(self.login()['access'])
+        self.assertEqual((token['role'], token['ver'], token['username']), ('teacher', 0, 'teacher'))
+
+    def test_user_is_built_from_the_claims(self):
+        user = authentication.user_from_claims(AccessToken(self.login()['access']))
+        self.assertEqual(
+            (user.pk, user.username, user.role, user.is_staff, user.is_active, user.token_version),
+            (self.teacher.pk, 'teacher', 'teacher', False, True, 0),
+        )
+
+    @override_settings(RESPONSE_CACHE=None)
+    def test_requests_skip_the_user_query_once_cached(self):
+        self.login()
+        with self.assertNumQueries(3):  # user row for the cache, the catalog's version, the models
+            self.assertEqual(self.client.get('/api/users/models/').status_code, 200)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/users/models/').status_code, 200)
+
+    def test_role_change_revokes_tokens(self):
+        tokens = self.login()
+        self.assertEqual(self.client.get('/api/users/models/').status_code, 200)
+
+        self.teacher.role = 'student'
+        self.teacher.save()
+        self.assertEqual(self.teacher.token_version, 1)
+        self.assertEqual(self.client.get('/api/users/models/').status_code, 401)
+        refresh = self.client.post('/api/refresh/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(refresh.status_code, 401)
+
+        self.login()
+        self.assertEqual(self.client.get('/api/dashboard/stats/').json()['role'], 'student')
+
+    def test_deactivation_and_unrelated_saves(self):
+        self.login()
+        self.teacher.bio = 'Physics'
+        self.teacher.save()
+        self.assertEqual(self.teacher.token_version, 0)
+        self.assertEqual(self.client.get('/api/users/models/').status_code, 200)
+
+        self.teacher.is_active = False
+        self.teacher.save(update_fields=['is_active'])
+        self.assertEqual(User.objects.get().token_version, 1)
+        self.assertEqual(self.client.get('/api/users/models/').status_code, 401)
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class ProfilePhotoTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        settings_override = override_settings(MEDIA_ROOT=self.tmp)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.teacher = User.objects.create(username='teacher', role='teacher')
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher)
+
+    def photo(self):
+        out = BytesIO()
+        image = Image.new('RGB', (800, 800), (200, 80, 40))
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'
+        image.save(out, 'JPEG', exif=exif)
+        return SimpleUploadedFile('me.jpg', out.getvalue(), content_type='image/jpeg')
+
+    def test_profile_photo_thumb(self):
+        self.assertIsNone(self.client.get('/api/users/profile/').json()['profile_photo_thumb'])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/users/profile/update/', {'profile_photo': self.photo()}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+
+        # force_authenticate hands every request this same instance
+        self.teacher.refresh_from_db()
+        data = self.client.get('/api/users/profile/').json()
+        self.assertTrue(data['profile_photo'].endswith('.webp'))
+        self.assertEqual(set(data['profile_photo_thumb']['webp']), {'96', '256'})
+        with Image.open(self.teacher.profile_photo.path) as stored:
+            self.assertEqual(len(stored.getexif()), 0)
@@ -19,29 +19,44 @@ class RegisterView(APIView):
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-from rest_framework_simplejwt.views import TokenObtainPairView
-from .serializers import CustomTokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .serializers import CustomTokenObtainPairSerializer, VersionedTokenRefreshSerializer
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+
+class VersionedTokenRefreshView(TokenRefreshView):
+    serializer_class = VersionedTokenRefreshSerializer
 from rest_framework import generics, permissions
+from assignments import versions
+from backend import lean
 from .models import Model3D, User
-from .serializers import Model3DSerializer, UserSerializer, TeacherProfileSerializer
+from .serializers import Model3DRowSerializer, Model3DSerializer, UserRowSerializer, UserSerializer, TeacherProfileSerializer
+from backend.pagination import CreatedAtCursorPagination
+from models3d.storage import model_storage
 
-class Model3DListCreateView(generics.ListCreateAPIView):
+class Model3DListCreateView(versions.ConditionalListMixin, lean.LeanListMixin, generics.ListCreateAPIView):
     serializer_class = Model3DSerializer
+    row_serializer_class = Model3DRowSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    version_scopes = (versions.MODELS,)
 
     def get_queryset(self):
         # 🔥 teacher sirf apne models dekhe
         return Model3D.objects.filter(uploaded_by=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(uploaded_by=self.request.user)
+        upload = serializer.validated_data['file']
+        with model_storage.adopting(upload, upload.name) as name:
+            serializer.save(uploaded_by=self.request.user, file=name)
 
-class StudentListView(generics.ListAPIView):
+class StudentListView(versions.ConditionalListMixin, lean.LeanListMixin, generics.ListAPIView):
     serializer_class = UserSerializer
+    row_serializer_class = UserRowSerializer
     permission_classes = [permissions.IsAuthenticated]
+    version_scopes = (versions.ROSTER, versions.SHARED)
+    version_shared = True
 
     def get_queryset(self):
         return User.objects.filter(role='student')
@@ -51,7 +66,8 @@ class TeacherProfileView(generics.RetrieveAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user only carries the token claims; the profile needs the row
+        return User.objects.get(pk=self.request.user.pk)
 
 class TeacherProfileUpdateView(generics.UpdateAPIView):
     serializer_class = TeacherProfileSerializer
@@ -59,4 +75,5 @@ class TeacherProfileUpdateView(generics.UpdateAPIView):
     parser_classes = [MultiPartParser, FormParser]
 
     def get_object(self):
-        return self.request.user
+        # request.user only carries the token claims; the profile needs the row
+        return User.objects.get(pk=self.request.user.pk)
@@ -19,6 +19,14 @@ interface SubmissionStatus {
     submission_id: number | null;
 }
 
+// one submission saved or deleted, as sent by the live roster stream
+interface StatusChange {
+    student_id: number;
+    status: SubmissionStatus['status'];
+    submitted_at: string | null;
+    submission_id: number | null;
+}
+
 interface SubmissionDetail {
     id: number;
     content: Array<{ question: string; answer: string }>;
@@ -35,12 +43,16 @@ interface Assignment {
     model_obj: { title: string };
 }
 
+// milliseconds between roster polls when the server offers no live stream
+const POLL_INTERVAL = 5000;
+
 const AssignmentSubmissions = () => {
     const { id } = useParams();
     const navigate = useNavigate();
     const [assignment, setAssignment] = useState<Assignment | null>(null);
     const [submissions, setSubmissions] = useState<SubmissionStatus[]>([]);
     const [loading, setLoading] = useState(true);
+    const [rosterLoaded, setRosterLoaded] = useState(false);
     const [selectedSubmission, setSelectedSubmission] = useState<SubmissionDetail | null>(null);
     const [loadingSubmission, setLoadingSubmission] = useState(false);
 
@@ -48,20 +60,12 @@ const AssignmentSubmissions = () => {
         const token = localStorage.getItem("token");
 
         // Fetch assignment details
-        Promise.all([
-            fetch(`http://127.0.0.1:8000/api/assignments/${id}/`, {
-                headers: { Authorization: `Bearer ${token}` },
-            }),
-            fetch(`http://127.0.0.1:8000/api/assignments/${id}/submissions_status/`, {
-                headers: { Authorization: `Bearer ${token}` },
-            }),
-        ])
-            .then(([assignmentRes, submissionsRes]) =>
-                Promise.all([assignmentRes.json(), submissionsRes.json()])
-            )
-            .then(([assignmentData, submissionsData]) => {
+        fetch(`http://127.0.0.1:8000/api/assignments/${id}/`, {
+            headers: { Authorization: `Bearer ${token}` },
+        })
+            .then(res => res.json())
+            .then(assignmentData => {
                 setAssignment(assignmentData);
-                setSubmissions(submissionsData);
                 setLoading(false);
             })
             .catch(err => {
@@ -70,6 +74,100 @@ const AssignmentSubmissions = () => {
             });
     }, [id]);
 
+    // Roster: under the ASGI server submissions_status advertises a live
+    // stream (Link rel="live"): a snapshot, then one event per submission
+    // change. The server ends the stream every few minutes; reconnecting
+    // brings a fresh snapshot. Otherwise the page polls submissions_status,
+    // which the browser revalidates with its ETag.
+    useEffect(() => {
+        const token = localStorage.getItem("token");
+        const controller = new AbortController();
+        let retry: ReturnType<typeof setTimeout> | undefined;
+
+        const apply = (event: string, data: string) => {
+            if (event === "snapshot") {
+                setSubmissions(JSON.parse(data));
+                setRosterLoaded(true);
+            } else if (event === "status") {
+                const change: StatusChange = JSON.parse(data);
+                setSubmissions(rows => rows.map(row => row.student.id === change.student_id
+                    ? { ...row, status: change.status, submitted_at: change.submitted_at, submission_id: change.submission_id }
+                    : row
+                ));
+            }
+        };
+
+        const poll = async () => {
+            let live: string | undefined;
+            try {
+                const res = await fetch(`http://127.0.0.1:8000/api/assignments/${id}/submissions_status/`, {
+                    headers: { Authorization: `Bearer ${token}` },
+                    signal: controller.signal,
+                    cache: "no-cache",
+                });
+                if (res.ok) {
+                    setSubmissions(await res.json());
+                    setRosterLoaded(true);
+                    live = res.headers.get("Link")?.match(/<([^>]+)>;\s*rel="live"/)?.[1];
+                } else if (res.status < 500) {
+                    return;
+                }
+            } catch (err) {
+                if (controller.signal.aborted) return;
+                console.error(err);
+            }
+            if (controller.signal.aborted) return;
+            if (live) follow(live);
+            else retry = setTimeout(poll, POLL_INTERVAL);
+        };
+
+        const follow = async (url: string) => {
+            try {
+                const res = await fetch(url, {
+                    headers: { Authorization: `Bearer ${token}` },
+                    signal: controller.signal,
+                });
+                if (!res.ok || !res.body) {
+                    // no longer served (a WSGI deployment): back to polling
+                    if (res.status === 404) {
+                        poll();
+                        return;
+                    }
+                    if (res.status < 500) return;
+                } else {
+                    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+                    let buffer = "";
+                    for (;;) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffer += value;
+                        let end;
+                        while ((end = buffer.indexOf("\n\n")) >= 0) {
+                            let event = "message";
+                            let data = "";
+                            for (const line of buffer.slice(0, end).split("\n")) {
+                                if (line.startsWith("event: ")) event = line.slice(7);
+                                else if (line.startsWith("data: ")) data += line.slice(6);
+                            }
+                            buffer = buffer.slice(end + 2);
+                            if (data) apply(event, data);
+                        }
+                    }
+                }
+            } catch (err) {
+                if (controller.signal.aborted) return;
+                console.error(err);
+            }
+            if (!controller.signal.aborted) retry = setTimeout(() => follow(url), 2000);
+        };
+
+        poll();
+        return () => {
+            controller.abort();
+            clearTimeout(retry);
+        };
+    }, [id]);
+
     const handleViewSubmission = async (submissionId: number) => {
         if (!submissionId) return;
 
@@ -209,7 +307,9 @@ const AssignmentSubmissions = () => {
                 </CardHeader>
                 <CardContent>
                     <div className="space-y-2">
-                        {submissions.length === 0 ? (
+                        {!rosterLoaded ? (
+                            <p className="text-center py-8 text-muted-foreground animate-pulse">Loading students...</p>
+                        ) : submissions.length === 0 ? (
                             <p className="text-center py-8 text-muted-foreground">No students found</p>
                         ) : (
                             submissions.map((submission) => (